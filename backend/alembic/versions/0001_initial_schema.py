@@ -0,0 +1,127 @@
+"""Initial schema
+
+The tables as the app created them with create_all before migrations
+existed; unversioned databases are stamped at this revision.
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-19 12:23:57
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('tutorials',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(length=255), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('content', sa.Text(), nullable=True),
+    sa.Column('thumbnail', sa.String(length=500), nullable=True),
+    sa.Column('difficulty', sa.String(length=20), nullable=False),
+    sa.Column('category', sa.String(length=50), nullable=False),
+    sa.Column('duration_minutes', sa.Integer(), nullable=False),
+    sa.Column('order', sa.Integer(), nullable=False),
+    sa.Column('is_published', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('email', sa.String(length=255), nullable=False),
+    sa.Column('hashed_password', sa.String(length=255), nullable=False),
+    sa.Column('name', sa.String(length=255), nullable=False),
+    sa.Column('avatar', sa.String(length=500), nullable=True),
+    sa.Column('role', sa.Enum('STUDENT', 'EDUCATOR', 'ADMIN', name='userrole'), nullable=False),
+    sa.Column('is_active', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+    op.create_table('ai_models',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=255), nullable=False),
+    sa.Column('model_type', sa.String(length=50), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('accuracy', sa.Double(), nullable=True),
+    sa.Column('size', sa.String(length=50), nullable=True),
+    sa.Column('file_path', sa.String(length=500), nullable=True),
+    sa.Column('is_pretrained', sa.Boolean(), nullable=False),
+    sa.Column('is_public', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('owner_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['owner_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('devices',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=255), nullable=False),
+    sa.Column('device_type', sa.Enum('ARDUINO', 'ESP32', 'RASPBERRY_PI', 'SIMULATOR', name='devicetype'), nullable=False),
+    sa.Column('status', sa.Enum('ONLINE', 'OFFLINE', 'CONNECTING', name='devicestatus'), nullable=False),
+    sa.Column('ip_address', sa.String(length=45), nullable=True),
+    sa.Column('mac_address', sa.String(length=17), nullable=True),
+    sa.Column('firmware_version', sa.String(length=50), nullable=True),
+    sa.Column('metadata', sa.JSON(), nullable=True),
+    sa.Column('last_seen', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('owner_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['owner_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('projects',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=255), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('blocks', sa.Text(), nullable=True),
+    sa.Column('generated_code', sa.Text(), nullable=True),
+    sa.Column('thumbnail', sa.String(length=500), nullable=True),
+    sa.Column('tags', sa.JSON(), nullable=True),
+    sa.Column('is_public', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('owner_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['owner_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('user_progress',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('tutorial_id', sa.Integer(), nullable=False),
+    sa.Column('completed', sa.Boolean(), nullable=False),
+    sa.Column('completed_at', sa.DateTime(), nullable=True),
+    sa.Column('xp_earned', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['tutorial_id'], ['tutorials.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('sensor_data',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('device_id', sa.Integer(), nullable=False),
+    sa.Column('sensor_type', sa.String(length=50), nullable=False),
+    sa.Column('value', sa.Double(), nullable=False),
+    sa.Column('unit', sa.String(length=20), nullable=True),
+    sa.Column('timestamp', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['device_id'], ['devices.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('sensor_data')
+    op.drop_table('user_progress')
+    op.drop_table('projects')
+    op.drop_table('devices')
+    op.drop_table('ai_models')
+    op.drop_index('ix_users_email', table_name='users')
+    op.drop_table('users')
+    op.drop_table('tutorials')
+    for enum_name in ('devicestatus', 'devicetype', 'userrole'):
+        sa.Enum(name=enum_name).drop(op.get_bind(), checkfirst=True)
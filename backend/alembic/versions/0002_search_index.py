@@ -0,0 +1,48 @@
+"""Full-text search index (SQLite FTS5)
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 12:40:12
+"""
+
+from alembic import op
+
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Other databases use the LIKE search backend, which needs no index
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute(
+        "CREATE VIRTUAL TABLE search_index USING fts5("
+        "title, body, kind UNINDEXED, ref_id UNINDEXED, "
+        "owner_id UNINDEXED, is_public UNINDEXED, "
+        "prefix='2 3', tokenize='unicode61 remove_diacritics 2')"
+    )
+    # Rowids pack the kind code (project 1, tutorial 2, model 3) with the row id
+    op.execute(
+        "INSERT INTO search_index (rowid, title, body, kind, ref_id, owner_id, is_public) "
+        "SELECT id * 8 + 1, name, coalesce(description, '') || ' ' || coalesce(tags, ''), "
+        "'project', id, owner_id, is_public FROM projects"
+    )
+    op.execute(
+        "INSERT INTO search_index (rowid, title, body, kind, ref_id, owner_id, is_public) "
+        "SELECT id * 8 + 2, title, coalesce(description, '') || ' ' || coalesce(content, ''), "
+        "'tutorial', id, NULL, is_published FROM tutorials"
+    )
+    op.execute(
+        "INSERT INTO search_index (rowid, title, body, kind, ref_id, owner_id, is_public) "
+        "SELECT id * 8 + 3, name, coalesce(description, ''), "
+        "'model', id, owner_id, is_public FROM ai_models"
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute("DROP TABLE search_index")
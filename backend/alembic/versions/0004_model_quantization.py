@@ -0,0 +1,25 @@
+"""Int8 model variants
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 12:39:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('ai_models', sa.Column('quantized_path', sa.String(length=500), nullable=True))
+
+
+def downgrade() -> None:
+    # SQLite cannot drop columns in place
+    with op.batch_alter_table('ai_models') as batch_op:
+        batch_op.drop_column('quantized_path')
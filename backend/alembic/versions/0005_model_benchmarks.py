@@ -0,0 +1,46 @@
+"""Model benchmark results
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 12:41:05
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('model_benchmarks',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('model_id', sa.Integer(), nullable=False),
+    sa.Column('run_id', sa.String(length=32), nullable=False),
+    sa.Column('variant', sa.String(length=20), nullable=False),
+    sa.Column('batch_size', sa.Integer(), nullable=False),
+    sa.Column('threads', sa.Integer(), nullable=False),
+    sa.Column('iterations', sa.Integer(), nullable=False),
+    sa.Column('p50_ms', sa.Double(), nullable=False),
+    sa.Column('p99_ms', sa.Double(), nullable=False),
+    sa.Column('mean_ms', sa.Double(), nullable=False),
+    sa.Column('throughput', sa.Double(), nullable=False),
+    sa.Column('peak_memory_bytes', sa.BigInteger(), nullable=False),
+    sa.Column('host', sa.String(length=100), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['model_id'], ['ai_models.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_model_benchmarks_model_created', 'model_benchmarks', ['model_id', 'created_at'], unique=False)
+    op.add_column('ai_models', sa.Column('latency_ms', sa.Double(), nullable=True))
+
+
+def downgrade() -> None:
+    # SQLite cannot drop columns in place
+    with op.batch_alter_table('ai_models') as batch_op:
+        batch_op.drop_column('latency_ms')
+    op.drop_index('ix_model_benchmarks_model_created', table_name='model_benchmarks')
+    op.drop_table('model_benchmarks')
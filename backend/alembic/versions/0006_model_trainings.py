@@ -0,0 +1,39 @@
+"""Sensor forecasting model training state
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 12:49:50
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('model_trainings',
+    sa.Column('model_id', sa.Integer(), nullable=False),
+    sa.Column('device_id', sa.Integer(), nullable=False),
+    sa.Column('sensor_type', sa.String(length=50), nullable=False),
+    sa.Column('algorithm', sa.String(length=20), nullable=False),
+    sa.Column('lags', sa.Integer(), nullable=False),
+    sa.Column('alpha', sa.Double(), nullable=False),
+    sa.Column('learning_rate', sa.Double(), nullable=False),
+    sa.Column('epochs', sa.Integer(), nullable=False),
+    sa.Column('samples', sa.Integer(), nullable=False),
+    sa.Column('last_timestamp', sa.DateTime(), nullable=True),
+    sa.Column('last_reading_id', sa.Integer(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['device_id'], ['devices.id'], ),
+    sa.ForeignKeyConstraint(['model_id'], ['ai_models.id'], ),
+    sa.PrimaryKeyConstraint('model_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('model_trainings')
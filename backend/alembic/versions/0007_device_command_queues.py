@@ -0,0 +1,48 @@
+"""Per-device command queues
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 13:01:38
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('device_commands',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('device_id', sa.Integer(), nullable=False),
+    sa.Column('seq', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('params', sa.JSON(), nullable=False),
+    sa.Column('key', sa.String(length=120), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=True),
+    sa.Column('expires_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['device_id'], ['devices.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('device_id', 'seq')
+    )
+    with op.batch_alter_table('device_commands', schema=None) as batch_op:
+        batch_op.create_index('ix_device_commands_device_key', ['device_id', 'key'], unique=False)
+
+    with op.batch_alter_table('devices', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('command_seq', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('devices', schema=None) as batch_op:
+        batch_op.drop_column('command_seq')
+
+    with op.batch_alter_table('device_commands', schema=None) as batch_op:
+        batch_op.drop_index('ix_device_commands_device_key')
+
+    op.drop_table('device_commands')
@@ -0,0 +1,90 @@
+"""Blobs, project revisions, learning stats and query indexes
+
+These were added to the models while the app still created its schema
+with create_all, so databases from that period may already have some of
+them; each is only created when missing.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 14:10:12
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+
+    def has_index(table: str, name: str) -> bool:
+        return any(index['name'] == name for index in inspector.get_indexes(table))
+
+    if 'blobs' not in tables:
+        op.create_table('blobs',
+        sa.Column('hash', sa.String(length=64), nullable=False),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('ref_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('hash')
+        )
+
+    if 'blocks_hash' not in {column['name'] for column in inspector.get_columns('projects')}:
+        with op.batch_alter_table('projects', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('blocks_hash', sa.String(length=64), nullable=True))
+            batch_op.create_foreign_key('fk_projects_blocks_hash_blobs', 'blobs', ['blocks_hash'], ['hash'])
+    if not has_index('projects', 'ix_projects_blocks_hash'):
+        op.create_index('ix_projects_blocks_hash', 'projects', ['blocks_hash'], unique=False)
+
+    if 'project_revisions' not in tables:
+        op.create_table('project_revisions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('project_id', sa.Integer(), nullable=False),
+        sa.Column('revision', sa.Integer(), nullable=False),
+        sa.Column('is_keyframe', sa.Boolean(), nullable=False),
+        sa.Column('blob_hash', sa.String(length=64), nullable=True),
+        sa.Column('delta', sa.LargeBinary(), nullable=True),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['blob_hash'], ['blobs.hash'], ),
+        sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('project_id', 'revision')
+        )
+
+    if 'user_stats' not in tables:
+        op.create_table('user_stats',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('completed_count', sa.Integer(), nullable=False),
+        sa.Column('total_xp', sa.Integer(), nullable=False),
+        sa.Column('last_completed_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('user_id')
+        )
+    if not has_index('user_stats', 'ix_user_stats_leaderboard'):
+        op.create_index('ix_user_stats_leaderboard', 'user_stats', ['total_xp', 'user_id'], unique=False)
+
+    if not has_index('user_progress', 'ix_user_progress_user_tutorial'):
+        op.create_index('ix_user_progress_user_tutorial', 'user_progress', ['user_id', 'tutorial_id'], unique=False)
+    if not has_index('sensor_data', 'ix_sensor_data_device_time'):
+        op.create_index('ix_sensor_data_device_time', 'sensor_data', ['device_id', 'timestamp'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_sensor_data_device_time', table_name='sensor_data')
+    op.drop_index('ix_user_progress_user_tutorial', table_name='user_progress')
+    op.drop_index('ix_user_stats_leaderboard', table_name='user_stats')
+    op.drop_table('user_stats')
+    op.drop_table('project_revisions')
+    op.drop_index('ix_projects_blocks_hash', table_name='projects')
+    with op.batch_alter_table('projects', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_projects_blocks_hash_blobs', type_='foreignkey')
+        batch_op.drop_column('blocks_hash')
+    op.drop_table('blobs')
@@ -0,0 +1,97 @@
+"""Move project workspaces into blobs
+
+Each projects.blocks text is compressed into a blob keyed by its SHA-256,
+shared by every project with the same workspace, and projects.blocks_hash
+points at it. The old column is dropped once every row is moved.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19 14:32:40
+"""
+
+import hashlib
+import zlib
+from collections import Counter
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+projects = sa.table(
+    'projects',
+    sa.column('id', sa.Integer),
+    sa.column('blocks', sa.Text),
+    sa.column('blocks_hash', sa.String),
+)
+blobs = sa.table(
+    'blobs',
+    sa.column('hash', sa.String),
+    sa.column('data', sa.LargeBinary),
+    sa.column('size', sa.Integer),
+    sa.column('ref_count', sa.Integer),
+    sa.column('created_at', sa.DateTime),
+)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if 'blocks' not in {column['name'] for column in sa.inspect(bind).get_columns('projects')}:
+        return
+
+    existing = set(bind.execute(sa.select(blobs.c.hash)).scalars())
+    references = Counter()
+    rows = bind.execute(
+        sa.select(projects.c.id, projects.c.blocks)
+        .where(projects.c.blocks.is_not(None), projects.c.blocks_hash.is_(None))
+    ).all()
+    for project_id, text in rows:
+        raw = text.encode('utf-8')
+        blob_hash = hashlib.sha256(raw).hexdigest()
+        if blob_hash not in existing:
+            bind.execute(blobs.insert().values(
+                hash=blob_hash, data=zlib.compress(raw), size=len(raw),
+                ref_count=0, created_at=datetime.utcnow(),
+            ))
+            existing.add(blob_hash)
+        references[blob_hash] += 1
+        bind.execute(
+            projects.update().where(projects.c.id == project_id).values(blocks_hash=blob_hash)
+        )
+    for blob_hash, count in references.items():
+        bind.execute(
+            blobs.update().where(blobs.c.hash == blob_hash)
+            .values(ref_count=blobs.c.ref_count + count)
+        )
+
+    with op.batch_alter_table('projects', schema=None) as batch_op:
+        batch_op.drop_column('blocks')
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('projects', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('blocks', sa.Text(), nullable=True))
+
+    bind = op.get_bind()
+    references = Counter()
+    rows = bind.execute(
+        sa.select(projects.c.id, blobs.c.hash, blobs.c.data)
+        .select_from(projects.join(blobs, projects.c.blocks_hash == blobs.c.hash))
+    ).all()
+    for project_id, blob_hash, data in rows:
+        bind.execute(
+            projects.update().where(projects.c.id == project_id)
+            .values(blocks=zlib.decompress(data).decode('utf-8'), blocks_hash=None)
+        )
+        references[blob_hash] += 1
+    for blob_hash, count in references.items():
+        bind.execute(
+            blobs.update().where(blobs.c.hash == blob_hash)
+            .values(ref_count=blobs.c.ref_count - count)
+        )
+    bind.execute(blobs.delete().where(blobs.c.ref_count <= 0))
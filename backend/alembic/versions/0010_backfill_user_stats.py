@@ -0,0 +1,57 @@
+"""Backfill learning stats from existing progress
+
+user_stats is only maintained as tutorials are completed, so users who
+finished tutorials before it existed get their row built here.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19 15:05:21
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+user_progress = sa.table(
+    'user_progress',
+    sa.column('user_id', sa.Integer),
+    sa.column('completed', sa.Boolean),
+    sa.column('completed_at', sa.DateTime),
+    sa.column('xp_earned', sa.Integer),
+)
+user_stats = sa.table(
+    'user_stats',
+    sa.column('user_id', sa.Integer),
+    sa.column('completed_count', sa.Integer),
+    sa.column('total_xp', sa.Integer),
+    sa.column('last_completed_at', sa.DateTime),
+)
+
+
+def upgrade() -> None:
+    totals = (
+        sa.select(
+            user_progress.c.user_id,
+            sa.func.count(),
+            sa.func.coalesce(sa.func.sum(user_progress.c.xp_earned), 0),
+            sa.func.max(user_progress.c.completed_at),
+        )
+        .where(
+            user_progress.c.completed == sa.true(),
+            user_progress.c.user_id.not_in(sa.select(user_stats.c.user_id)),
+        )
+        .group_by(user_progress.c.user_id)
+    )
+    op.execute(user_stats.insert().from_select(
+        ['user_id', 'completed_count', 'total_xp', 'last_completed_at'], totals
+    ))
+
+
+def downgrade() -> None:
+    # The rows are still valid aggregates of user_progress, so keep them
+    pass
@@ -0,0 +1,47 @@
+"""Register each MAC address once per owner
+
+Earlier registrations could repeat a MAC, so every duplicate but the
+oldest device of an owner has its MAC cleared before the constraint is
+added.
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-19 13:24:03
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0011'
+down_revision = '0010'
+branch_labels = None
+depends_on = None
+
+devices = sa.table(
+    'devices',
+    sa.column('id', sa.Integer),
+    sa.column('owner_id', sa.Integer),
+    sa.column('mac_address', sa.String),
+)
+
+
+def upgrade() -> None:
+    first = (
+        sa.select(sa.func.min(devices.c.id))
+        .where(devices.c.mac_address.is_not(None))
+        .group_by(devices.c.owner_id, devices.c.mac_address)
+    )
+    op.execute(
+        devices.update()
+        .where(devices.c.mac_address.is_not(None), devices.c.id.not_in(first))
+        .values(mac_address=None)
+    )
+
+    with op.batch_alter_table('devices', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_devices_owner_mac', ['owner_id', 'mac_address'])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('devices', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_devices_owner_mac', type_='unique')
@@ -0,0 +1,87 @@
+"""One progress row per user and tutorial
+
+Concurrent completions could insert the same (user_id, tutorial_id) twice
+and count it twice in user_stats. Duplicates are merged into one row,
+preferring a completed one, and the stats of the affected users are
+rebuilt from what is left before the index becomes unique.
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-19 16:02:47
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0012'
+down_revision = '0011'
+branch_labels = None
+depends_on = None
+
+user_progress = sa.table(
+    'user_progress',
+    sa.column('id', sa.Integer),
+    sa.column('user_id', sa.Integer),
+    sa.column('tutorial_id', sa.Integer),
+    sa.column('completed', sa.Boolean),
+    sa.column('completed_at', sa.DateTime),
+    sa.column('xp_earned', sa.Integer),
+)
+user_stats = sa.table(
+    'user_stats',
+    sa.column('user_id', sa.Integer),
+    sa.column('completed_count', sa.Integer),
+    sa.column('total_xp', sa.Integer),
+    sa.column('last_completed_at', sa.DateTime),
+)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(user_progress.c.id, user_progress.c.user_id, user_progress.c.tutorial_id)
+        .order_by(
+            user_progress.c.user_id,
+            user_progress.c.tutorial_id,
+            user_progress.c.completed.desc(),
+            user_progress.c.id,
+        )
+    ).all()
+    seen, duplicates, affected_users = set(), [], set()
+    for row_id, user_id, tutorial_id in rows:
+        if (user_id, tutorial_id) in seen:
+            duplicates.append(row_id)
+            affected_users.add(user_id)
+        seen.add((user_id, tutorial_id))
+    if duplicates:
+        bind.execute(user_progress.delete().where(user_progress.c.id.in_(duplicates)))
+
+    for user_id in affected_users:
+        completed_count, total_xp, last_completed_at = bind.execute(
+            sa.select(
+                sa.func.count(),
+                sa.func.coalesce(sa.func.sum(user_progress.c.xp_earned), 0),
+                sa.func.max(user_progress.c.completed_at),
+            ).where(
+                user_progress.c.user_id == user_id,
+                user_progress.c.completed == sa.true(),
+            )
+        ).one()
+        bind.execute(
+            user_stats.update().where(user_stats.c.user_id == user_id).values(
+                completed_count=completed_count,
+                total_xp=total_xp,
+                last_completed_at=last_completed_at,
+            )
+        )
+
+    with op.batch_alter_table('user_progress', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_progress_user_tutorial')
+        batch_op.create_index('ix_user_progress_user_tutorial', ['user_id', 'tutorial_id'], unique=True)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('user_progress', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_progress_user_tutorial')
+        batch_op.create_index('ix_user_progress_user_tutorial', ['user_id', 'tutorial_id'], unique=False)
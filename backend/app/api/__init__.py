@@ -2,7 +2,7 @@
 
 from fastapi import APIRouter
 
-from app.api.routes import auth, projects, devices, ai_models, code, tutorials
+from app.api.routes import auth, projects, devices, ai_models, code, tutorials, search, jobs, simulator, changes
 
 router = APIRouter()
 
@@ -12,3 +12,7 @@ router.include_router(devices.router, prefix="/devices", tags=["Devices"])
 router.include_router(ai_models.router, prefix="/ai-models", tags=["AI Models"])
 router.include_router(code.router, prefix="/code", tags=["Code Generation"])
 router.include_router(tutorials.router, prefix="/tutorials", tags=["Tutorials"])
+router.include_router(search.router, prefix="/search", tags=["Search"])
+router.include_router(jobs.router, prefix="/jobs", tags=["Jobs"])
+router.include_router(simulator.router, prefix="/simulator", tags=["Device Simulator"])
+router.include_router(changes.router, prefix="/changes", tags=["Changes"])
@@ -1,40 +1,117 @@
 """AI Model management routes"""
 
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+import asyncio
+import os
+import shutil
+import time
+import uuid
+from datetime import datetime
+from functools import partial
+from typing import List, Optional
+from fastapi import (
+    APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Request, status,
+)
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import and_, or_, select
+from starlette.concurrency import run_in_threadpool
 
-from app.core.database import get_db
-from app.core.security import get_current_user
-from app.models import AIModel
-from app.schemas import AIModelCreate, AIModelResponse
+from app.core.admission import admit
+from app.core.cache import response_cache
+from app.core.database import async_session, get_db
+from app.core.config import settings
+from app.core.security import get_current_user, get_optional_user
+from app.models import AIModel, Device, ModelBenchmark, ModelTraining, ModelUpload, SensorData
+from app.schemas import (
+    AIModelCreate, AIModelResponse, JobResponse, ModelBenchmarkRequest, ModelBenchmarkResponse,
+    ModelExportRequest, ModelExportResponse, ModelQuantizeRequest, ModelTestRequest,
+    ModelTestResponse, ModelTrainRequest, ModelUploadCreate, ModelUploadResponse,
+)
+from app.services.jobs import Job, JobError, jobs
+from app.services.ml.batching import batchers
+from app.services.ml.benchmark import host_description, run_benchmark
+from app.services.ml.c_export import c_symbol, device_budget, export_model
+from app.services.ml.cache import model_cache
+from app.services.ml.engine import ModelFormatError, resolve_model_path, sample_input, top_k
+from app.services.ml.images import ImageError, image_spec, preprocess_images
+from app.services.ml.quantize import quantize_and_evaluate, variant_path
+from app.services.ml.training import TrainingError, train_step, training_executor
+from app.services.ml.storage import (
+    ModelArchiveError, content_path, directory_size, extract_model_archive, format_size,
+    has_content, storage_path, upload_part_path,
+)
+from app.services.ml.uploads import (
+    ChunkError, ChunkOutOfOrder, discard_upload, receive_chunk, upload_digest, upload_lock,
+)
 
 router = APIRouter()
 
+CACHE_NAMESPACE = "ai_models"
+model_adapter = TypeAdapter(AIModelResponse)
+model_list_adapter = TypeAdapter(List[AIModelResponse])
+# Weights a test runs on; auto serves the int8 variant once there is one
+VARIANT_PATTERN = "^(auto|float32|int8)$"
+
+
+async def _get_visible_model(db: AsyncSession, model_id: int, current_user: Optional[dict]) -> AIModel:
+    """A public model, or one of the user's own; 404 for everyone else"""
+    result = await db.execute(select(AIModel).where(AIModel.id == model_id))
+    model = result.scalar_one_or_none()
+    user_id = int(current_user["sub"]) if current_user else None
+    if not model or not (model.is_public or model.owner_id == user_id):
+        raise HTTPException(status_code=404, detail="Model not found")
+    return model
+
 
 @router.get("/", response_model=List[AIModelResponse])
 async def list_models(
+    request: Request,
     model_type: str = None,
+    max_latency_ms: Optional[float] = Query(None, gt=0),
+    sort: str = Query("newest", pattern="^(newest|latency|-latency)$"),
     db: AsyncSession = Depends(get_db),
 ):
-    """List all available AI models"""
+    """List all available AI models, optionally by measured latency"""
+    cached = response_cache.get(CACHE_NAMESPACE, request)
+    if cached is not None:
+        return cached
+
     query = select(AIModel).where(AIModel.is_public == True)
     if model_type:
         query = query.where(AIModel.model_type == model_type)
+    if max_latency_ms is not None:
+        # Models never benchmarked are left out
+        query = query.where(AIModel.latency_ms <= max_latency_ms)
+    if sort == "newest":
+        query = query.order_by(AIModel.created_at.desc())
+    else:
+        latency = AIModel.latency_ms.asc() if sort == "latency" else AIModel.latency_ms.desc()
+        # Unmeasured models last either way
+        query = query.order_by(AIModel.latency_ms.is_(None), latency, AIModel.id)
     
-    result = await db.execute(query.order_by(AIModel.created_at.desc()))
-    return result.scalars().all()
+    result = await db.execute(query)
+    return response_cache.store(
+        CACHE_NAMESPACE, request, model_list_adapter, result.scalars().all()
+    )
 
 
 @router.get("/{model_id}", response_model=AIModelResponse)
-async def get_model(model_id: int, db: AsyncSession = Depends(get_db)):
-    """Get a specific AI model"""
-    result = await db.execute(select(AIModel).where(AIModel.id == model_id))
-    model = result.scalar_one_or_none()
-    if not model:
-        raise HTTPException(status_code=404, detail="Model not found")
-    return model
+async def get_model(
+    model_id: int,
+    request: Request,
+    current_user: Optional[dict] = Depends(get_optional_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Get a public AI model, or one of your own"""
+    # Only public models are cached, so a hit needs no ownership check
+    cached = response_cache.get(CACHE_NAMESPACE, request)
+    if cached is not None:
+        return cached
+
+    model = await _get_visible_model(db, model_id, current_user)
+    if not model.is_public:
+        return model
+    return response_cache.store(CACHE_NAMESPACE, request, model_adapter, model)
 
 
 @router.post("/", response_model=AIModelResponse)
@@ -55,38 +132,833 @@ async def create_model(
     db.add(model)
     await db.commit()
     await db.refresh(model)
+    response_cache.invalidate(CACHE_NAMESPACE)
     return model
 
 
-@router.post("/{model_id}/test")
+async def _load_for_test(
+    db: AsyncSession, model_id: int, variant: str, current_user: Optional[dict]
+):
+    """The model row, its loaded weights and the variant they are"""
+    model = await _get_visible_model(db, model_id, current_user)
+    if not model.file_path:
+        raise HTTPException(status_code=409, detail="Model has no weights file to run")
+    if variant == "auto":
+        variant = "int8" if model.quantized else "float32"
+    if variant == "int8" and not model.quantized:
+        raise HTTPException(status_code=409, detail="Model has no int8 variant; quantize it first")
+    path = model.quantized_path if variant == "int8" else model.file_path
+    try:
+        engine_model = await model_cache.get(resolve_model_path(path))
+    except (FileNotFoundError, ModelFormatError) as e:
+        raise HTTPException(status_code=409, detail=f"Model weights unavailable: {e}")
+    return model, engine_model, variant
+
+
+async def _run_test(
+    model: AIModel,
+    engine_model,
+    variant: str,
+    batch,
+    k: int,
+    start: float,
+    preprocess_ms: Optional[float] = None,
+) -> ModelTestResponse:
+    try:
+        # Merged with concurrent requests to the same model
+        outputs = await batchers.predict(engine_model, batch)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    latency_ms = (time.perf_counter() - start) * 1000
+
+    predictions = top_k(engine_model, outputs, k)
+    best = predictions[0][0]
+    return ModelTestResponse(
+        model=model.name,
+        status="success",
+        result=f"Test prediction: {best.get('label', best.get('value'))}",
+        confidence=best.get("confidence"),
+        predictions=predictions,
+        latency_ms=round(latency_ms, 3),
+        preprocess_ms=preprocess_ms,
+        variant=variant,
+    )
+
+
+@router.post(
+    "/{model_id}/test",
+    response_model=ModelTestResponse,
+    dependencies=[Depends(admit("inference"))],
+)
 async def test_model(
     model_id: int,
+    payload: Optional[ModelTestRequest] = None,
+    variant: str = Query("auto", pattern=VARIANT_PATTERN),
+    current_user: Optional[dict] = Depends(get_optional_user),
     db: AsyncSession = Depends(get_db),
 ):
-    """Test an AI model with sample data"""
-    result = await db.execute(select(AIModel).where(AIModel.id == model_id))
+    """Run a public or own AI model on a batch of inputs, or on a generated sample"""
+    payload = payload or ModelTestRequest()
+    if payload.inputs is not None and not 1 <= len(payload.inputs) <= settings.MODEL_TEST_MAX_BATCH:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Send between 1 and {settings.MODEL_TEST_MAX_BATCH} inputs",
+        )
+    model, engine_model, variant = await _load_for_test(db, model_id, variant, current_user)
+
+    start = time.perf_counter()
+    batch = payload.inputs if payload.inputs is not None else sample_input(engine_model)
+    return await _run_test(model, engine_model, variant, batch, payload.top_k, start)
+
+
+@router.post(
+    "/{model_id}/test/images",
+    response_model=ModelTestResponse,
+    dependencies=[Depends(admit("inference"))],
+)
+async def test_model_images(
+    model_id: int,
+    images: List[UploadFile] = File(...),
+    k: int = Form(3, alias="top_k", ge=1, le=20),
+    variant: str = Query("auto", pattern=VARIANT_PATTERN),
+    current_user: Optional[dict] = Depends(get_optional_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Run a public or own vision model on a batch of uploaded images (JPEG, PNG, ...)"""
+    if not 1 <= len(images) <= settings.MODEL_TEST_MAX_BATCH:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Send between 1 and {settings.MODEL_TEST_MAX_BATCH} images",
+        )
+    model, engine_model, variant = await _load_for_test(db, model_id, variant, current_user)
+    try:
+        spec = image_spec(engine_model)
+    except ImageError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    encoded = []
+    for image in images:
+        data = await image.read(settings.IMAGE_MAX_BYTES + 1)
+        if len(data) > settings.IMAGE_MAX_BYTES:
+            raise HTTPException(
+                status_code=413,
+                detail=f"{image.filename} is larger than {format_size(settings.IMAGE_MAX_BYTES)}",
+            )
+        encoded.append(data)
+
+    start = time.perf_counter()
+    try:
+        batch = await preprocess_images(encoded, spec)
+    except ImageError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    preprocess_ms = round((time.perf_counter() - start) * 1000, 3)
+    return await _run_test(model, engine_model, variant, batch, k, start, preprocess_ms)
+
+
+async def _quantize_job(model_id: int, payload: ModelQuantizeRequest, job: Job) -> dict:
+    async with async_session() as db:
+        model = await db.get(AIModel, model_id)
+        if model is None or not model.file_path:
+            raise JobError("Model has no weights file to quantize")
+        try:
+            original = await model_cache.get(resolve_model_path(model.file_path))
+            report = await run_in_threadpool(
+                quantize_and_evaluate,
+                original,
+                payload.inputs,
+                payload.labels,
+                settings.MODEL_QUANTIZE_CALIBRATION_SAMPLES,
+            )
+        except (FileNotFoundError, ValueError) as e:
+            raise JobError(str(e))
+
+        quantized_path = variant_path(model.file_path)
+        model.size = format_size(directory_size(resolve_model_path(quantized_path)))
+        if "int8_accuracy" in report:
+            model.accuracy = round(report["int8_accuracy"], 2)
+        elif model.accuracy is not None and "accuracy_delta" in report and not model.quantized:
+            # Estimated from prediction agreement; applied once to the float accuracy
+            model.accuracy = round(max(model.accuracy + report["accuracy_delta"], 0.0), 2)
+        model.quantized_path = quantized_path
+        # Measured on the float weights, which are no longer served
+        model.latency_ms = None
+        await db.commit()
+    response_cache.invalidate(CACHE_NAMESPACE)
+    return report
+
+
+@router.post(
+    "/{model_id}/quantize",
+    response_model=JobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(admit("jobs"))],
+)
+async def quantize_model(
+    model_id: int,
+    payload: Optional[ModelQuantizeRequest] = None,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Start an int8 quantization job; poll /api/jobs/{id} for the accuracy report"""
+    user_id = int(current_user["sub"])
+    result = await db.execute(
+        select(AIModel).where(AIModel.id == model_id, AIModel.owner_id == user_id)
+    )
     model = result.scalar_one_or_none()
     if not model:
         raise HTTPException(status_code=404, detail="Model not found")
+    if not model.file_path:
+        raise HTTPException(status_code=409, detail="Model has no weights file to quantize")
+
+    payload = payload or ModelQuantizeRequest()
+    if payload.inputs is not None and not 1 <= len(payload.inputs) <= settings.MODEL_QUANTIZE_MAX_SAMPLES:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Send between 1 and {settings.MODEL_QUANTIZE_MAX_SAMPLES} calibration inputs",
+        )
+    if payload.labels is not None and payload.inputs is None:
+        raise HTTPException(status_code=422, detail="Labels need calibration inputs")
+
+    # One quantization per model at a time; a repeated request joins it
+    job = jobs.active("quantize", model_id)
+    if job is None:
+        job = jobs.submit(
+            "quantize", user_id, partial(_quantize_job, model_id, payload), target_id=model_id
+        )
+    return job
+
+
+async def _benchmark_job(
+    model_id: int, payload: ModelBenchmarkRequest, thread_counts: List[int], job: Job
+) -> dict:
+    async with async_session() as db:
+        model = await db.get(AIModel, model_id)
+        if model is None or not model.file_path:
+            raise JobError("Model has no weights file to benchmark")
+        served = "int8" if model.quantized else "float32"
+        if payload.variant == "all":
+            variants = ["float32", "int8"] if model.quantized else ["float32"]
+        elif payload.variant == "auto":
+            variants = [served]
+        elif payload.variant == "int8" and not model.quantized:
+            raise JobError("Model has no int8 variant; quantize it first")
+        else:
+            variants = [payload.variant]
+
+        host = host_description()
+        results = []
+        for index, variant in enumerate(variants):
+            path = model.quantized_path if variant == "int8" else model.file_path
+            try:
+                engine_model = await model_cache.get(resolve_model_path(path))
+            except (FileNotFoundError, ModelFormatError) as e:
+                raise JobError(f"Model weights unavailable: {e}")
+
+            def progress(fraction: float, index: int = index) -> None:
+                job.progress = (index + fraction) / len(variants)
+
+            measured = await run_in_threadpool(
+                run_benchmark,
+                engine_model,
+                payload.batch_sizes,
+                thread_counts,
+                payload.iterations,
+                payload.warmup,
+                progress,
+            )
+            results += [{"variant": variant, **row} for row in measured]
+
+        # One timestamp per run keeps its rows together in listings
+        measured_at = datetime.utcnow()
+        db.add_all(
+            ModelBenchmark(
+                model_id=model_id, run_id=job.id, host=host, created_at=measured_at, **row
+            )
+            for row in results
+        )
+        # The headline number list_models filters and sorts by
+        for row in results:
+            if row["variant"] == served and row["batch_size"] == 1 and row["threads"] == 1:
+                model.latency_ms = row["p50_ms"]
+        await db.commit()
+    response_cache.invalidate(CACHE_NAMESPACE)
+    return {"run_id": job.id, "host": host, "results": results}
+
+
+@router.post(
+    "/{model_id}/benchmark",
+    response_model=JobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(admit("jobs"))],
+)
+async def benchmark_model(
+    model_id: int,
+    payload: Optional[ModelBenchmarkRequest] = None,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Start a latency/throughput benchmark job for a public or own model"""
+    model = await _get_visible_model(db, model_id, current_user)
+    if not model.file_path:
+        raise HTTPException(status_code=409, detail="Model has no weights file to benchmark")
+
+    payload = payload or ModelBenchmarkRequest()
+    thread_counts = payload.threads or sorted({1, os.cpu_count() or 1})
+    if not all(1 <= b <= settings.MODEL_BENCHMARK_MAX_BATCH for b in payload.batch_sizes):
+        raise HTTPException(
+            status_code=422,
+            detail=f"Batch sizes must be between 1 and {settings.MODEL_BENCHMARK_MAX_BATCH}",
+        )
+    if not all(1 <= t <= settings.MODEL_BENCHMARK_MAX_THREADS for t in thread_counts):
+        raise HTTPException(
+            status_code=422,
+            detail=f"Thread counts must be between 1 and {settings.MODEL_BENCHMARK_MAX_THREADS}",
+        )
+    samples = sum(payload.batch_sizes) * sum(thread_counts) * (payload.iterations + payload.warmup)
+    if payload.variant == "all":
+        samples *= 2
+    if samples > settings.MODEL_BENCHMARK_MAX_SAMPLES:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Benchmark would run {samples} samples; "
+            f"at most {settings.MODEL_BENCHMARK_MAX_SAMPLES} are allowed",
+        )
+
+    # Concurrent runs on one model would skew each other's timings
+    if jobs.active("benchmark", model_id) is not None:
+        raise HTTPException(status_code=409, detail="A benchmark of this model is already running")
+    return jobs.submit(
+        "benchmark",
+        int(current_user["sub"]),
+        partial(_benchmark_job, model_id, payload, thread_counts),
+        target_id=model_id,
+    )
+
+
+@router.get("/{model_id}/benchmarks", response_model=List[ModelBenchmarkResponse])
+async def list_model_benchmarks(
+    model_id: int,
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: Optional[dict] = Depends(get_optional_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Stored benchmark results of a public or own model, newest run first"""
+    await _get_visible_model(db, model_id, current_user)
+    result = await db.execute(
+        select(ModelBenchmark)
+        .where(ModelBenchmark.model_id == model_id)
+        .order_by(
+            ModelBenchmark.created_at.desc(),
+            ModelBenchmark.variant,
+            ModelBenchmark.batch_size,
+            ModelBenchmark.threads,
+        )
+        .limit(limit)
+    )
+    return result.scalars().all()
+
+
+@router.post(
+    "/{model_id}/export/c",
+    response_model=ModelExportResponse,
+    dependencies=[Depends(admit("codegen"))],
+)
+async def export_model_c(
+    model_id: int,
+    payload: Optional[ModelExportRequest] = None,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Export a public or own model as a C header for on-device int8 inference"""
+    model = await _get_visible_model(db, model_id, current_user)
+
+    payload = payload or ModelExportRequest()
+    if payload.inputs is not None and not 1 <= len(payload.inputs) <= settings.MODEL_QUANTIZE_MAX_SAMPLES:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Send between 1 and {settings.MODEL_QUANTIZE_MAX_SAMPLES} calibration inputs",
+        )
+    # The int8 variant when there is one; its weights export unchanged
+    model, engine_model, _ = await _load_for_test(db, model_id, "auto", current_user)
+    target = payload.target_device.value if payload.target_device else None
+    try:
+        export = await run_in_threadpool(
+            export_model,
+            engine_model,
+            c_symbol(model.name, model.id),
+            model.name,
+            target,
+            payload.inputs,
+            settings.MODEL_QUANTIZE_CALIBRATION_SAMPLES,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return ModelExportResponse(
+        filename=export.filename,
+        symbol=export.symbol,
+        header=export.header,
+        flash_bytes=export.flash_bytes,
+        ram_bytes=export.ram_bytes,
+        target_device=payload.target_device,
+        budget=device_budget(target),
+        report=export.report,
+    )
+
+
+# Forecasting models fit to a device's sensor readings. POST /train creates
+# the model and its first fit; POST /{id}/train fits readings that arrived
+# since, or all of them again with ?full=true.
+
+TRAINED_DIR = "trained"
+
+
+async def _new_readings(db: AsyncSession, training: ModelTraining):
+    """(id, timestamp, value) of readings after the training cursor, oldest first"""
+    query = select(SensorData.id, SensorData.timestamp, SensorData.value).where(
+        SensorData.device_id == training.device_id,
+        SensorData.sensor_type == training.sensor_type,
+    )
+    if training.last_timestamp is not None:
+        query = query.where(
+            or_(
+                SensorData.timestamp > training.last_timestamp,
+                and_(
+                    SensorData.timestamp == training.last_timestamp,
+                    SensorData.id > training.last_reading_id,
+                ),
+            )
+        )
+    result = await db.execute(
+        query.order_by(SensorData.timestamp, SensorData.id).limit(
+            settings.MODEL_TRAINING_MAX_READINGS
+        )
+    )
+    return result.all()
+
+
+async def _train_job(model_id: int, full: bool, job: Job) -> dict:
+    async with async_session() as db:
+        model = await db.get(AIModel, model_id)
+        training = await db.get(ModelTraining, model_id)
+        if model is None or training is None:
+            raise JobError("Model is not trained from sensor readings")
+        old_path = model.file_path
+        previous = None if full else old_path
+        if previous is None:
+            training.samples, training.last_timestamp, training.last_reading_id = 0, None, None
+
+        readings = await _new_readings(db, training)
+        if not readings:
+            return {"model_id": model_id, "readings": 0, "windows": 0, "samples": training.samples}
+        params = {
+            "algorithm": training.algorithm,
+            "lags": training.lags,
+            "alpha": training.alpha,
+            "learning_rate": training.learning_rate,
+            "epochs": training.epochs,
+        }
+        # Each fit writes a new directory; requests may still read the previous one
+        relative = f"{TRAINED_DIR}/{model_id}/{uuid.uuid4().hex}"
+        os.makedirs(os.path.dirname(storage_path(relative)), exist_ok=True)
+        loop = asyncio.get_running_loop()
+        try:
+            report = await loop.run_in_executor(
+                training_executor(),
+                train_step,
+                previous and resolve_model_path(previous),
+                storage_path(relative),
+                [value for _, _, value in readings],
+                params,
+            )
+        except (TrainingError, FileNotFoundError) as e:
+            raise JobError(str(e))
 
-    # Simulated test result
-    return {
-        "model": model.name,
-        "status": "success",
-        "result": "Test prediction: sample_class",
-        "confidence": 0.95,
-    }
+        model.file_path = relative
+        model.quantized_path = None
+        model.latency_ms = None
+        model.size = format_size(directory_size(storage_path(relative)))
+        if report.get("r2") is not None:
+            # R^2 on the newest readings, as a percentage
+            model.accuracy = round(max(report["r2"], 0.0) * 100, 2)
+        training.samples = report["samples"]
+        training.last_reading_id, training.last_timestamp = readings[-1][0], readings[-1][1]
+        await db.commit()
+    response_cache.invalidate(CACHE_NAMESPACE)
+    if old_path is not None and old_path.startswith(f"{TRAINED_DIR}/"):
+        await run_in_threadpool(shutil.rmtree, resolve_model_path(old_path), True)
+    return {"model_id": model_id, "readings": len(readings), **report}
 
 
-@router.post("/upload")
+@router.post(
+    "/train",
+    response_model=JobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(admit("jobs"))],
+)
+async def train_model(
+    payload: ModelTrainRequest,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Create a forecasting model of one of your devices' sensors and start its first fit"""
+    user_id = int(current_user["sub"])
+    result = await db.execute(
+        select(Device.id).where(Device.id == payload.device_id, Device.owner_id == user_id)
+    )
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Device not found")
+
+    model = AIModel(
+        name=payload.name,
+        model_type="prediction",
+        description=payload.description,
+        owner_id=user_id,
+        is_pretrained=False,
+        # Trained on private readings
+        is_public=False,
+    )
+    db.add(model)
+    await db.flush()
+    db.add(
+        ModelTraining(
+            model_id=model.id,
+            **payload.model_dump(exclude={"name", "description"}),
+        )
+    )
+    await db.commit()
+    response_cache.invalidate(CACHE_NAMESPACE)
+    return jobs.submit("train", user_id, partial(_train_job, model.id, False), target_id=model.id)
+
+
+@router.post(
+    "/{model_id}/train",
+    response_model=JobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(admit("jobs"))],
+)
+async def update_trained_model(
+    model_id: int,
+    full: bool = False,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Fit the readings that arrived since the last fit (or all of them with full=true)"""
+    user_id = int(current_user["sub"])
+    result = await db.execute(
+        select(AIModel).where(AIModel.id == model_id, AIModel.owner_id == user_id)
+    )
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Model not found")
+    if await db.get(ModelTraining, model_id) is None:
+        raise HTTPException(status_code=409, detail="Model is not trained from sensor readings")
+
+    # Fits of one model run one at a time; a repeated request joins the running one
+    job = jobs.active("train", model_id)
+    if job is None:
+        job = jobs.submit("train", user_id, partial(_train_job, model_id, full), target_id=model_id)
+    return job
+
+
+# Chunked model uploads: POST /uploads, PUT /uploads/{id}/chunks/{n} for
+# n = next_chunk .. total_chunks - 1, then POST /uploads/{id}/complete.
+# An interrupted upload resumes from the next_chunk of GET /uploads/{id}.
+
+
+def _upload_response(upload: ModelUpload, model: Optional[AIModel] = None) -> ModelUploadResponse:
+    return ModelUploadResponse(
+        upload_id=upload.id,
+        filename=upload.filename,
+        size=upload.total_size,
+        chunk_size=upload.chunk_size,
+        received_bytes=upload.received_bytes,
+        next_chunk=upload.next_chunk,
+        total_chunks=upload.total_chunks,
+        status=upload.status,
+        sha256=upload.sha256,
+        model=model_adapter.validate_python(model) if model is not None else None,
+    )
+
+
+async def _get_upload(db: AsyncSession, upload_id: str, user_id: int) -> ModelUpload:
+    result = await db.execute(
+        select(ModelUpload).where(ModelUpload.id == upload_id, ModelUpload.owner_id == user_id)
+    )
+    upload = result.scalar_one_or_none()
+    if not upload:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return upload
+
+
+async def _start_upload(
+    db: AsyncSession, payload: ModelUploadCreate, user_id: int
+) -> ModelUpload:
+    if payload.size > settings.MODEL_UPLOAD_MAX_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Models may be at most {format_size(settings.MODEL_UPLOAD_MAX_BYTES)}",
+        )
+    chunk_size = payload.chunk_size or settings.MODEL_UPLOAD_CHUNK_SIZE
+    if not settings.MODEL_UPLOAD_MIN_CHUNK_SIZE <= chunk_size <= settings.MODEL_UPLOAD_MAX_CHUNK_SIZE:
+        raise HTTPException(
+            status_code=422,
+            detail=f"chunk_size must be between {settings.MODEL_UPLOAD_MIN_CHUNK_SIZE} "
+            f"and {settings.MODEL_UPLOAD_MAX_CHUNK_SIZE} bytes",
+        )
+    if payload.model_id is not None:
+        result = await db.execute(
+            select(AIModel.id).where(AIModel.id == payload.model_id, AIModel.owner_id == user_id)
+        )
+        if result.scalar_one_or_none() is None:
+            raise HTTPException(status_code=404, detail="Model not found")
+
+    upload = ModelUpload(
+        id=uuid.uuid4().hex,
+        owner_id=user_id,
+        filename=payload.filename,
+        total_size=payload.size,
+        chunk_size=chunk_size,
+        received_bytes=0,
+        expected_sha256=payload.sha256.lower() if payload.sha256 else None,
+        status="uploading",
+        name=payload.name or os.path.splitext(os.path.basename(payload.filename))[0],
+        model_type=payload.model_type,
+        description=payload.description,
+        model_id=payload.model_id,
+    )
+    db.add(upload)
+    return upload
+
+
+async def _attach_model(
+    db: AsyncSession, upload: ModelUpload, digest: str, relative: str
+) -> AIModel:
+    """Point a new or the target model at stored content and close the upload"""
+    if upload.model_id is not None:
+        model = await db.get(AIModel, upload.model_id)
+    else:
+        model = AIModel(
+            name=upload.name,
+            model_type=upload.model_type,
+            description=upload.description,
+            owner_id=upload.owner_id,
+            is_pretrained=False,
+        )
+        db.add(model)
+    model.file_path = relative
+    # A variant quantized from, and timings of, the previous weights no longer apply
+    model.quantized_path = None
+    model.latency_ms = None
+    model.size = format_size(directory_size(storage_path(relative)))
+    upload.sha256 = digest
+    upload.received_bytes = upload.total_size
+    upload.status = "complete"
+    await db.flush()
+    upload.model_id = model.id
+    await db.commit()
+    await db.refresh(model)
+    response_cache.invalidate(CACHE_NAMESPACE)
+    return model
+
+
+async def _complete_upload(db: AsyncSession, upload: ModelUpload) -> AIModel:
+    if upload.received_bytes != upload.total_size:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Upload is incomplete; next chunk is {upload.next_chunk}",
+        )
+    digest = await upload_digest(upload)
+    try:
+        if upload.expected_sha256 and digest != upload.expected_sha256:
+            raise HTTPException(
+                status_code=422,
+                detail=f"Checksum mismatch: expected {upload.expected_sha256}, got {digest}",
+            )
+        # Identical archives are stored and validated once
+        relative = await run_in_threadpool(
+            extract_model_archive, upload_part_path(upload.id), digest
+        )
+    except (ModelArchiveError, ModelFormatError) as e:
+        await _abort_upload(db, upload)
+        raise HTTPException(status_code=422, detail=f"Invalid model archive: {e}")
+    except HTTPException:
+        await _abort_upload(db, upload)
+        raise
+    model = await _attach_model(db, upload, digest, relative)
+    discard_upload(upload.id)
+    return model
+
+
+async def _owns_content(db: AsyncSession, user_id: int, digest: str) -> bool:
+    """Whether one of the user's models already uses the stored archive with this digest
+
+    A hash alone proves nothing, so anyone else has to send the bytes;
+    extraction then reuses the stored copy.
+    """
+    if not has_content(digest):
+        return False
+    result = await db.execute(
+        select(AIModel.id)
+        .where(AIModel.owner_id == user_id, AIModel.file_path == content_path(digest))
+        .limit(1)
+    )
+    return result.scalar_one_or_none() is not None
+
+
+async def _abort_upload(db: AsyncSession, upload: ModelUpload) -> None:
+    discard_upload(upload.id)
+    await db.delete(upload)
+    await db.commit()
+
+
+@router.post(
+    "/uploads",
+    response_model=ModelUploadResponse,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(admit("upload"))],
+)
+async def start_model_upload(
+    payload: ModelUploadCreate,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Start a chunked model upload"""
+    user_id = int(current_user["sub"])
+    upload = await _start_upload(db, payload, user_id)
+    if upload.expected_sha256 and await _owns_content(db, user_id, upload.expected_sha256):
+        # The user already has these weights: no bytes need to be sent
+        model = await _attach_model(
+            db, upload, upload.expected_sha256, content_path(upload.expected_sha256)
+        )
+        return _upload_response(upload, model)
+    await db.commit()
+    return _upload_response(upload)
+
+
+@router.get("/uploads/{upload_id}", response_model=ModelUploadResponse)
+async def get_model_upload(
+    upload_id: str,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Progress of a chunked upload, to resume it from next_chunk"""
+    upload = await _get_upload(db, upload_id, int(current_user["sub"]))
+    model = await db.get(AIModel, upload.model_id) if upload.status == "complete" else None
+    return _upload_response(upload, model)
+
+
+@router.put(
+    "/uploads/{upload_id}/chunks/{index}",
+    response_model=ModelUploadResponse,
+    dependencies=[Depends(admit("upload_chunk"))],
+)
+async def upload_model_chunk(
+    upload_id: str,
+    index: int,
+    request: Request,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Upload one chunk; the raw request body is the chunk's bytes"""
+    user_id = int(current_user["sub"])
+    async with upload_lock(upload_id):
+        upload = await _get_upload(db, upload_id, user_id)
+        if upload.status != "uploading":
+            raise HTTPException(status_code=409, detail="Upload is already complete")
+        try:
+            received = await receive_chunk(upload, index, request.stream())
+        except ChunkOutOfOrder as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        except ChunkError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if received:
+            await db.commit()
+    return _upload_response(upload)
+
+
+@router.post(
+    "/uploads/{upload_id}/complete",
+    response_model=ModelUploadResponse,
+    dependencies=[Depends(admit("upload"))],
+)
+async def complete_model_upload(
+    upload_id: str,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Verify and unpack a fully uploaded archive and attach it to a model"""
+    user_id = int(current_user["sub"])
+    async with upload_lock(upload_id):
+        upload = await _get_upload(db, upload_id, user_id)
+        if upload.status == "complete":
+            model = await db.get(AIModel, upload.model_id)
+        else:
+            model = await _complete_upload(db, upload)
+    return _upload_response(upload, model)
+
+
+@router.delete("/uploads/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def abort_model_upload(
+    upload_id: str,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Abort an upload and delete the bytes received so far"""
+    async with upload_lock(upload_id):
+        upload = await _get_upload(db, upload_id, int(current_user["sub"]))
+        await _abort_upload(db, upload)
+
+
+async def _read_upload_file(file: UploadFile, length: int):
+    remaining = length
+    while remaining:
+        data = await file.read(min(remaining, 1024 * 1024))
+        if not data:
+            return
+        remaining -= len(data)
+        yield data
+
+
+@router.post(
+    "/upload",
+    response_model=ModelUploadResponse,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(admit("upload"))],
+)
 async def upload_model(
     file: UploadFile = File(...),
+    name: Optional[str] = Form(None),
+    model_type: str = Form("vision"),
+    description: Optional[str] = Form(None),
     current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
 ):
-    """Upload a custom AI model file"""
-    # In production, this would save the file and process it
-    return {
-        "status": "success",
-        "filename": file.filename,
-        "message": "Model uploaded successfully",
-    }
+    """Upload a model archive (.zip or .tar.gz of a model directory) in one request"""
+    size = file.size
+    if size is None:
+        size = await run_in_threadpool(file.file.seek, 0, os.SEEK_END)
+        await file.seek(0)
+    if not size:
+        raise HTTPException(status_code=422, detail="The uploaded file is empty")
+    upload = await _start_upload(
+        db,
+        ModelUploadCreate(
+            filename=file.filename or "model",
+            size=size,
+            chunk_size=settings.MODEL_UPLOAD_MAX_CHUNK_SIZE,
+            name=name,
+            model_type=model_type,
+            description=description,
+        ),
+        int(current_user["sub"]),
+    )
+    await db.commit()
+    try:
+        # Same path as chunked uploads, chunk by chunk from the spooled file
+        for index in range(upload.total_chunks):
+            chunk = min(upload.chunk_size, upload.total_size - upload.received_bytes)
+            await receive_chunk(upload, index, _read_upload_file(file, chunk))
+    except ChunkError as e:
+        await _abort_upload(db, upload)
+        raise HTTPException(status_code=400, detail=str(e))
+    model = await _complete_upload(db, upload)
+    return _upload_response(upload, model)
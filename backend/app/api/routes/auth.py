@@ -3,9 +3,11 @@
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
+from app.core.admission import admit
 from app.core.database import get_db
 from app.core.security import (
     verify_password,
@@ -20,7 +22,9 @@ from app.schemas import UserCreate, UserResponse, Token, LoginRequest
 router = APIRouter()
 
 
-@router.post("/register", response_model=UserResponse)
+@router.post(
+    "/register", response_model=UserResponse, dependencies=[Depends(admit("auth"))]
+)
 async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     """Register a new user"""
     # Check if user exists
@@ -35,7 +39,8 @@ async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     user = User(
         email=user_data.email,
         name=user_data.name,
-        hashed_password=get_password_hash(user_data.password),
+        # bcrypt is deliberately slow; hash off the event loop
+        hashed_password=await run_in_threadpool(get_password_hash, user_data.password),
     )
     db.add(user)
     await db.commit()
@@ -43,7 +48,7 @@ async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     return user
 
 
-@router.post("/login", response_model=Token)
+@router.post("/login", response_model=Token, dependencies=[Depends(admit("auth"))])
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: AsyncSession = Depends(get_db),
@@ -52,7 +57,9 @@ async def login(
     result = await db.execute(select(User).where(User.email == form_data.username))
     user = result.scalar_one_or_none()
 
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await run_in_threadpool(
+        verify_password, form_data.password, user.hashed_password
+    ):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
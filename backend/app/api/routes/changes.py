@@ -0,0 +1,75 @@
+"""Change feed routes"""
+
+import asyncio
+import json
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, Query, Request
+from fastapi.responses import StreamingResponse
+
+from app.core.config import settings
+from app.core.security import get_stream_user
+from app.services.changes import change_journal
+
+router = APIRouter()
+
+# Reconnect delay suggested to EventSource clients
+RETRY_MS = 3000
+
+
+def _event(event: str, data: dict, seq: Optional[int] = None) -> str:
+    lines = [f"event: {event}"]
+    if seq is not None:
+        lines.append(f"id: {change_journal.event_id(seq)}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+@router.get("/")
+async def stream_changes(
+    request: Request,
+    last_event_id: Optional[str] = Header(None),
+    since: Optional[str] = Query(None, description="Event id to resume after, for clients that cannot send Last-Event-ID"),
+    current_user: dict = Depends(get_stream_user),
+):
+    """Server-sent events for changes to your devices and projects
+
+    Events are device.created/updated/deleted and
+    project.created/updated/deleted. Each carries the resource as the
+    list endpoints return it (projects without their blocks), or just the
+    id when it was deleted. A reset event means changes were missed:
+    reload the lists, then keep reading.
+    """
+    user_id = int(current_user["sub"])
+    resume_id = last_event_id or since
+    seq = change_journal.resume_point(resume_id)
+
+    async def events():
+        nonlocal seq
+        signal = change_journal.subscribe(user_id)
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            if seq is None:
+                seq = change_journal.last_seq
+                yield _event("reset", {"reason": "missed changes"}, seq)
+            elif not resume_id:
+                yield _event("ready", {}, seq)
+            while True:
+                signal.clear()
+                changes, seq = change_journal.since(user_id, seq)
+                for change in changes:
+                    yield _event(change.event, change.data, change.seq)
+                try:
+                    await asyncio.wait_for(signal.wait(), settings.CHANGE_FEED_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": keepalive\n\n"
+        finally:
+            change_journal.unsubscribe(user_id, signal)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,34 +1,98 @@
 """Code generation routes"""
 
-from fastapi import APIRouter, HTTPException
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app.core.admission import admit
+from app.core.database import get_db
+from app.core.security import get_optional_user
+from app.models import AIModel
 from app.schemas import CodeGenerationRequest, CodeGenerationResponse
-from app.services.code_generator import CodeGenerator
+from app.services.code_generator import CodeGenerator, model_references
+from app.services.ml.c_export import ExportError, c_symbol, export_model
+from app.services.ml.cache import model_cache
+from app.services.ml.engine import ModelFormatError, resolve_model_path
 
 router = APIRouter()
 
 
-@router.post("/generate", response_model=CodeGenerationResponse)
-async def generate_code(request: CodeGenerationRequest):
-    """Generate code from Blockly XML"""
+async def _export_models(
+    db: AsyncSession, user_id: Optional[int], blocks: str, target_device: Optional[str]
+) -> Tuple[Dict[str, str], Dict[str, str], List[str]]:
+    """Headers of the stored models a cpp workspace classifies with
+
+    Returns header symbols by MODEL field value, header files by name, and
+    warnings for models that stay in the cloud.
+    """
+    symbols: Dict[str, str] = {}
+    files: Dict[str, str] = {}
+    warnings: List[str] = []
+    for model_id in await run_in_threadpool(model_references, blocks):
+        model = await db.get(AIModel, model_id)
+        if model is None or not (model.is_public or model.owner_id == user_id) or not model.file_path:
+            warnings.append(f"Model {model_id} is not available on the device; classifying in the cloud")
+            continue
+        try:
+            engine_model = await model_cache.get(
+                resolve_model_path(model.quantized_path or model.file_path)
+            )
+            export = await run_in_threadpool(
+                export_model, engine_model, c_symbol(model.name, model.id), model.name, target_device
+            )
+        except (FileNotFoundError, ModelFormatError, ExportError) as e:
+            warnings.append(f"{model.name} is classified in the cloud: {e}")
+            continue
+        symbols[f"model:{model_id}"] = export.symbol
+        files[export.filename] = export.header
+    return symbols, files, warnings
+
+
+@router.post(
+    "/generate",
+    response_model=CodeGenerationResponse,
+    dependencies=[Depends(admit("codegen"))],
+)
+async def generate_code(
+    request: CodeGenerationRequest,
+    current_user: Optional[dict] = Depends(get_optional_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Generate code from Blockly XML
+
+    For cpp, image classification with a stored model ("model:<id>") runs
+    on the device: the model is exported as a C header, returned in files
+    and included by the sketch.
+    """
     try:
-        generator = CodeGenerator(request.language, request.target_device)
-        code, warnings = generator.generate(request.blocks)
+        symbols, files, export_warnings = {}, {}, []
+        if request.language == "cpp":
+            user_id = int(current_user["sub"]) if current_user else None
+            symbols, files, export_warnings = await _export_models(
+                db, user_id, request.blocks, request.target_device
+            )
+        generator = CodeGenerator(request.language, request.target_device, symbols)
+        # Large workspaces are CPU-bound; keep them off the event loop
+        code, warnings = await run_in_threadpool(generator.generate, request.blocks)
         return CodeGenerationResponse(
             code=code,
             language=request.language,
-            warnings=warnings,
+            warnings=export_warnings + warnings,
+            files=files,
         )
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Code generation failed: {str(e)}")
 
 
-@router.post("/validate")
+@router.post("/validate", dependencies=[Depends(admit("codegen"))])
 async def validate_code(request: CodeGenerationRequest):
     """Validate generated code"""
     try:
         generator = CodeGenerator(request.language, request.target_device)
-        code, warnings = generator.generate(request.blocks)
-        is_valid = generator.validate(code)
+        code, warnings = await run_in_threadpool(generator.generate, request.blocks)
+        is_valid = await run_in_threadpool(generator.validate, code)
         return {
             "valid": is_valid,
             "warnings": warnings,
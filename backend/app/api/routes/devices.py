@@ -1,18 +1,63 @@
 """Device management routes"""
 
-from typing import List
+import asyncio
+from functools import partial
+from typing import Iterable, List, Optional
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status
+import httpx
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, UploadFile, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, insert, update, delete
+from sqlalchemy.exc import IntegrityError
+from pydantic import TypeAdapter
+from starlette.concurrency import run_in_threadpool
 
-from app.core.database import get_db
+from app.core.admission import admit
+from app.core.config import settings
+from app.core.database import async_session, get_db
+from app.core.responses import model_response
 from app.core.security import get_current_user
-from app.models import Device, DeviceStatus
-from app.schemas import DeviceCreate, DeviceUpdate, DeviceResponse
+from app.models import Device, DeviceCommand, DeviceStatus, ModelTraining, SensorData
+from app.schemas import (
+    DeviceCreate,
+    DeviceUpdate,
+    DeviceResponse,
+    DeviceBulkCreate,
+    DeviceBulkUpdate,
+    DeviceBulkIds,
+    BulkItemResult,
+    BulkOperationResponse,
+    SensorReadingBatch,
+    SensorIngestResponse,
+    SensorDataResponse,
+    JobResponse,
+    DeviceCommandCreate,
+    DeviceCommandResponse,
+    DeviceCommandQueued,
+    DeviceCommandBatch,
+    DeviceCommandAck,
+    DeviceBulkCommand,
+)
+from app.services import commands as command_queue
+from app.services.changes import change_journal
+from app.services.jobs import Job, jobs
+from app.services.ml.storage import format_size
+from app.services.ota.protocol import OTAError
+from app.services.ota.transport import transport_for
+from app.services.ota.updates import firmware_version, push_firmware, store_image
 
 router = APIRouter()
 
+device_list_adapter = TypeAdapter(List[DeviceResponse])
+sensor_data_adapter = TypeAdapter(List[SensorDataResponse])
+
+
+def _publish_devices(devices: Iterable[Device], event: str = "device.updated") -> None:
+    for device in devices:
+        change_journal.publish(
+            device.owner_id, event, DeviceResponse.model_validate(device).model_dump(mode="json")
+        )
+
 
 @router.get("/", response_model=List[DeviceResponse])
 async def list_devices(
@@ -24,7 +69,7 @@ async def list_devices(
     result = await db.execute(
         select(Device).where(Device.owner_id == user_id).order_by(Device.created_at.desc())
     )
-    return result.scalars().all()
+    return model_response(device_list_adapter, result.scalars().all())
 
 
 @router.post("/", response_model=DeviceResponse, status_code=status.HTTP_201_CREATED)
@@ -43,11 +88,256 @@ async def register_device(
         owner_id=user_id,
     )
     db.add(device)
-    await db.commit()
+    try:
+        await db.commit()
+    except IntegrityError:
+        raise HTTPException(status_code=409, detail="MAC address already registered")
     await db.refresh(device)
+    _publish_devices([device], "device.created")
     return device
 
 
+def _bulk_response(results: List[BulkItemResult]) -> BulkOperationResponse:
+    failed = sum(1 for item in results if item.status in ("not_found", "conflict", "queue_full"))
+    return BulkOperationResponse(
+        succeeded=len(results) - failed, failed=failed, results=results
+    )
+
+
+async def _owned_device_ids(db: AsyncSession, user_id: int, ids: List[int]) -> set:
+    result = await db.execute(
+        select(Device.id).where(Device.owner_id == user_id, Device.id.in_(set(ids)))
+    )
+    return set(result.scalars().all())
+
+
+async def _delete_device_rows(db: AsyncSession, device_ids: Iterable[int]) -> None:
+    """Delete the rows that reference devices, before the devices themselves"""
+    device_ids = list(device_ids)
+    await db.execute(delete(SensorData).where(SensorData.device_id.in_(device_ids)))
+    await db.execute(delete(DeviceCommand).where(DeviceCommand.device_id.in_(device_ids)))
+    # Models trained on the device keep their weights but can no longer be updated
+    await db.execute(delete(ModelTraining).where(ModelTraining.device_id.in_(device_ids)))
+
+
+@router.post("/bulk", response_model=BulkOperationResponse)
+async def bulk_register_devices(
+    payload: DeviceBulkCreate,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Register many devices in one transaction"""
+    user_id = int(current_user["sub"])
+
+    # Report each MAC the uq_devices_owner_mac constraint would reject, so
+    # the rest of the batch can still be created
+    macs = {d.mac_address for d in payload.devices if d.mac_address}
+    taken = set()
+    if macs:
+        result = await db.execute(
+            select(Device.mac_address).where(
+                Device.owner_id == user_id, Device.mac_address.in_(macs)
+            )
+        )
+        taken = set(result.scalars().all())
+
+    results: List[BulkItemResult] = [None] * len(payload.devices)
+    rows, row_indexes = [], []
+    for index, device_data in enumerate(payload.devices):
+        mac = device_data.mac_address
+        if mac and mac in taken:
+            results[index] = BulkItemResult(
+                index=index, status="conflict", detail="MAC address already registered"
+            )
+            continue
+        if mac:
+            taken.add(mac)
+        rows.append(
+            {
+                "name": device_data.name,
+                "device_type": device_data.device_type,
+                "ip_address": device_data.ip_address,
+                "mac_address": mac,
+                "owner_id": user_id,
+            }
+        )
+        row_indexes.append(index)
+
+    if rows:
+        try:
+            result = await db.execute(
+                insert(Device).returning(Device, sort_by_parameter_order=True), rows
+            )
+        except IntegrityError:
+            # Registered concurrently since the check above
+            raise HTTPException(status_code=409, detail="MAC address already registered")
+        devices = result.scalars().all()
+        for index, device in zip(row_indexes, devices):
+            results[index] = BulkItemResult(index=index, id=device.id, status="created")
+        await db.commit()
+        _publish_devices(devices, "device.created")
+
+    return _bulk_response(results)
+
+
+@router.put("/bulk", response_model=BulkOperationResponse)
+async def bulk_update_devices(
+    payload: DeviceBulkUpdate,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Update many devices in one transaction"""
+    user_id = int(current_user["sub"])
+    owned = await _owned_device_ids(db, user_id, [item.id for item in payload.devices])
+
+    results, rows = [], []
+    for index, item in enumerate(payload.devices):
+        if item.id not in owned:
+            results.append(BulkItemResult(index=index, id=item.id, status="not_found"))
+            continue
+        values = item.model_dump(exclude_unset=True)
+        if len(values) > 1:
+            rows.append(values)
+        results.append(BulkItemResult(index=index, id=item.id, status="updated"))
+
+    if rows:
+        # ORM bulk UPDATE by primary key: rows sharing a key set are sent
+        # as a single executemany
+        await db.execute(update(Device), rows)
+        await db.commit()
+        result = await db.execute(
+            select(Device).where(Device.id.in_({row["id"] for row in rows}))
+            .execution_options(populate_existing=True)
+        )
+        _publish_devices(result.scalars().all())
+
+    return _bulk_response(results)
+
+
+@router.post("/bulk/delete", response_model=BulkOperationResponse)
+async def bulk_remove_devices(
+    payload: DeviceBulkIds,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Remove many devices in one transaction"""
+    user_id = int(current_user["sub"])
+    result = await db.execute(
+        select(Device.id).where(Device.owner_id == user_id, Device.id.in_(set(payload.ids)))
+    )
+    deleted = set(result.scalars().all())
+    if deleted:
+        await _delete_device_rows(db, deleted)
+        await db.execute(delete(Device).where(Device.id.in_(deleted)))
+    await db.commit()
+    for device_id in deleted:
+        change_journal.publish(user_id, "device.deleted", {"id": device_id})
+
+    return _bulk_response(
+        [
+            BulkItemResult(
+                index=index,
+                id=device_id,
+                status="deleted" if device_id in deleted else "not_found",
+            )
+            for index, device_id in enumerate(payload.ids)
+        ]
+    )
+
+
+@router.post("/bulk/ping", response_model=BulkOperationResponse)
+async def bulk_ping_devices(
+    payload: DeviceBulkIds,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Mark many devices as seen and online in one statement"""
+    user_id = int(current_user["sub"])
+    # Only devices coming online are published; heartbeats alone are not changes
+    result = await db.execute(
+        select(Device.id).where(
+            Device.owner_id == user_id,
+            Device.id.in_(set(payload.ids)),
+            Device.status != DeviceStatus.ONLINE,
+        )
+    )
+    flipped = set(result.scalars().all())
+    result = await db.execute(
+        update(Device)
+        .where(Device.owner_id == user_id, Device.id.in_(set(payload.ids)))
+        .values(last_seen=datetime.utcnow(), status=DeviceStatus.ONLINE)
+        .returning(Device)
+        .execution_options(synchronize_session=False)
+    )
+    devices = result.scalars().all()
+    pinged = {device.id for device in devices}
+    await db.commit()
+    _publish_devices(device for device in devices if device.id in flipped)
+
+    return _bulk_response(
+        [
+            BulkItemResult(
+                index=index,
+                id=device_id,
+                status="pinged" if device_id in pinged else "not_found",
+            )
+            for index, device_id in enumerate(payload.ids)
+        ]
+    )
+
+
+@router.post(
+    "/bulk/upload",
+    response_model=JobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(admit("upload"))],
+)
+async def bulk_upload_code(
+    firmware: UploadFile = File(...),
+    ids: List[int] = Form(...),
+    current_user: dict = Depends(get_current_user),
+):
+    """Update many devices to one firmware image, OTA_MAX_CONCURRENT_DEVICES at a time"""
+    user_id = int(current_user["sub"])
+    device_ids = list(dict.fromkeys(ids))
+    if len(device_ids) > settings.OTA_MAX_DEVICES_PER_JOB:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Update at most {settings.OTA_MAX_DEVICES_PER_JOB} devices at a time",
+        )
+    image_sha = await _store_firmware(firmware)
+    return jobs.submit("ota", user_id, partial(_ota_job, user_id, device_ids, image_sha))
+
+
+@router.post("/bulk/commands", response_model=BulkOperationResponse)
+async def bulk_queue_command(
+    payload: DeviceBulkCommand,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Queue one command for many devices, e.g. a whole classroom"""
+    user_id = int(current_user["sub"])
+    owned = await _owned_device_ids(db, user_id, payload.ids)
+    command = payload.command
+    queued = await command_queue.enqueue(
+        db, sorted(owned), command.name, command.params, command.key, command.ttl_seconds
+    )
+    await db.commit()
+    command_queue.notify(queued)
+
+    results = []
+    for index, device_id in enumerate(payload.ids):
+        if device_id not in owned:
+            results.append(BulkItemResult(index=index, id=device_id, status="not_found"))
+        elif device_id not in queued:
+            results.append(BulkItemResult(
+                index=index, id=device_id, status="queue_full", detail="Device has too many pending commands"
+            ))
+        else:
+            results.append(BulkItemResult(index=index, id=device_id, status="queued"))
+    return _bulk_response(results)
+
+
 @router.get("/{device_id}", response_model=DeviceResponse)
 async def get_device(
     device_id: int,
@@ -87,6 +377,7 @@ async def update_device(
 
     await db.commit()
     await db.refresh(device)
+    _publish_devices([device])
     return device
 
 
@@ -105,8 +396,10 @@ async def remove_device(
     if not device:
         raise HTTPException(status_code=404, detail="Device not found")
 
+    await _delete_device_rows(db, [device_id])
     await db.delete(device)
     await db.commit()
+    change_journal.publish(user_id, "device.deleted", {"id": device_id})
 
 
 @router.post("/{device_id}/ping", response_model=DeviceResponse)
@@ -125,21 +418,94 @@ async def ping_device(
         raise HTTPException(status_code=404, detail="Device not found")
 
     # Simulate ping - in production, this would actually ping the device
+    came_online = device.status != DeviceStatus.ONLINE
     device.last_seen = datetime.utcnow()
     device.status = DeviceStatus.ONLINE
 
     await db.commit()
     await db.refresh(device)
+    if came_online:
+        _publish_devices([device])
     return device
 
 
-@router.post("/{device_id}/upload")
+async def _ota_job(owner_id: int, device_ids: List[int], image_sha: str, job: Job) -> dict:
+    async with async_session() as db:
+        result = await db.execute(
+            select(Device).where(Device.owner_id == owner_id, Device.id.in_(set(device_ids)))
+        )
+        devices = {device.id: device for device in result.scalars().all()}
+
+    # Fraction of its delta each device has received
+    done = dict.fromkeys(device_ids, 0.0)
+
+    def progress(device_id: int, sent: int, total: int) -> None:
+        done[device_id] = sent / total if total else 1.0
+        job.progress = sum(done.values()) / len(done)
+
+    semaphore = asyncio.Semaphore(settings.OTA_MAX_CONCURRENT_DEVICES)
+
+    async def update_device(client: httpx.AsyncClient, device_id: int) -> dict:
+        device = devices.get(device_id)
+        if device is None:
+            return {"device_id": device_id, "status": "not_found"}
+        async with semaphore:
+            try:
+                report = await push_firmware(
+                    transport_for(device, client), image_sha, partial(progress, device_id)
+                )
+            except OTAError as e:
+                progress(device_id, 1, 1)
+                return {"device_id": device_id, "status": "failed", "error": str(e)}
+        return {"device_id": device_id, **report}
+
+    async with httpx.AsyncClient(timeout=settings.OTA_TIMEOUT_SECONDS) as client:
+        results = await asyncio.gather(*(update_device(client, i) for i in device_ids))
+
+    version = firmware_version(image_sha)
+    current = [r["device_id"] for r in results if r["status"] in ("updated", "up_to_date")]
+    if current:
+        async with async_session() as db:
+            await db.execute(
+                update(Device).where(Device.id.in_(current)).values(firmware_version=version)
+            )
+            await db.commit()
+    return {
+        "firmware_sha256": image_sha,
+        "firmware_version": version,
+        "updated": sum(r["status"] == "updated" for r in results),
+        "up_to_date": sum(r["status"] == "up_to_date" for r in results),
+        "failed": sum(r["status"] in ("failed", "not_found") for r in results),
+        "bytes_sent": sum(r.get("bytes_sent", 0) for r in results),
+        "devices": results,
+    }
+
+
+async def _store_firmware(firmware: UploadFile) -> str:
+    data = await firmware.read(settings.FIRMWARE_MAX_BYTES + 1)
+    if not data:
+        raise HTTPException(status_code=422, detail="Firmware image is empty")
+    if len(data) > settings.FIRMWARE_MAX_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Firmware images may be at most {format_size(settings.FIRMWARE_MAX_BYTES)}",
+        )
+    return await run_in_threadpool(store_image, data)
+
+
+@router.post(
+    "/{device_id}/upload",
+    response_model=JobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(admit("upload"))],
+)
 async def upload_code(
     device_id: int,
+    firmware: UploadFile = File(...),
     current_user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    """Upload code to a device"""
+    """Start an over-the-air update of a device; poll /api/jobs/{id} for progress"""
     user_id = int(current_user["sub"])
     result = await db.execute(
         select(Device).where(Device.id == device_id, Device.owner_id == user_id)
@@ -147,6 +513,182 @@ async def upload_code(
     device = result.scalar_one_or_none()
     if not device:
         raise HTTPException(status_code=404, detail="Device not found")
+    if jobs.active("ota", device_id) is not None:
+        raise HTTPException(status_code=409, detail="An update of this device is already running")
+
+    image_sha = await _store_firmware(firmware)
+    return jobs.submit(
+        "ota", user_id, partial(_ota_job, user_id, [device_id], image_sha), target_id=device_id
+    )
+
+
+@router.post(
+    "/{device_id}/data",
+    response_model=SensorIngestResponse,
+    status_code=status.HTTP_201_CREATED,
+)
+async def ingest_sensor_data(
+    device_id: int,
+    batch: SensorReadingBatch,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Store a batch of sensor readings reported by a device"""
+    user_id = int(current_user["sub"])
+    now = datetime.utcnow()
+    # Ownership check and heartbeat in one statement
+    result = await db.execute(
+        update(Device)
+        .where(Device.id == device_id, Device.owner_id == user_id)
+        .values(last_seen=now, status=DeviceStatus.ONLINE)
+        .returning(Device.id)
+    )
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Device not found")
+
+    await db.execute(
+        insert(SensorData),
+        [
+            {
+                "device_id": device_id,
+                "sensor_type": reading.sensor_type,
+                "value": reading.value,
+                "unit": reading.unit,
+                "timestamp": reading.timestamp or now,
+            }
+            for reading in batch.readings
+        ],
+    )
+    await db.commit()
+    return SensorIngestResponse(accepted=len(batch.readings))
+
 
-    # In production, this would upload code to the actual device
-    return {"status": "success", "message": f"Code uploaded to {device.name}"}
+@router.get("/{device_id}/data", response_model=List[SensorDataResponse])
+async def list_sensor_data(
+    device_id: int,
+    sensor_type: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Latest sensor readings for a device, newest first"""
+    user_id = int(current_user["sub"])
+    result = await db.execute(
+        select(Device.id).where(Device.id == device_id, Device.owner_id == user_id)
+    )
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Device not found")
+
+    query = select(SensorData).where(SensorData.device_id == device_id)
+    if sensor_type:
+        query = query.where(SensorData.sensor_type == sensor_type)
+    result = await db.execute(
+        query.order_by(SensorData.timestamp.desc(), SensorData.id.desc()).limit(limit)
+    )
+    return model_response(sensor_data_adapter, result.scalars().all())
+
+
+async def _get_owned_device(db: AsyncSession, device_id: int, user_id: int) -> Device:
+    result = await db.execute(
+        select(Device).where(Device.id == device_id, Device.owner_id == user_id)
+    )
+    device = result.scalar_one_or_none()
+    if not device:
+        raise HTTPException(status_code=404, detail="Device not found")
+    return device
+
+
+@router.post(
+    "/{device_id}/commands",
+    response_model=DeviceCommandQueued,
+    status_code=status.HTTP_201_CREATED,
+)
+async def queue_command(
+    device_id: int,
+    payload: DeviceCommandCreate,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Queue a command for a device; it replaces queued commands it supersedes"""
+    await _get_owned_device(db, device_id, int(current_user["sub"]))
+    queued = await command_queue.enqueue(
+        db, [device_id], payload.name, payload.params, payload.key, payload.ttl_seconds
+    )
+    if not queued:
+        raise HTTPException(status_code=429, detail="Device has too many pending commands")
+    await db.commit()
+    command_queue.notify([device_id])
+    command, superseded = queued[device_id]
+    return DeviceCommandQueued(
+        **DeviceCommandResponse.model_validate(command).model_dump(), superseded=superseded
+    )
+
+
+@router.get("/{device_id}/commands", response_model=List[DeviceCommandResponse])
+async def list_commands(
+    device_id: int,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Commands a device has not acknowledged yet, oldest first"""
+    await _get_owned_device(db, device_id, int(current_user["sub"]))
+    result = await db.execute(
+        select(DeviceCommand).where(DeviceCommand.device_id == device_id).order_by(DeviceCommand.seq)
+    )
+    return result.scalars().all()
+
+
+@router.get("/{device_id}/commands/next", response_model=DeviceCommandBatch)
+async def poll_commands(
+    device_id: int,
+    ack: Optional[int] = Query(None, ge=0),
+    wait: float = Query(0, ge=0, le=settings.DEVICE_COMMAND_MAX_WAIT_SECONDS),
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Called by a device: acknowledge up to `ack`, then wait up to `wait` seconds for commands
+
+    Counts as a heartbeat. An empty batch means nothing arrived in time,
+    or the previous batch is still waiting to be acknowledged.
+    """
+    user_id = int(current_user["sub"])
+    result = await db.execute(
+        update(Device)
+        .where(Device.id == device_id, Device.owner_id == user_id)
+        .values(last_seen=datetime.utcnow(), status=DeviceStatus.ONLINE)
+        .returning(Device.id)
+    )
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Device not found")
+    acked = await command_queue.acknowledge(db, device_id, ack) if ack is not None else 0
+
+    deadline = asyncio.get_running_loop().time() + wait
+    while True:
+        signal = command_queue.command_signal(device_id)
+        batch, resend_at = await command_queue.take_batch(db, device_id, limit)
+        await db.commit()
+        remaining = deadline - asyncio.get_running_loop().time()
+        if batch or remaining <= 0:
+            return DeviceCommandBatch(commands=batch, acked=acked)
+        timeout = min(remaining, settings.DEVICE_COMMAND_RECHECK_SECONDS)
+        if resend_at is not None:
+            timeout = min(timeout, max((resend_at - datetime.utcnow()).total_seconds(), 0))
+        try:
+            await asyncio.wait_for(signal.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+@router.post("/{device_id}/commands/ack", response_model=DeviceCommandBatch)
+async def acknowledge_commands(
+    device_id: int,
+    payload: DeviceCommandAck,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Called by a device: it has run every command up to seq"""
+    await _get_owned_device(db, device_id, int(current_user["sub"]))
+    acked = await command_queue.acknowledge(db, device_id, payload.seq)
+    await db.commit()
+    return DeviceCommandBatch(commands=[], acked=acked)
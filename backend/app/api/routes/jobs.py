@@ -0,0 +1,47 @@
+"""Background job routes"""
+
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from app.core.security import get_current_user
+from app.schemas import JobResponse
+from app.services.jobs import Job, jobs
+
+router = APIRouter()
+
+
+def get_own_job(job_id: str, current_user: dict) -> Job:
+    job = jobs.get(job_id)
+    if job is None or job.owner_id != int(current_user["sub"]):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/", response_model=List[JobResponse])
+async def list_jobs(
+    kind: Optional[str] = None,
+    current_user: dict = Depends(get_current_user),
+):
+    """List your recent background jobs, newest first"""
+    return jobs.list(int(current_user["sub"]), kind)
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: str,
+    current_user: dict = Depends(get_current_user),
+):
+    """Get the status and result of a background job"""
+    return get_own_job(job_id, current_user)
+
+
+@router.delete("/{job_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def cancel_job(
+    job_id: str,
+    current_user: dict = Depends(get_current_user),
+):
+    """Cancel a queued or running job"""
+    job = get_own_job(job_id, current_user)
+    if job.done:
+        raise HTTPException(status_code=409, detail=f"Job already {job.status}")
+    jobs.cancel(job.id)
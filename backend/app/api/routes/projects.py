@@ -1,17 +1,55 @@
 """Project management routes"""
 
+from datetime import datetime
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update
+from sqlalchemy.orm import selectinload
+from pydantic import TypeAdapter
 
 from app.core.database import get_db
+from app.core.responses import model_response
 from app.core.security import get_current_user
 from app.models import Project
-from app.schemas import ProjectCreate, ProjectUpdate, ProjectResponse
+from app.schemas import (
+    ProjectCreate,
+    ProjectUpdate,
+    ProjectResponse,
+    ProjectRevisionResponse,
+    ProjectRevisionDetail,
+    ProjectDiffResponse,
+)
+from app.services.blob_store import acquire_blob, add_reference, release_blob
+from app.services import revisions
+from app.services.changes import change_journal
 
 router = APIRouter()
 
+project_adapter = TypeAdapter(ProjectResponse)
+project_list_adapter = TypeAdapter(List[ProjectResponse])
+
+
+def _publish_project(project: Project, event: str = "project.updated") -> None:
+    # Workspaces can be large; clients fetch the project when they need its blocks
+    data = project_adapter.validate_python(project).model_dump(
+        mode="json", exclude={"blocks", "generated_code"}
+    )
+    change_journal.publish(project.owner_id, event, data)
+
+
+async def _get_readable_project(db: AsyncSession, project_id: int, user_id: int) -> Project:
+    result = await db.execute(
+        select(Project).where(
+            Project.id == project_id,
+            (Project.owner_id == user_id) | (Project.is_public == True),
+        )
+    )
+    project = result.scalar_one_or_none()
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return project
+
 
 @router.get("/", response_model=List[ProjectResponse])
 async def list_projects(
@@ -24,12 +62,13 @@ async def list_projects(
     user_id = int(current_user["sub"])
     result = await db.execute(
         select(Project)
+        .options(selectinload(Project.blocks_blob))
         .where(Project.owner_id == user_id)
         .offset(skip)
         .limit(limit)
         .order_by(Project.updated_at.desc())
     )
-    return result.scalars().all()
+    return model_response(project_list_adapter, result.scalars().all())
 
 
 @router.post("/", response_model=ProjectResponse, status_code=status.HTTP_201_CREATED)
@@ -43,14 +82,19 @@ async def create_project(
     project = Project(
         name=project_data.name,
         description=project_data.description,
-        blocks=project_data.blocks,
+        blocks_hash=await acquire_blob(db, project_data.blocks),
         tags=project_data.tags,
         owner_id=user_id,
     )
     db.add(project)
+    if project_data.blocks is not None:
+        await db.flush()
+        await revisions.record_revision(db, project, None, project_data.blocks)
     await db.commit()
     await db.refresh(project)
-    return project
+    await db.refresh(project, ["blocks_blob"])
+    _publish_project(project, "project.created")
+    return model_response(project_adapter, project, status_code=status.HTTP_201_CREATED)
 
 
 @router.get("/{project_id}", response_model=ProjectResponse)
@@ -62,7 +106,9 @@ async def get_project(
     """Get a specific project"""
     user_id = int(current_user["sub"])
     result = await db.execute(
-        select(Project).where(
+        select(Project)
+        .options(selectinload(Project.blocks_blob))
+        .where(
             Project.id == project_id,
             (Project.owner_id == user_id) | (Project.is_public == True),
         )
@@ -70,7 +116,7 @@ async def get_project(
     project = result.scalar_one_or_none()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
-    return project
+    return model_response(project_adapter, project)
 
 
 @router.put("/{project_id}", response_model=ProjectResponse)
@@ -82,20 +128,40 @@ async def update_project(
 ):
     """Update a project"""
     user_id = int(current_user["sub"])
+    # Write the row before reading it: the write lock (a row lock on
+    # Postgres, the database lock on SQLite, which ignores FOR UPDATE) makes
+    # concurrent saves read the blocks, take blob references and number
+    # revisions one after another instead of colliding
     result = await db.execute(
-        select(Project).where(Project.id == project_id, Project.owner_id == user_id)
+        update(Project)
+        .where(Project.id == project_id, Project.owner_id == user_id)
+        .values(updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
     )
-    project = result.scalar_one_or_none()
-    if not project:
+    if result.rowcount == 0:
         raise HTTPException(status_code=404, detail="Project not found")
+    result = await db.execute(
+        select(Project)
+        .options(selectinload(Project.blocks_blob))
+        .where(Project.id == project_id)
+    )
+    project = result.scalar_one()
 
     update_data = project_data.model_dump(exclude_unset=True)
+    if "blocks" in update_data:
+        old_hash, old_blocks = project.blocks_hash, project.blocks
+        new_blocks = update_data.pop("blocks")
+        project.blocks_hash = await acquire_blob(db, new_blocks)
+        await revisions.record_revision(db, project, old_blocks, new_blocks)
+        await release_blob(db, old_hash)
     for field, value in update_data.items():
         setattr(project, field, value)
 
     await db.commit()
     await db.refresh(project)
-    return project
+    await db.refresh(project, ["blocks_blob"])
+    _publish_project(project)
+    return model_response(project_adapter, project)
 
 
 @router.delete("/{project_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -113,8 +179,13 @@ async def delete_project(
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
+    blocks_hash = project.blocks_hash
+    await revisions.delete_revisions(db, project.id)
     await db.delete(project)
+    await db.flush()
+    await release_blob(db, blocks_hash)
     await db.commit()
+    change_journal.publish(user_id, "project.deleted", {"id": project_id})
 
 
 @router.post("/{project_id}/duplicate", response_model=ProjectResponse)
@@ -125,24 +196,80 @@ async def duplicate_project(
 ):
     """Duplicate a project"""
     user_id = int(current_user["sub"])
-    result = await db.execute(
-        select(Project).where(
-            Project.id == project_id,
-            (Project.owner_id == user_id) | (Project.is_public == True),
-        )
-    )
-    original = result.scalar_one_or_none()
-    if not original:
-        raise HTTPException(status_code=404, detail="Project not found")
+    original = await _get_readable_project(db, project_id, user_id)
 
+    # The copy shares the original's blob; only the reference count changes
+    await add_reference(db, original.blocks_hash)
     new_project = Project(
         name=f"{original.name} (Copy)",
         description=original.description,
-        blocks=original.blocks,
+        blocks_hash=original.blocks_hash,
         tags=original.tags,
         owner_id=user_id,
     )
     db.add(new_project)
+    await db.flush()
+    await db.refresh(new_project, ["blocks_blob"])
+    if new_project.blocks_hash is not None:
+        await revisions.record_revision(db, new_project, None, new_project.blocks)
     await db.commit()
-    await db.refresh(new_project)
-    return new_project
+    _publish_project(new_project, "project.created")
+    return model_response(project_adapter, new_project)
+
+
+@router.get("/{project_id}/revisions", response_model=List[ProjectRevisionResponse])
+async def list_project_revisions(
+    project_id: int,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=200),
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """List saved revisions of a project, newest first"""
+    project = await _get_readable_project(db, project_id, int(current_user["sub"]))
+    return await revisions.list_revisions(db, project.id, skip, limit)
+
+
+@router.get("/{project_id}/revisions/{revision}", response_model=ProjectRevisionDetail)
+async def get_project_revision(
+    project_id: int,
+    revision: int,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Get a project revision with its reconstructed blocks"""
+    project = await _get_readable_project(db, project_id, int(current_user["sub"]))
+    saved, blocks = await revisions.load_revision(db, project.id, revision)
+    if saved is None:
+        raise HTTPException(status_code=404, detail="Revision not found")
+    return ProjectRevisionDetail(
+        revision=saved.revision,
+        is_keyframe=saved.is_keyframe,
+        size=saved.size,
+        created_at=saved.created_at,
+        blocks=blocks,
+    )
+
+
+@router.get(
+    "/{project_id}/revisions/{from_revision}/diff/{to_revision}",
+    response_model=ProjectDiffResponse,
+)
+async def diff_project_revisions(
+    project_id: int,
+    from_revision: int,
+    to_revision: int,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Diff the blocks of two project revisions"""
+    project = await _get_readable_project(db, project_id, int(current_user["sub"]))
+    old, old_blocks = await revisions.load_revision(db, project.id, from_revision)
+    new, new_blocks = await revisions.load_revision(db, project.id, to_revision)
+    if old is None or new is None:
+        raise HTTPException(status_code=404, detail="Revision not found")
+    return ProjectDiffResponse(
+        from_revision=from_revision,
+        to_revision=to_revision,
+        changes=revisions.diff_changes(old_blocks, new_blocks),
+    )
@@ -0,0 +1,49 @@
+"""Search routes"""
+
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.security import get_optional_user
+from app.schemas import SearchResponse, SearchResult
+from app.services.search import search_backend, SEARCH_KINDS
+
+router = APIRouter()
+
+
+@router.get("/", response_model=SearchResponse)
+async def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    types: Optional[List[str]] = Query(None),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=settings.SEARCH_MAX_PAGE_SIZE),
+    current_user: Optional[dict] = Depends(get_optional_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Search public projects, tutorials and AI models (plus your own projects)"""
+    kinds = types or list(SEARCH_KINDS)
+    unknown = set(kinds) - set(SEARCH_KINDS)
+    if unknown:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown search types: {', '.join(sorted(unknown))}"
+        )
+
+    user_id = int(current_user["sub"]) if current_user else None
+    hits = await search_backend.search(db, q, kinds, user_id, skip, limit)
+    return SearchResponse(
+        query=q,
+        skip=skip,
+        limit=limit,
+        results=[
+            SearchResult(
+                type=hit.kind,
+                id=hit.ref_id,
+                title=hit.title,
+                snippet=hit.snippet,
+                score=hit.score,
+            )
+            for hit in hits
+        ],
+    )
@@ -0,0 +1,107 @@
+"""Simulated device routes
+
+Devices of type "simulator" answer the OTA protocol here, the way a real
+device answers it at http://<ip>/ota, so clients and tools can exercise
+updates without hardware.
+"""
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+
+from app.core.database import get_db
+from app.core.security import get_current_user
+from app.models import Device, DeviceType
+from app.schemas import OTATransferStart, SimulatedDeviceResponse, SimulatedDeviceUpdate
+from app.services.ota.protocol import (
+    CHUNK_CRC_HEADER, ChunkCorrupted, LinkError, OffsetMismatch, OTAError,
+)
+from app.services.ota.simulator import SimulatedDevice, simulator
+
+router = APIRouter()
+
+MAX_CHUNK_BYTES = 64 * 1024
+
+
+async def get_simulated_device(
+    device_id: int,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+) -> SimulatedDevice:
+    result = await db.execute(
+        select(Device.id).where(
+            Device.id == device_id,
+            Device.owner_id == int(current_user["sub"]),
+            Device.device_type == DeviceType.SIMULATOR,
+        )
+    )
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Simulated device not found")
+    return simulator.get(device_id)
+
+
+def _answer(call):
+    """Status codes of the OTA protocol for the simulator's outcomes"""
+    try:
+        return call()
+    except OffsetMismatch as e:
+        return JSONResponse(status_code=409, content={"detail": str(e), "offset": e.expected})
+    except ChunkCorrupted as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except LinkError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except OTAError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/devices/{device_id}", response_model=SimulatedDeviceResponse)
+async def get_simulated(device: SimulatedDevice = Depends(get_simulated_device)):
+    """Firmware a simulated device runs and what it has received"""
+    return device.info()
+
+
+@router.put("/devices/{device_id}", response_model=SimulatedDeviceResponse)
+async def update_simulated(
+    payload: SimulatedDeviceUpdate,
+    device: SimulatedDevice = Depends(get_simulated_device),
+):
+    """Make a simulated device's link lose and corrupt a fraction of requests"""
+    device.failure_rate = payload.failure_rate
+    return device.info()
+
+
+@router.get("/devices/{device_id}/ota")
+async def ota_status(device: SimulatedDevice = Depends(get_simulated_device)):
+    return _answer(device.status)
+
+
+@router.post("/devices/{device_id}/ota")
+async def ota_begin(
+    payload: OTATransferStart,
+    device: SimulatedDevice = Depends(get_simulated_device),
+):
+    return _answer(lambda: {
+        "offset": device.begin(
+            payload.id, payload.size, payload.sha256, payload.base_sha256, payload.target_sha256
+        )
+    })
+
+
+@router.put("/devices/{device_id}/ota/{transfer_id}/chunks")
+async def ota_chunk(
+    transfer_id: str,
+    request: Request,
+    offset: int = Query(..., ge=0),
+    crc: str = Header(..., alias=CHUNK_CRC_HEADER),
+    device: SimulatedDevice = Depends(get_simulated_device),
+):
+    data = await request.body()
+    if len(data) > MAX_CHUNK_BYTES:
+        raise HTTPException(status_code=413, detail=f"Chunks may be at most {MAX_CHUNK_BYTES} bytes")
+    return _answer(lambda: {"offset": device.receive(transfer_id, offset, data, crc.lower())})
+
+
+@router.post("/devices/{device_id}/ota/{transfer_id}/apply")
+async def ota_apply(transfer_id: str, device: SimulatedDevice = Depends(get_simulated_device)):
+    return _answer(lambda: {"firmware_sha256": device.apply(transfer_id)})
@@ -1,25 +1,76 @@
 """Tutorial routes"""
 
+from datetime import datetime
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, event
+from sqlalchemy.orm import Session
 
+from app.core.cache import response_cache
+from app.core.config import settings
 from app.core.database import get_db
 from app.core.security import get_current_user
-from app.models import Tutorial, UserProgress
-from app.schemas import TutorialResponse
+from app.models import Tutorial, UserProgress, UserStats, User
+from app.schemas import TutorialResponse, LeaderboardEntry
+from app.services.progress import (
+    published_tutorials,
+    get_user_stats,
+    mark_completed,
+    record_completion,
+)
 
 router = APIRouter()
 
+CACHE_NAMESPACE = "tutorials"
+tutorial_adapter = TypeAdapter(TutorialResponse)
+tutorial_list_adapter = TypeAdapter(List[TutorialResponse])
+
+
+# Tutorials are only written by seeding/admin tooling, so hook the session
+# rather than individual routes. Writes are noted at flush and the caches
+# cleared only once they commit: clearing at flush would let a concurrent
+# read re-cache the old rows before the commit, and a rollback would clear
+# them for nothing.
+_TUTORIALS_WRITTEN = "tutorials_written"
+
+
+def _note_tutorial_writes(session, flush_context):
+    if any(
+        isinstance(obj, Tutorial)
+        for obj in (*session.new, *session.dirty, *session.deleted)
+    ):
+        session.info[_TUTORIALS_WRITTEN] = True
+
+
+def _invalidate_tutorial_caches(session):
+    if session.info.pop(_TUTORIALS_WRITTEN, False):
+        response_cache.invalidate(CACHE_NAMESPACE)
+        published_tutorials.invalidate()
+
+
+def _forget_tutorial_writes(session):
+    session.info.pop(_TUTORIALS_WRITTEN, None)
+
+
+event.listen(Session, "after_flush", _note_tutorial_writes)
+event.listen(Session, "after_commit", _invalidate_tutorial_caches)
+event.listen(Session, "after_rollback", _forget_tutorial_writes)
+
 
 @router.get("/", response_model=List[TutorialResponse])
 async def list_tutorials(
+    request: Request,
     category: str = None,
     difficulty: str = None,
     db: AsyncSession = Depends(get_db),
 ):
     """List all tutorials"""
+    cached = response_cache.get(CACHE_NAMESPACE, request)
+    if cached is not None:
+        return cached
+    
     query = select(Tutorial).where(Tutorial.is_published == True)
     
     if category:
@@ -28,19 +79,57 @@ async def list_tutorials(
         query = query.where(Tutorial.difficulty == difficulty)
     
     result = await db.execute(query.order_by(Tutorial.order))
-    return result.scalars().all()
+    return response_cache.store(
+        CACHE_NAMESPACE, request, tutorial_list_adapter, result.scalars().all()
+    )
+
+
+@router.get("/leaderboard", response_model=List[LeaderboardEntry])
+async def get_leaderboard(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=settings.LEADERBOARD_MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db),
+):
+    """Get a page of the XP leaderboard"""
+    result = await db.execute(
+        select(UserStats, User.name)
+        .join(User, User.id == UserStats.user_id)
+        .where(UserStats.total_xp > 0)
+        .order_by(UserStats.total_xp.desc(), UserStats.user_id)
+        .offset(skip)
+        .limit(limit)
+    )
+    return [
+        LeaderboardEntry(
+            rank=skip + position + 1,
+            user_id=stats.user_id,
+            name=name,
+            total_xp=stats.total_xp,
+            completed_count=stats.completed_count,
+            last_completed_at=stats.last_completed_at,
+        )
+        for position, (stats, name) in enumerate(result.all())
+    ]
 
 
 @router.get("/{tutorial_id}", response_model=TutorialResponse)
-async def get_tutorial(tutorial_id: int, db: AsyncSession = Depends(get_db)):
+async def get_tutorial(
+    tutorial_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+):
     """Get a specific tutorial"""
+    cached = response_cache.get(CACHE_NAMESPACE, request)
+    if cached is not None:
+        return cached
+
     result = await db.execute(
         select(Tutorial).where(Tutorial.id == tutorial_id, Tutorial.is_published == True)
     )
     tutorial = result.scalar_one_or_none()
     if not tutorial:
         raise HTTPException(status_code=404, detail="Tutorial not found")
-    return tutorial
+    return response_cache.store(CACHE_NAMESPACE, request, tutorial_adapter, tutorial)
 
 
 @router.post("/{tutorial_id}/complete")
@@ -53,38 +142,21 @@ async def complete_tutorial(
     user_id = int(current_user["sub"])
     
     # Check if tutorial exists
-    result = await db.execute(select(Tutorial).where(Tutorial.id == tutorial_id))
-    tutorial = result.scalar_one_or_none()
-    if not tutorial:
+    result = await db.execute(select(Tutorial.id).where(Tutorial.id == tutorial_id))
+    if result.scalar_one_or_none() is None:
         raise HTTPException(status_code=404, detail="Tutorial not found")
     
-    # Check existing progress
-    result = await db.execute(
-        select(UserProgress).where(
-            UserProgress.user_id == user_id,
-            UserProgress.tutorial_id == tutorial_id,
-        )
-    )
-    progress = result.scalar_one_or_none()
-    
-    if progress:
-        if progress.completed:
-            return {"status": "already_completed", "xp_earned": 0}
-    else:
-        progress = UserProgress(
-            user_id=user_id,
-            tutorial_id=tutorial_id,
-        )
-        db.add(progress)
-    
-    from datetime import datetime
-    progress.completed = True
-    progress.completed_at = datetime.utcnow()
-    progress.xp_earned = 50  # XP reward
+    # Stats and progress are committed together, and stats only count a
+    # completion the upsert actually made
+    completed_at = datetime.utcnow()
+    xp_earned = settings.TUTORIAL_XP_REWARD
+    if not await mark_completed(db, user_id, tutorial_id, xp_earned, completed_at):
+        return {"status": "already_completed", "xp_earned": 0}
+    await record_completion(db, user_id, xp_earned, completed_at)
     
     await db.commit()
     
-    return {"status": "completed", "xp_earned": 50}
+    return {"status": "completed", "xp_earned": xp_earned}
 
 
 @router.get("/progress/me")
@@ -95,27 +167,22 @@ async def get_my_progress(
     """Get current user's learning progress"""
     user_id = int(current_user["sub"])
     
-    # Get completed tutorials
+    stats = await get_user_stats(db, user_id)
+    total = await published_tutorials.get(db)
+    
     result = await db.execute(
-        select(UserProgress).where(
+        select(UserProgress.tutorial_id).where(
             UserProgress.user_id == user_id,
             UserProgress.completed == True,
         )
     )
-    completed = result.scalars().all()
-    
-    # Get total tutorials
-    result = await db.execute(
-        select(Tutorial).where(Tutorial.is_published == True)
-    )
-    total = len(result.scalars().all())
-    
-    total_xp = sum(p.xp_earned for p in completed)
+    completed_ids = result.scalars().all()
     
     return {
-        "completed_count": len(completed),
+        "completed_count": stats.completed_count,
         "total_count": total,
-        "progress_percentage": (len(completed) / total * 100) if total > 0 else 0,
-        "total_xp": total_xp,
-        "completed_tutorial_ids": [p.tutorial_id for p in completed],
+        "progress_percentage": (stats.completed_count / total * 100) if total > 0 else 0,
+        "total_xp": stats.total_xp,
+        "last_completed_at": stats.last_completed_at,
+        "completed_tutorial_ids": completed_ids,
     }
@@ -5,6 +5,7 @@ from app.core.security import (
     get_password_hash,
     create_access_token,
     get_current_user,
+    get_optional_user,
 )
 
 __all__ = [
@@ -16,4 +17,5 @@ __all__ = [
     "get_password_hash",
     "create_access_token",
     "get_current_user",
+    "get_optional_user",
 ]
@@ -0,0 +1,269 @@
+"""Admission control - per-user and per-IP token buckets plus concurrency caps
+
+Expensive routes declare a route class (codegen, inference, upload, auth, ...)
+with the `admit` dependency. Each class has its own buckets, configured in
+settings.RATE_LIMIT_CLASSES:
+
+  * user_rate / user_burst - tokens per second and bucket size per user
+  * ip_rate / ip_burst     - the same per client IP, for anonymous callers
+                             and as a looser cap on a shared classroom IP
+  * concurrency            - requests of the class in flight in this process
+
+Rate-limited requests get 429 and saturated classes 503, both immediately
+and with Retry-After, so a runaway script is turned away before it costs
+any CPU and other users keep their normal latency.
+"""
+
+import logging
+import math
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import Depends, HTTPException, Request, status
+
+from app.core.config import settings
+from app.core.lazy import lazy_import
+from app.core.metrics import registry
+from app.core.security import get_optional_user
+
+
+logger = logging.getLogger(__name__)
+
+redis_asyncio = lazy_import("redis.asyncio", "the redis rate-limit backend")
+
+admission_rejected = registry.counter(
+    "admission_rejected_total",
+    "Requests turned away by admission control",
+    ("route_class", "reason"),
+)
+admission_in_flight = registry.gauge(
+    "admission_in_flight",
+    "Admitted requests currently running per route class",
+    ("route_class",),
+)
+
+# (bucket key, refill rate per second, burst size)
+BucketSpec = Tuple[str, float, float]
+
+
+class RateLimitBackend(ABC):
+    """Interface for token bucket storage"""
+
+    @abstractmethod
+    async def acquire(self, buckets: List[BucketSpec], cost: float = 1.0) -> float:
+        """Take cost tokens from every bucket, or none of them
+
+        Returns 0 when admitted, otherwise the seconds until all buckets
+        would hold enough tokens.
+        """
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """Per-process buckets in a bounded LRU
+
+    Evicting an idle bucket only forgets that it was partly drained, so the
+    bound errs on the side of admitting.
+    """
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    async def acquire(self, buckets, cost=1.0):
+        now = time.monotonic()
+        levels = []
+        wait = 0.0
+        for key, rate, burst in buckets:
+            state = self._buckets.get(key)
+            tokens = burst if state is None else min(burst, state[0] + (now - state[1]) * rate)
+            levels.append(tokens)
+            if tokens < cost:
+                wait = max(wait, (cost - tokens) / rate)
+        if wait:
+            return wait
+
+        for (key, _, _), tokens in zip(buckets, levels):
+            self._buckets[key] = [tokens - cost, now]
+            self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return 0.0
+
+
+# All-or-nothing take across KEYS, using the server clock so every worker
+# agrees on refill times. ARGV: cost, then rate and burst per key.
+_ACQUIRE_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local cost = tonumber(ARGV[1])
+local levels = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[2 * i])
+    local burst = tonumber(ARGV[2 * i + 1])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or burst
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(burst, tokens + (now - ts) * rate)
+    levels[i] = tokens
+    if tokens < cost then
+        wait = math.max(wait, (cost - tokens) / rate)
+    end
+end
+if wait == 0 then
+    for i, key in ipairs(KEYS) do
+        local rate = tonumber(ARGV[2 * i])
+        local burst = tonumber(ARGV[2 * i + 1])
+        redis.call('HSET', key, 'tokens', levels[i] - cost, 'ts', now)
+        redis.call('PEXPIRE', key, math.ceil(burst / rate * 1000) + 1000)
+    end
+end
+return tostring(wait)
+"""
+
+
+class RedisRateLimitBackend(RateLimitBackend):
+    """Buckets shared by every worker through Redis
+
+    If Redis is unreachable requests are admitted, so an outage of the
+    limiter never becomes an outage of the API.
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self._client = None
+        self._script = None
+
+    async def acquire(self, buckets, cost=1.0):
+        if self._client is None:
+            self._client = redis_asyncio.from_url(self.url)
+            self._script = self._client.register_script(_ACQUIRE_SCRIPT)
+        args = [cost]
+        for _, rate, burst in buckets:
+            args.extend((rate, burst))
+        try:
+            wait = await self._script(keys=[key for key, _, _ in buckets], args=args)
+        except Exception:
+            logger.warning("Rate limit backend unavailable, admitting request", exc_info=True)
+            return 0.0
+        return float(wait)
+
+
+@dataclass
+class RouteClass:
+    name: str
+    user_rate: Optional[float] = None
+    user_burst: Optional[float] = None
+    ip_rate: Optional[float] = None
+    ip_burst: Optional[float] = None
+    concurrency: Optional[int] = None
+    in_flight: int = 0
+
+
+class AdmissionController:
+    def __init__(self, backend: RateLimitBackend, classes: Dict[str, dict]):
+        self.backend = backend
+        self.classes = {
+            name: RouteClass(name=name, **limits) for name, limits in classes.items()
+        }
+
+    def _buckets(
+        self, route_class: RouteClass, user_id: Optional[str], client_ip: Optional[str]
+    ) -> List[BucketSpec]:
+        buckets = []
+        if user_id is not None and route_class.user_rate:
+            buckets.append(
+                (
+                    f"rl:{route_class.name}:user:{user_id}",
+                    route_class.user_rate,
+                    route_class.user_burst or route_class.user_rate,
+                )
+            )
+        if client_ip is not None and route_class.ip_rate:
+            buckets.append(
+                (
+                    f"rl:{route_class.name}:ip:{client_ip}",
+                    route_class.ip_rate,
+                    route_class.ip_burst or route_class.ip_rate,
+                )
+            )
+        return buckets
+
+    async def enter(
+        self, name: str, user_id: Optional[str], client_ip: Optional[str]
+    ) -> RouteClass:
+        """Admit a request or raise 429/503"""
+        route_class = self.classes[name]
+
+        # Saturation is checked first: it costs nothing and keeps a rejected
+        # request from draining the caller's tokens
+        if route_class.concurrency and route_class.in_flight >= route_class.concurrency:
+            admission_rejected.inc((name, "concurrency"))
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"Too many {name} requests in progress, try again shortly",
+                headers={"Retry-After": "1"},
+            )
+
+        # Hold the slot while the buckets are consulted, so requests that
+        # interleave at the await cannot overshoot the cap
+        route_class.in_flight += 1
+        buckets = self._buckets(route_class, user_id, client_ip)
+        wait = await self.backend.acquire(buckets) if buckets else 0.0
+        if wait:
+            route_class.in_flight -= 1
+            admission_rejected.inc((name, "rate"))
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=f"Rate limit exceeded for {name} requests",
+                headers={"Retry-After": str(max(1, math.ceil(wait)))},
+            )
+
+        admission_in_flight.set(route_class.in_flight, (name,))
+        return route_class
+
+    def leave(self, route_class: RouteClass) -> None:
+        route_class.in_flight -= 1
+        admission_in_flight.set(route_class.in_flight, (route_class.name,))
+
+
+def client_ip(request: Request) -> Optional[str]:
+    if settings.RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else None
+
+
+def _select_backend() -> RateLimitBackend:
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        return RedisRateLimitBackend(settings.RATE_LIMIT_REDIS_URL)
+    return MemoryRateLimitBackend(settings.RATE_LIMIT_MAX_KEYS)
+
+
+admission_controller = AdmissionController(_select_backend(), settings.RATE_LIMIT_CLASSES)
+
+
+def admit(route_class: str):
+    """Dependency admitting requests of route_class, held until the handler returns"""
+    if route_class not in admission_controller.classes:
+        raise ValueError(f"Unknown route class: {route_class}")
+
+    async def dependency(
+        request: Request,
+        current_user: Optional[dict] = Depends(get_optional_user),
+    ):
+        if not settings.RATE_LIMIT_ENABLED:
+            yield
+            return
+        user_id = current_user.get("sub") if current_user else None
+        admitted = await admission_controller.enter(route_class, user_id, client_ip(request))
+        try:
+            yield
+        finally:
+            admission_controller.leave(admitted)
+
+    return dependency
@@ -0,0 +1,100 @@
+"""In-process response cache with ETag revalidation for public endpoints"""
+
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Optional, Tuple
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+
+from app.core.config import settings
+from app.core.responses import serialize
+
+
+CacheKey = Tuple[str, str, Tuple[Tuple[str, str], ...]]
+
+
+@dataclass
+class CacheEntry:
+    body: bytes
+    etag: str
+    expires_at: float
+
+
+class ResponseCache:
+    """LRU of serialized JSON responses keyed by namespace, path and query"""
+
+    def __init__(self, max_entries: int, ttl_seconds: int, cache_control: str):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.cache_control = cache_control
+        self._entries: "OrderedDict[CacheKey, CacheEntry]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(namespace: str, request: Request) -> CacheKey:
+        return (namespace, request.url.path, tuple(sorted(request.query_params.multi_items())))
+
+    def get(self, namespace: str, request: Request) -> Optional[Response]:
+        """Return the cached response (or a 304) for this request, if any"""
+        key = self._key(namespace, request)
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at <= time.monotonic():
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return self._respond(entry, request)
+
+    def store(
+        self, namespace: str, request: Request, adapter: TypeAdapter, data: Any
+    ) -> Response:
+        """Serialize data through the adapter, cache it and build the response"""
+        body = serialize(adapter, data)
+        entry = CacheEntry(
+            body=body,
+            etag='W/"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest(),
+            expires_at=time.monotonic() + self.ttl_seconds,
+        )
+        self._entries[self._key(namespace, request)] = entry
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return self._respond(entry, request)
+
+    def invalidate(self, namespace: str) -> None:
+        """Drop every cached response for a namespace after a write"""
+        for key in [key for key in self._entries if key[0] == namespace]:
+            del self._entries[key]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def _respond(self, entry: CacheEntry, request: Request) -> Response:
+        headers = {"ETag": entry.etag, "Cache-Control": self.cache_control}
+        if _etag_matches(request.headers.get("if-none-match"), entry.etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
+
+
+response_cache = ResponseCache(
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.RESPONSE_CACHE_TTL_SECONDS,
+    cache_control=settings.RESPONSE_CACHE_CONTROL,
+)
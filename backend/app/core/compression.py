@@ -0,0 +1,69 @@
+"""Request decompression - gzip bodies sent by devices"""
+
+import zlib
+
+from starlette.responses import PlainTextResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+class GzipRequestMiddleware:
+    """ASGI middleware inflating request bodies sent with Content-Encoding: gzip
+
+    Devices compress telemetry batches to save radio time; routes see the
+    plain body. Bodies that inflate past max_size are refused with 413, so a
+    small compressed request cannot expand into an arbitrarily large one.
+    """
+
+    def __init__(self, app: ASGIApp, max_size: int):
+        self.app = app
+        self.max_size = max_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = next(
+            (value for name, value in scope["headers"] if name == b"content-encoding"), b""
+        )
+        if encoding.lower() != b"gzip":
+            await self.app(scope, receive, send)
+            return
+
+        inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        chunks = []
+        size = 0
+        more_body = True
+        try:
+            while more_body:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    return
+                more_body = message.get("more_body", False)
+                chunk = inflater.decompress(message.get("body", b""), self.max_size + 1 - size)
+                size += len(chunk)
+                if size > self.max_size or inflater.unconsumed_tail:
+                    await PlainTextResponse("Request body too large", status_code=413)(scope, receive, send)
+                    return
+                chunks.append(chunk)
+        except zlib.error:
+            await PlainTextResponse("Invalid gzip body", status_code=400)(scope, receive, send)
+            return
+        body = b"".join(chunks)
+
+        headers = [
+            (name, value)
+            for name, value in scope["headers"]
+            if name not in (b"content-encoding", b"content-length")
+        ]
+        headers.append((b"content-length", str(len(body)).encode()))
+        scope = {**scope, "headers": headers}
+        sent = False
+
+        async def receive_body() -> Message:
+            nonlocal sent
+            if sent:
+                return await receive()
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        await self.app(scope, receive_body, send)
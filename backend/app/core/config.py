@@ -1,7 +1,7 @@
 """Application configuration settings"""
 
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List
 import os
 
 
@@ -10,6 +10,18 @@ class Settings(BaseSettings):
     
     # Database
     DATABASE_URL: str = "sqlite+aiosqlite:///./platform.db"
+    DATABASE_ECHO: bool = False
+    # Apply pending migrations at startup. Turn off where several workers
+    # start at once and run `alembic upgrade head` as a deploy step instead.
+    DATABASE_AUTO_MIGRATE: bool = True
+    
+    # SQL profiling
+    SQL_PROFILING_ENABLED: bool = True
+    SQL_SLOW_QUERY_MS: float = 100.0
+    SQL_N_PLUS_ONE_THRESHOLD: int = 10
+    SQL_PROFILE_SLOWEST: int = 5
+    # Per-request query counts and timings in response headers; for development only
+    SQL_DEBUG_HEADER: bool = False
     
     # Security
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
@@ -23,6 +35,121 @@ class Settings(BaseSettings):
         "http://127.0.0.1:5173",
     ]
     
+    # Instrumentation
+    METRICS_ENABLED: bool = True
+    EVENT_LOOP_LAG_INTERVAL_SECONDS: float = 0.5
+    
+    # Admission control for expensive routes (see app/core/admission.py)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"  # memory, or redis to share buckets between workers
+    RATE_LIMIT_REDIS_URL: str = "redis://localhost:6379/0"
+    RATE_LIMIT_MAX_KEYS: int = 100_000
+    RATE_LIMIT_TRUST_FORWARDED: bool = False
+    # Per-IP limits are loose because a whole classroom can share one address
+    RATE_LIMIT_CLASSES: Dict[str, Dict[str, float]] = {
+        "codegen": {"user_rate": 2, "user_burst": 20, "ip_rate": 20, "ip_burst": 200, "concurrency": 8},
+        "inference": {"user_rate": 1, "user_burst": 5, "ip_rate": 10, "ip_burst": 50, "concurrency": 128},
+        "upload": {"user_rate": 0.5, "user_burst": 5, "ip_rate": 5, "ip_burst": 30, "concurrency": 4},
+        "upload_chunk": {"user_rate": 20, "user_burst": 40, "ip_rate": 100, "ip_burst": 200, "concurrency": 16},
+        "auth": {"ip_rate": 5, "ip_burst": 60, "concurrency": 8},
+        "jobs": {"user_rate": 0.1, "user_burst": 5, "ip_rate": 1, "ip_burst": 20, "concurrency": 8},
+    }
+    
+    # Response compression
+    GZIP_MINIMUM_SIZE: int = 1024
+    GZIP_COMPRESS_LEVEL: int = 6
+    # Largest gzip request body accepted, once decompressed (device telemetry batches)
+    GZIP_REQUEST_MAX_SIZE: int = 10 * 1024 * 1024
+    
+    # Response cache for public read endpoints
+    RESPONSE_CACHE_MAX_ENTRIES: int = 1024
+    RESPONSE_CACHE_TTL_SECONDS: int = 300
+    RESPONSE_CACHE_CONTROL: str = "public, no-cache"
+    
+    # Blob storage for project workspaces
+    BLOB_COMPRESSION_LEVEL: int = 6
+    BLOB_TEXT_CACHE_ENTRIES: int = 256
+    REVISION_KEYFRAME_INTERVAL: int = 20
+    
+    # Full-text search: "auto" uses FTS5 on SQLite and LIKE elsewhere
+    SEARCH_BACKEND: str = "auto"
+    SEARCH_MAX_PAGE_SIZE: int = 50
+    
+    # AI model storage and inference
+    MODEL_STORAGE_DIR: str = "./model_store"
+    MODEL_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+    MODEL_CACHE_MAX_MODELS: int = 32
+    MODEL_TEST_MAX_BATCH: int = 64
+    # Concurrent requests to one model are merged into batched forward passes
+    MODEL_BATCH_MAX_SIZE: int = 64
+    MODEL_BATCH_MAX_DELAY_MS: float = 2.0
+    MODEL_BATCH_CONCURRENCY: int = 2
+    INFERENCE_THREADS: int = 0  # 0 = one per CPU
+    # Chunked model uploads; clients may pick a chunk size within the bounds
+    MODEL_UPLOAD_CHUNK_SIZE: int = 8 * 1024 * 1024
+    MODEL_UPLOAD_MIN_CHUNK_SIZE: int = 256 * 1024
+    MODEL_UPLOAD_MAX_CHUNK_SIZE: int = 64 * 1024 * 1024
+    MODEL_UPLOAD_MAX_BYTES: int = 2 * 1024 * 1024 * 1024
+    # Unpacking stops past these, so a small archive cannot fill the disk
+    MODEL_ARCHIVE_MAX_UNPACKED_BYTES: int = 4 * 1024 * 1024 * 1024
+    MODEL_ARCHIVE_MAX_MEMBERS: int = 1000
+    # Image inputs for vision models, decoded in parallel and cached by content hash
+    IMAGE_PREPROCESS_THREADS: int = 0  # 0 = one per CPU
+    IMAGE_TENSOR_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    IMAGE_MAX_BYTES: int = 10 * 1024 * 1024
+    IMAGE_MAX_PIXELS: int = 40_000_000
+    # Int8 quantization: generated calibration samples when none are sent
+    MODEL_QUANTIZE_CALIBRATION_SAMPLES: int = 64
+    MODEL_QUANTIZE_MAX_SAMPLES: int = 1024
+    # Benchmarks: largest batch and thread count, and samples run per benchmark
+    MODEL_BENCHMARK_MAX_BATCH: int = 256
+    MODEL_BENCHMARK_MAX_THREADS: int = 16
+    MODEL_BENCHMARK_MAX_SAMPLES: int = 250_000
+    # C header export: flash and RAM a sketch typically leaves for a model, by device type
+    MODEL_EXPORT_BUDGETS: Dict[str, Dict[str, int]] = {
+        "arduino": {"flash": 24 * 1024, "ram": 1024},
+        "esp32": {"flash": 1024 * 1024, "ram": 128 * 1024},
+        "raspberry-pi": {"flash": 64 * 1024 * 1024, "ram": 64 * 1024 * 1024},
+    }
+    MODEL_EXPORT_MAX_BYTES: int = 16 * 1024 * 1024  # flash, when no device type is given
+    # Forecasting models trained on sensor readings; readings consumed per fit
+    MODEL_TRAINING_PROCESSES: int = 2  # 0 = one per CPU
+    MODEL_TRAINING_MAX_READINGS: int = 1_000_000
+    
+    # Over-the-air firmware updates, sent as deltas in checksummed chunks
+    FIRMWARE_STORAGE_DIR: str = "./firmware_store"
+    FIRMWARE_MAX_BYTES: int = 16 * 1024 * 1024
+    OTA_CHUNK_SIZE: int = 4096
+    OTA_DELTA_BLOCK_SIZE: int = 256
+    OTA_MAX_CONCURRENT_DEVICES: int = 32
+    OTA_MAX_DEVICES_PER_JOB: int = 1000
+    OTA_RETRIES: int = 8  # per request, on lost packets and corrupted chunks
+    OTA_TIMEOUT_SECONDS: float = 10.0
+    # Simulated devices (device type "simulator") take updates in process
+    DEVICE_SIMULATOR_FAILURE_RATE: float = 0.0
+    DEVICE_SIMULATOR_LATENCY_MS: float = 0.0
+    
+    # Device command queues: unacknowledged batches are resent with backoff
+    DEVICE_COMMAND_MAX_PENDING: int = 1000  # per device, after coalescing
+    DEVICE_COMMAND_RETRY_SECONDS: float = 5.0
+    DEVICE_COMMAND_MAX_RETRY_SECONDS: float = 300.0
+    DEVICE_COMMAND_MAX_WAIT_SECONDS: float = 60.0  # longest long-poll
+    # Long-polls also recheck the database this often, for commands queued by other workers
+    DEVICE_COMMAND_RECHECK_SECONDS: float = 2.0
+    
+    # Change feed (/api/changes): events kept for resuming streams, and keepalive interval
+    CHANGE_FEED_JOURNAL_SIZE: int = 10000
+    CHANGE_FEED_KEEPALIVE_SECONDS: float = 15.0
+    
+    # Background jobs (quantization, benchmarks, training, firmware updates)
+    JOBS_MAX_CONCURRENT: int = 2
+    JOBS_HISTORY: int = 500
+    
+    # Learning progress
+    TUTORIAL_XP_REWARD: int = 50
+    TUTORIAL_COUNT_CACHE_SECONDS: int = 300
+    LEADERBOARD_MAX_PAGE_SIZE: int = 100
+    
     # MQTT (for IoT devices)
     MQTT_BROKER: str = "localhost"
     MQTT_PORT: int = 1883
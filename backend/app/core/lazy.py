@@ -0,0 +1,61 @@
+"""Deferred imports for optional, slow-to-import dependencies"""
+
+import importlib
+import importlib.util
+import time
+from types import ModuleType
+from typing import Optional
+
+from app.core.metrics import registry
+
+
+lazy_import_seconds = registry.gauge(
+    "lazy_import_seconds",
+    "Time taken by the first use of a lazily imported module",
+    ("module",),
+)
+
+
+class LazyModule(ModuleType):
+    """Module proxy that imports the real module on first attribute access
+
+    Keeps numpy, Pillow, paho-mqtt and friends off the startup path so
+    workers become ready before any feature that needs them is used.
+    """
+
+    def __init__(self, name: str, feature: Optional[str] = None):
+        super().__init__(name)
+        self.__dict__["_feature"] = feature
+        self.__dict__["_module"] = None
+
+    def _load(self) -> ModuleType:
+        module = self.__dict__["_module"]
+        if module is None:
+            start = time.perf_counter()
+            try:
+                module = importlib.import_module(self.__name__)
+            except ImportError as exc:
+                feature = self.__dict__["_feature"] or "this feature"
+                raise ImportError(
+                    f"{self.__name__} is required for {feature}; "
+                    "install it with `pip install -r requirements.txt`"
+                ) from exc
+            lazy_import_seconds.set(time.perf_counter() - start, (self.__name__,))
+            self.__dict__["_module"] = module
+        return module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+def lazy_import(name: str, feature: Optional[str] = None) -> LazyModule:
+    """Return a proxy for module `name`, imported when first used"""
+    return LazyModule(name, feature)
+
+
+def is_available(name: str) -> bool:
+    """Whether a module can be imported, without importing it"""
+    return importlib.util.find_spec(name) is not None
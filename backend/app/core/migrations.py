@@ -0,0 +1,69 @@
+"""Schema revision check and startup migrations"""
+
+import logging
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy.engine import Connection
+
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Head of alembic/versions; bump together with every new migration
+SCHEMA_REVISION = "0012"
+
+ALEMBIC_INI = Path(__file__).resolve().parents[2] / "alembic.ini"
+
+
+def current_revision(conn: Connection) -> Optional[str]:
+    if not conn.dialect.has_table(conn, "alembic_version"):
+        return None
+    return conn.exec_driver_sql("SELECT version_num FROM alembic_version").scalar()
+
+
+def _alembic_config(conn: Connection):
+    from alembic.config import Config
+
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option("script_location", str(ALEMBIC_INI.parent / "alembic"))
+    config.attributes["connection"] = conn
+    config.attributes["configure_logging"] = False
+    return config
+
+
+def ensure_schema(conn: Connection) -> str:
+    """Verify the database is at SCHEMA_REVISION, migrating if allowed
+
+    The common case is a single-row read of alembic_version; Alembic itself
+    is only imported when the schema is behind.
+    """
+    revision = current_revision(conn)
+    if revision == SCHEMA_REVISION:
+        return revision
+
+    if not settings.DATABASE_AUTO_MIGRATE:
+        raise RuntimeError(
+            f"Database schema is at revision {revision}, expected {SCHEMA_REVISION}; "
+            "run `alembic upgrade head` from backend/"
+        )
+
+    from alembic import command
+
+    config = _alembic_config(conn)
+    if revision is None and conn.dialect.has_table(conn, "users"):
+        # Database created by create_all before migrations existed
+        baseline = "0002" if conn.dialect.has_table(conn, "search_index") else "0001"
+        logger.warning("Stamping unversioned database as revision %s", baseline)
+        command.stamp(config, baseline)
+
+    logger.info("Migrating database schema from %s to %s", revision, SCHEMA_REVISION)
+    command.upgrade(config, "head")
+
+    revision = current_revision(conn)
+    if revision != SCHEMA_REVISION:
+        raise RuntimeError(
+            f"Migrations ended at revision {revision}, but the app expects {SCHEMA_REVISION}"
+        )
+    return revision
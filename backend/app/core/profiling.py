@@ -0,0 +1,171 @@
+"""Per-request SQL profiling: query counts, DB time, slow queries and N+1 detection"""
+
+import json
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.metrics import registry, route_template
+
+
+logger = logging.getLogger("app.sql")
+
+db_queries = registry.histogram(
+    "db_queries_per_request",
+    "SQL statements executed per HTTP request",
+    ("route",),
+    buckets=(1, 2, 5, 10, 20, 50, 100, 250),
+)
+db_time = registry.histogram(
+    "db_time_per_request_seconds",
+    "Time spent in SQL statements per HTTP request",
+    ("route",),
+)
+n_plus_one_detected = registry.counter(
+    "db_n_plus_one_total",
+    "Requests that repeated one statement shape past the N+1 threshold",
+    ("route",),
+)
+
+
+@dataclass
+class QueryProfile:
+    method: str = ""
+    path: str = ""
+    count: int = 0
+    total_time: float = 0.0
+    shapes: Counter = field(default_factory=Counter)
+    slowest: List[Tuple[float, str]] = field(default_factory=list)
+    repeated: List[str] = field(default_factory=list)
+
+    def record(self, statement: str, duration: float) -> None:
+        self.count += 1
+        self.total_time += duration
+
+        # Parameters are bound separately, so the SQL text is the statement shape
+        self.shapes[statement] += 1
+        if self.shapes[statement] == settings.SQL_N_PLUS_ONE_THRESHOLD:
+            self.repeated.append(statement)
+            logger.warning(
+                json.dumps(
+                    {
+                        "event": "n_plus_one",
+                        "method": self.method,
+                        "path": self.path,
+                        "repeats": settings.SQL_N_PLUS_ONE_THRESHOLD,
+                        "statement": statement,
+                    }
+                )
+            )
+
+        self.slowest.append((duration, statement))
+        self.slowest.sort(key=lambda item: item[0], reverse=True)
+        del self.slowest[settings.SQL_PROFILE_SLOWEST:]
+
+
+_current_profile: ContextVar[Optional[QueryProfile]] = ContextVar(
+    "query_profile", default=None
+)
+
+
+def current_profile() -> Optional[QueryProfile]:
+    return _current_profile.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info["query_start_time"].pop()
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.record(statement, duration)
+
+    if duration * 1000 >= settings.SQL_SLOW_QUERY_MS:
+        logger.warning(
+            json.dumps(
+                {
+                    "event": "slow_query",
+                    "duration_ms": round(duration * 1000, 3),
+                    "method": profile.method if profile else None,
+                    "path": profile.path if profile else None,
+                    "executemany": executemany,
+                    "statement": statement,
+                }
+            )
+        )
+
+
+def _handle_error(exception_context):
+    # Failed statements never reach after_cursor_execute
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_start_time"):
+        conn.info["query_start_time"].pop()
+
+
+def install_query_profiler(engine: AsyncEngine) -> None:
+    """Attach timing hooks to the engine's cursor executions"""
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine.sync_engine, "handle_error", _handle_error)
+
+
+class QueryProfilingMiddleware:
+    """Attributes SQL statements to the HTTP request that issued them"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = QueryProfile(method=scope["method"], path=scope["path"])
+        token = _current_profile.set(profile)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start" and settings.SQL_DEBUG_HEADER:
+                headers = MutableHeaders(scope=message)
+                db_ms = profile.total_time * 1000
+                headers.append(
+                    "Server-Timing", f'db;dur={db_ms:.2f};desc="{profile.count} queries"'
+                )
+                headers.append("X-DB-Queries", str(profile.count))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_profile.reset(token)
+            route = route_template(scope)
+            db_queries.observe(profile.count, (route,))
+            db_time.observe(profile.total_time, (route,))
+            if profile.repeated:
+                n_plus_one_detected.inc((route,))
+            if profile.count and logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    json.dumps(
+                        {
+                            "event": "request_queries",
+                            "method": profile.method,
+                            "route": route,
+                            "queries": profile.count,
+                            "db_ms": round(profile.total_time * 1000, 3),
+                            "slowest": [
+                                {"duration_ms": round(d * 1000, 3), "statement": stmt}
+                                for d, stmt in profile.slowest
+                            ],
+                        }
+                    )
+                )
@@ -0,0 +1,38 @@
+"""Response helpers - fast JSON rendering and prebuilt-adapter serialization"""
+
+import json
+from typing import Any
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is listed in requirements
+    orjson = None
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson, falling back to compact stdlib json"""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(
+            content, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode("utf-8")
+
+
+def serialize(adapter: TypeAdapter, data: Any) -> bytes:
+    """Validate ORM objects through a prebuilt adapter and dump JSON bytes"""
+    return adapter.dump_json(adapter.validate_python(data, from_attributes=True))
+
+
+def model_response(adapter: TypeAdapter, data: Any, status_code: int = 200) -> Response:
+    """Build a JSON response without going through FastAPI's generic encoder"""
+    return Response(
+        content=serialize(adapter, data),
+        status_code=status_code,
+        media_type="application/json",
+    )
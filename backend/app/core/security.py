@@ -4,13 +4,14 @@ from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
 
 from app.core.config import settings
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login", auto_error=False)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -50,3 +51,18 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     if payload is None:
         raise credentials_exception
     return payload
+
+
+async def get_optional_user(token: Optional[str] = Depends(optional_oauth2_scheme)):
+    """Like get_current_user, but returns None for anonymous requests"""
+    if token is None:
+        return None
+    return decode_token(token)
+
+
+async def get_stream_user(
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    access_token: Optional[str] = Query(None),
+):
+    """Like get_current_user, also taking ?access_token= for EventSource, which cannot send headers"""
+    return await get_current_user(token or access_token or "")
@@ -3,22 +3,65 @@ IoT & AI Visual Programming Platform - Backend
 FastAPI application entry point
 """
 
+import time
+
+_import_started = time.perf_counter()
+
+import asyncio
+import logging
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from contextlib import asynccontextmanager
 
 from app.api import router as api_router
+from app.core.cache import response_cache
+from app.core.compression import GzipRequestMiddleware
 from app.core.config import settings
-from app.core.database import engine, Base
+from app.core.database import engine
+from app.core.metrics import registry, MetricsMiddleware, sample_event_loop_lag
+from app.core.migrations import ensure_schema
+from app.core.profiling import QueryProfilingMiddleware, install_query_profiler
+from app.core.responses import FastJSONResponse
+from app.services.jobs import jobs
+from app.services.ml.batching import batchers
+from app.services.ml.training import close_training_executor
+
+
+logger = logging.getLogger(__name__)
+
+startup_seconds = registry.gauge(
+    "app_startup_seconds",
+    "Seconds from importing the app module until it was ready to serve",
+)
+schema_check_seconds = registry.gauge(
+    "app_schema_check_seconds",
+    "Seconds spent verifying (and if needed migrating) the database schema",
+)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    check_started = time.perf_counter()
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(ensure_schema)
+    schema_check_seconds.set(time.perf_counter() - check_started)
+    lag_sampler = None
+    if settings.METRICS_ENABLED:
+        lag_sampler = asyncio.create_task(
+            sample_event_loop_lag(settings.EVENT_LOOP_LAG_INTERVAL_SECONDS)
+        )
+    startup_seconds.set(time.perf_counter() - _import_started)
+    logger.info("Ready in %.3fs", time.perf_counter() - _import_started)
     yield
     # Shutdown
+    if lag_sampler is not None:
+        lag_sampler.cancel()
+    await jobs.close()
+    batchers.close()
+    close_training_executor()
     await engine.dispose()
 
 
@@ -27,8 +70,19 @@ app = FastAPI(
     description="Visual IoT and AI/ML Learning Platform API",
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
 
+# Compress large responses for clients that send Accept-Encoding: gzip
+app.add_middleware(
+    GZipMiddleware,
+    minimum_size=settings.GZIP_MINIMUM_SIZE,
+    compresslevel=settings.GZIP_COMPRESS_LEVEL,
+)
+
+# Inflate gzip request bodies (batched device telemetry)
+app.add_middleware(GzipRequestMiddleware, max_size=settings.GZIP_REQUEST_MAX_SIZE)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -38,6 +92,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# SQL statements attributed to each request (replaces engine echo)
+if settings.SQL_PROFILING_ENABLED:
+    install_query_profiler(engine)
+    app.add_middleware(QueryProfilingMiddleware)
+
+# Request metrics (outermost, so timings include every other middleware)
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    registry.callback_gauge(
+        "response_cache_hits", "Response cache hits", lambda: response_cache.hits
+    )
+    registry.callback_gauge(
+        "response_cache_misses", "Response cache misses", lambda: response_cache.misses
+    )
+
 # Include API routes
 app.include_router(api_router, prefix="/api")
 
@@ -54,3 +123,8 @@ async def root():
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
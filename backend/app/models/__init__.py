@@ -2,7 +2,10 @@
 
 from datetime import datetime
 from typing import Optional, List
-from sqlalchemy import String, Text, DateTime, ForeignKey, JSON, Boolean, Enum
+from sqlalchemy import (
+    BigInteger, String, Text, DateTime, ForeignKey, JSON, Boolean, Enum, Index, LargeBinary,
+    UniqueConstraint,
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 import enum
 
@@ -48,13 +51,33 @@ class User(Base):
     devices: Mapped[List["Device"]] = relationship(back_populates="owner")
 
 
+class Blob(Base):
+    """Content-addressed, zlib-compressed payload shared between rows"""
+
+    __tablename__ = "blobs"
+
+    hash: Mapped[str] = mapped_column(String(64), primary_key=True)  # SHA-256 of content
+    data: Mapped[bytes] = mapped_column(LargeBinary)  # zlib-compressed content
+    size: Mapped[int] = mapped_column()  # Uncompressed size in bytes
+    ref_count: Mapped[int] = mapped_column(default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+    @property
+    def text(self) -> str:
+        from app.services.blob_store import decompress_text
+
+        return decompress_text(self.hash, self.data)
+
+
 class Project(Base):
     __tablename__ = "projects"
 
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(String(255))
     description: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
-    blocks: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # Blockly XML
+    blocks_hash: Mapped[Optional[str]] = mapped_column(
+        ForeignKey("blobs.hash"), nullable=True, index=True
+    )  # Blockly XML, stored as a Blob
     generated_code: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     thumbnail: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
     tags: Mapped[Optional[dict]] = mapped_column(JSON, default=list)
@@ -69,10 +92,43 @@ class Project(Base):
 
     # Relationships
     owner: Mapped["User"] = relationship(back_populates="projects")
+    # Loaded explicitly (selectinload) only by routes that return blocks
+    blocks_blob: Mapped[Optional["Blob"]] = relationship(lazy="raise")
+
+    @property
+    def blocks(self) -> Optional[str]:
+        """Blockly XML, decompressed on first access"""
+        if self.blocks_hash is None:
+            return None
+        return self.blocks_blob.text
+
+
+class ProjectRevision(Base):
+    """A saved version of a project's blocks, stored as a keyframe or a delta"""
+
+    __tablename__ = "project_revisions"
+    __table_args__ = (UniqueConstraint("project_id", "revision"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    project_id: Mapped[int] = mapped_column(ForeignKey("projects.id"))
+    revision: Mapped[int] = mapped_column()
+    is_keyframe: Mapped[bool] = mapped_column(Boolean, default=False)
+    # Keyframes point at a full Blob; other revisions hold a compressed delta
+    # against the previous revision
+    blob_hash: Mapped[Optional[str]] = mapped_column(ForeignKey("blobs.hash"), nullable=True)
+    delta: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)
+    size: Mapped[int] = mapped_column(default=0)  # Uncompressed blocks size
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+    blob: Mapped[Optional["Blob"]] = relationship(lazy="raise")
 
 
 class Device(Base):
     __tablename__ = "devices"
+    # A MAC address may only be registered once per user
+    __table_args__ = (
+        UniqueConstraint("owner_id", "mac_address", name="uq_devices_owner_mac"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(String(255))
@@ -86,6 +142,8 @@ class Device(Base):
     metadata: Mapped[Optional[dict]] = mapped_column(JSON, default=dict)
     last_seen: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    # Last sequence number given to a command for this device
+    command_seq: Mapped[int] = mapped_column(default=0, server_default="0")
 
     # Foreign keys
     owner_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
@@ -94,6 +152,28 @@ class Device(Base):
     owner: Mapped["User"] = relationship(back_populates="devices")
 
 
+class DeviceCommand(Base):
+    """A command queued for a device and not yet acknowledged by it"""
+
+    __tablename__ = "device_commands"
+    __table_args__ = (
+        UniqueConstraint("device_id", "seq"),
+        Index("ix_device_commands_device_key", "device_id", "key"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    device_id: Mapped[int] = mapped_column(ForeignKey("devices.id"))
+    seq: Mapped[int] = mapped_column()
+    name: Mapped[str] = mapped_column(String(50))
+    params: Mapped[dict] = mapped_column(JSON, default=dict)
+    # A newer command with the same key supersedes this one
+    key: Mapped[Optional[str]] = mapped_column(String(120), nullable=True)
+    attempts: Mapped[int] = mapped_column(default=0)
+    next_attempt_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    expires_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
 class AIModel(Base):
     __tablename__ = "ai_models"
 
@@ -104,6 +184,10 @@ class AIModel(Base):
     accuracy: Mapped[Optional[float]] = mapped_column(nullable=True)
     size: Mapped[Optional[str]] = mapped_column(String(50), nullable=True)
     file_path: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
+    # Int8 variant of the weights, served by default once present
+    quantized_path: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
+    # p50 of one sample on one thread for the served variant, from the latest benchmark
+    latency_ms: Mapped[Optional[float]] = mapped_column(nullable=True)
     is_pretrained: Mapped[bool] = mapped_column(Boolean, default=True)
     is_public: Mapped[bool] = mapped_column(Boolean, default=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
@@ -113,9 +197,95 @@ class AIModel(Base):
         ForeignKey("users.id"), nullable=True
     )
 
+    @property
+    def quantized(self) -> bool:
+        return self.quantized_path is not None
+
+
+class ModelTraining(Base):
+    """How a model is fit to a device's sensor readings, and how far it has got"""
+
+    __tablename__ = "model_trainings"
+
+    model_id: Mapped[int] = mapped_column(ForeignKey("ai_models.id"), primary_key=True)
+    device_id: Mapped[int] = mapped_column(ForeignKey("devices.id"))
+    sensor_type: Mapped[str] = mapped_column(String(50))
+    algorithm: Mapped[str] = mapped_column(String(20))  # ridge, sgd
+    lags: Mapped[int] = mapped_column()
+    alpha: Mapped[float] = mapped_column()
+    learning_rate: Mapped[float] = mapped_column()
+    epochs: Mapped[int] = mapped_column()
+    samples: Mapped[int] = mapped_column(default=0)  # windows fit so far
+    # Last reading fit, in (timestamp, id) order; later ones are new data
+    last_timestamp: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    last_reading_id: Mapped[Optional[int]] = mapped_column(nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
+
+
+class ModelBenchmark(Base):
+    """One measured configuration of a model benchmark run"""
+
+    __tablename__ = "model_benchmarks"
+    __table_args__ = (Index("ix_model_benchmarks_model_created", "model_id", "created_at"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    model_id: Mapped[int] = mapped_column(ForeignKey("ai_models.id"))
+    run_id: Mapped[str] = mapped_column(String(32))  # job id, shared by a run's rows
+    variant: Mapped[str] = mapped_column(String(20))  # float32, int8
+    batch_size: Mapped[int] = mapped_column()
+    threads: Mapped[int] = mapped_column()
+    iterations: Mapped[int] = mapped_column()
+    p50_ms: Mapped[float] = mapped_column()
+    p99_ms: Mapped[float] = mapped_column()
+    mean_ms: Mapped[float] = mapped_column()
+    throughput: Mapped[float] = mapped_column()  # samples per second
+    peak_memory_bytes: Mapped[int] = mapped_column(BigInteger)
+    host: Mapped[str] = mapped_column(String(100))
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class ModelUpload(Base):
+    """A chunked, resumable upload of a model archive"""
+
+    __tablename__ = "model_uploads"
+
+    id: Mapped[str] = mapped_column(String(32), primary_key=True)  # uuid4 hex
+    owner_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
+    filename: Mapped[str] = mapped_column(String(255))
+    total_size: Mapped[int] = mapped_column(BigInteger)
+    chunk_size: Mapped[int] = mapped_column()
+    received_bytes: Mapped[int] = mapped_column(BigInteger, default=0)
+    expected_sha256: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    sha256: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    status: Mapped[str] = mapped_column(String(20), default="uploading")  # uploading, complete
+    # Model to create, or an existing model to attach the weights to
+    name: Mapped[str] = mapped_column(String(255))
+    model_type: Mapped[str] = mapped_column(String(50))
+    description: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    model_id: Mapped[Optional[int]] = mapped_column(
+        ForeignKey("ai_models.id"), nullable=True
+    )
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
+
+    @property
+    def next_chunk(self) -> int:
+        if self.received_bytes >= self.total_size:
+            return self.total_chunks
+        return self.received_bytes // self.chunk_size
+
+    @property
+    def total_chunks(self) -> int:
+        return max(-(-self.total_size // self.chunk_size), 1)
+
 
 class SensorData(Base):
     __tablename__ = "sensor_data"
+    __table_args__ = (Index("ix_sensor_data_device_time", "device_id", "timestamp"),)
 
     id: Mapped[int] = mapped_column(primary_key=True)
     device_id: Mapped[int] = mapped_column(ForeignKey("devices.id"))
@@ -143,6 +313,10 @@ class Tutorial(Base):
 
 class UserProgress(Base):
     __tablename__ = "user_progress"
+    # One row per user and tutorial, so completing it twice is an upsert
+    __table_args__ = (
+        Index("ix_user_progress_user_tutorial", "user_id", "tutorial_id", unique=True),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
@@ -150,3 +324,15 @@ class UserProgress(Base):
     completed: Mapped[bool] = mapped_column(Boolean, default=False)
     completed_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
     xp_earned: Mapped[int] = mapped_column(default=0)
+
+
+class UserStats(Base):
+    """Per-user learning aggregates, maintained alongside UserProgress"""
+
+    __tablename__ = "user_stats"
+    __table_args__ = (Index("ix_user_stats_leaderboard", "total_xp", "user_id"),)
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    completed_count: Mapped[int] = mapped_column(default=0)
+    total_xp: Mapped[int] = mapped_column(default=0)
+    last_completed_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
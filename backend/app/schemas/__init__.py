@@ -1,8 +1,8 @@
 """Pydantic schemas for API requests and responses"""
 
 from datetime import datetime
-from typing import Optional, List
-from pydantic import BaseModel, EmailStr
+from typing import Any, Dict, Optional, List
+from pydantic import BaseModel, EmailStr, Field
 from enum import Enum
 
 
@@ -99,6 +99,36 @@ class ProjectResponse(ProjectBase):
         from_attributes = True
 
 
+class ProjectRevisionResponse(BaseModel):
+    revision: int
+    is_keyframe: bool
+    size: int
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class ProjectRevisionDetail(ProjectRevisionResponse):
+    blocks: Optional[str] = None
+
+
+class ProjectDiffChange(BaseModel):
+    op: str  # replace, delete, insert
+    old_start: int
+    old_end: int
+    new_start: int
+    new_end: int
+    old: str
+    new: str
+
+
+class ProjectDiffResponse(BaseModel):
+    from_revision: int
+    to_revision: int
+    changes: List[ProjectDiffChange]
+
+
 # Device schemas
 class DeviceBase(BaseModel):
     name: str
@@ -129,6 +159,95 @@ class DeviceResponse(DeviceBase):
         from_attributes = True
 
 
+class DeviceBulkCreate(BaseModel):
+    devices: List[DeviceCreate] = Field(..., min_length=1, max_length=1000)
+
+
+class DeviceBulkUpdateItem(DeviceUpdate):
+    id: int
+
+
+class DeviceBulkUpdate(BaseModel):
+    devices: List[DeviceBulkUpdateItem] = Field(..., min_length=1, max_length=1000)
+
+
+class DeviceBulkIds(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=1000)
+
+
+class BulkItemResult(BaseModel):
+    index: int
+    id: Optional[int] = None
+    status: str  # created, updated, deleted, pinged, queued, not_found, conflict, queue_full
+    detail: Optional[str] = None
+
+
+class BulkOperationResponse(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[BulkItemResult]
+
+
+# Device command schemas
+class DeviceCommandCreate(BaseModel):
+    name: str = Field(..., min_length=1, max_length=50)  # digital_write, led, set_config, ...
+    params: Dict[str, Any] = Field(default_factory=dict)
+    key: Optional[str] = Field(None, max_length=120)  # commands with the same key coalesce
+    ttl_seconds: Optional[int] = Field(None, ge=1)
+
+
+class DeviceCommandResponse(BaseModel):
+    seq: int
+    name: str
+    params: Dict[str, Any]
+    key: Optional[str] = None
+    attempts: int
+    created_at: datetime
+    expires_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class DeviceCommandQueued(DeviceCommandResponse):
+    superseded: int  # queued commands this one replaced
+
+
+class DeviceCommandBatch(BaseModel):
+    commands: List[DeviceCommandResponse]
+    acked: int = 0
+
+
+class DeviceCommandAck(BaseModel):
+    seq: int = Field(..., ge=0)
+
+
+class DeviceBulkCommand(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=1000)
+    command: DeviceCommandCreate
+
+
+# Simulated device schemas
+class SimulatedDeviceResponse(BaseModel):
+    device_id: int
+    firmware_sha256: Optional[str] = None
+    firmware_size: int
+    failure_rate: float
+    bytes_received: int
+
+
+class SimulatedDeviceUpdate(BaseModel):
+    failure_rate: float = Field(..., ge=0, le=1)
+
+
+class OTATransferStart(BaseModel):
+    id: str = Field(..., min_length=1, max_length=64)
+    size: int = Field(..., ge=0)
+    sha256: str = Field(..., min_length=64, max_length=64)
+    base_sha256: Optional[str] = None
+    target_sha256: str = Field(..., min_length=64, max_length=64)
+
+
 # AI Model schemas
 class AIModelBase(BaseModel):
     name: str
@@ -145,12 +264,148 @@ class AIModelResponse(AIModelBase):
     accuracy: Optional[float] = None
     size: Optional[str] = None
     is_pretrained: bool
+    quantized: bool = False
+    latency_ms: Optional[float] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class ModelTestRequest(BaseModel):
+    # Batch of samples shaped like the model's input; omitted = generated sample
+    inputs: Optional[List[Any]] = None
+    top_k: int = Field(3, ge=1, le=20)
+
+
+class ModelPrediction(BaseModel):
+    index: int
+    label: Optional[str] = None
+    confidence: Optional[float] = None
+    value: Optional[float] = None
+
+
+class ModelTestResponse(BaseModel):
+    model: str
+    status: str
+    result: str
+    confidence: Optional[float] = None
+    predictions: List[List[ModelPrediction]]
+    latency_ms: float
+    # Image decoding and preprocessing, included in latency_ms
+    preprocess_ms: Optional[float] = None
+    variant: str = "float32"
+
+
+class ModelQuantizeRequest(BaseModel):
+    # Calibration batch; omitted = generated samples
+    inputs: Optional[List[Any]] = None
+    # Expected class per input, to measure accuracy rather than agreement
+    labels: Optional[List[int]] = None
+
+
+class ModelBenchmarkRequest(BaseModel):
+    batch_sizes: List[int] = Field([1, 8, 32], min_length=1, max_length=8)
+    threads: Optional[List[int]] = Field(None, min_length=1, max_length=8)  # default 1 and all CPUs
+    iterations: int = Field(30, ge=1, le=1000)
+    warmup: int = Field(3, ge=0, le=100)
+    # Served variant by default; "all" benchmarks float32 and int8
+    variant: str = Field("auto", pattern="^(auto|all|float32|int8)$")
+
+
+class ModelBenchmarkResponse(BaseModel):
+    id: int
+    run_id: str
+    variant: str
+    batch_size: int
+    threads: int
+    iterations: int
+    p50_ms: float
+    p99_ms: float
+    mean_ms: float
+    throughput: float
+    peak_memory_bytes: int
+    host: str
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class ModelTrainRequest(BaseModel):
+    name: str
+    description: Optional[str] = None
+    device_id: int
+    sensor_type: str = Field(..., max_length=50)
+    # Predicts the next reading from the previous `lags`
+    algorithm: str = Field("ridge", pattern="^(ridge|sgd)$")
+    lags: int = Field(8, ge=1, le=64)
+    alpha: float = Field(1.0, ge=0)  # L2 penalty
+    learning_rate: float = Field(0.05, gt=0, le=1)  # sgd only
+    epochs: int = Field(1, ge=1, le=50)  # sgd passes over each batch of new readings
+
+
+class ModelExportRequest(BaseModel):
+    # Checks the model against this device type's flash and RAM budget
+    target_device: Optional[DeviceType] = None
+    # Calibration batch for activation ranges; omitted = generated samples
+    inputs: Optional[List[Any]] = None
+
+
+class ModelExportResponse(BaseModel):
+    filename: str
+    symbol: str  # prefix of the header's functions and macros
+    header: str
+    flash_bytes: int
+    ram_bytes: int
+    target_device: Optional[DeviceType] = None
+    budget: Optional[Dict[str, int]] = None
+    report: Dict[str, Any]  # agreement with the float model on the calibration batch
+
+
+class JobResponse(BaseModel):
+    id: str
+    kind: str
+    target_id: Optional[int] = None
+    status: str
+    progress: float
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
     created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
 
 
+class ModelUploadCreate(BaseModel):
+    filename: str = Field(..., max_length=255)
+    size: int = Field(..., gt=0)
+    # Defaults to MODEL_UPLOAD_CHUNK_SIZE
+    chunk_size: Optional[int] = None
+    # Verified on completion; lets content your models already use skip the upload
+    sha256: Optional[str] = Field(None, pattern="^[0-9a-fA-F]{64}$")
+    # Attach the weights to this model instead of creating a new one
+    model_id: Optional[int] = None
+    name: Optional[str] = Field(None, max_length=255)
+    model_type: str = "vision"
+    description: Optional[str] = None
+
+
+class ModelUploadResponse(BaseModel):
+    upload_id: str
+    filename: str
+    size: int
+    chunk_size: int
+    received_bytes: int
+    next_chunk: int
+    total_chunks: int
+    status: str
+    sha256: Optional[str] = None
+    model: Optional[AIModelResponse] = None
+
+
 # Sensor data schemas
 class SensorDataCreate(BaseModel):
     device_id: int
@@ -167,6 +422,21 @@ class SensorDataResponse(SensorDataCreate):
         from_attributes = True
 
 
+class SensorReading(BaseModel):
+    sensor_type: str = Field(..., max_length=50)
+    value: float
+    unit: Optional[str] = Field(None, max_length=20)
+    timestamp: Optional[datetime] = None
+
+
+class SensorReadingBatch(BaseModel):
+    readings: List[SensorReading] = Field(..., min_length=1, max_length=1000)
+
+
+class SensorIngestResponse(BaseModel):
+    accepted: int
+
+
 # Tutorial schemas
 class TutorialResponse(BaseModel):
     id: int
@@ -181,6 +451,31 @@ class TutorialResponse(BaseModel):
         from_attributes = True
 
 
+class LeaderboardEntry(BaseModel):
+    rank: int
+    user_id: int
+    name: str
+    total_xp: int
+    completed_count: int
+    last_completed_at: Optional[datetime] = None
+
+
+# Search schemas
+class SearchResult(BaseModel):
+    type: str  # project, tutorial, model
+    id: int
+    title: str
+    snippet: str
+    score: float
+
+
+class SearchResponse(BaseModel):
+    query: str
+    skip: int
+    limit: int
+    results: List[SearchResult]
+
+
 # Code generation schemas
 class CodeGenerationRequest(BaseModel):
     blocks: str  # Blockly XML
@@ -192,3 +487,5 @@ class CodeGenerationResponse(BaseModel):
     code: str
     language: str
     warnings: List[str] = []
+    # Extra files the code includes, by name (e.g. exported model headers)
+    files: Dict[str, str] = {}
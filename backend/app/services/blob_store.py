@@ -0,0 +1,100 @@
+"""Blob store service - content-addressed, compressed storage with refcounts"""
+
+import hashlib
+import zlib
+from collections import OrderedDict
+from typing import Optional
+
+from sqlalchemy import update, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.lazy import lazy_import
+from app.models import Blob
+
+
+# Only the dialect the app actually runs on gets imported
+_UPSERT_DIALECTS = {
+    "sqlite": lazy_import("sqlalchemy.dialects.sqlite"),
+    "postgresql": lazy_import("sqlalchemy.dialects.postgresql"),
+}
+
+
+# Blobs are immutable, so decompressed text can be shared across sessions
+_text_cache: "OrderedDict[str, str]" = OrderedDict()
+
+
+def decompress_text(blob_hash: str, data: bytes) -> str:
+    """Decompress blob data, keeping recently used texts in memory"""
+    text = _text_cache.get(blob_hash)
+    if text is None:
+        text = zlib.decompress(data).decode("utf-8")
+        _text_cache[blob_hash] = text
+        while len(_text_cache) > settings.BLOB_TEXT_CACHE_ENTRIES:
+            _text_cache.popitem(last=False)
+    else:
+        _text_cache.move_to_end(blob_hash)
+    return text
+
+
+async def acquire_blob(db: AsyncSession, text: Optional[str]) -> Optional[str]:
+    """Store text (or reuse an identical blob), take a reference and return its hash"""
+    if text is None:
+        return None
+
+    raw = text.encode("utf-8")
+    blob_hash = hashlib.sha256(raw).hexdigest()
+    values = {
+        "hash": blob_hash,
+        "data": zlib.compress(raw, settings.BLOB_COMPRESSION_LEVEL),
+        "size": len(raw),
+        "ref_count": 1,
+    }
+
+    dialect = _UPSERT_DIALECTS.get(db.bind.dialect.name)
+    if dialect is not None:
+        stmt = dialect.insert(Blob).values(**values)
+        await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[Blob.hash],
+                set_={"ref_count": Blob.ref_count + 1},
+            )
+        )
+    else:
+        existing = await db.get(Blob, blob_hash)
+        if existing is None:
+            db.add(Blob(**values))
+            await db.flush()
+        else:
+            await add_reference(db, blob_hash)
+
+    return blob_hash
+
+
+async def add_reference(db: AsyncSession, blob_hash: Optional[str]) -> None:
+    """Take another reference to an existing blob without touching its data"""
+    if blob_hash is None:
+        return
+    await db.execute(
+        update(Blob)
+        .where(Blob.hash == blob_hash)
+        .values(ref_count=Blob.ref_count + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def release_blob(db: AsyncSession, blob_hash: Optional[str], count: int = 1) -> None:
+    """Drop references, deleting the blob once nothing points at it"""
+    if blob_hash is None:
+        return
+    await db.execute(
+        update(Blob)
+        .where(Blob.hash == blob_hash)
+        .values(ref_count=Blob.ref_count - count)
+        .execution_options(synchronize_session=False)
+    )
+    await db.execute(
+        delete(Blob)
+        .where(Blob.hash == blob_hash, Blob.ref_count <= 0)
+        .execution_options(synchronize_session=False)
+    )
@@ -0,0 +1,108 @@
+"""Per-user change feed for devices and projects
+
+Routes that commit a change to a device or project publish a small event
+here: the new state of the resource (without project blocks), or just
+its id when it was deleted. The journal keeps the last
+CHANGE_FEED_JOURNAL_SIZE events of all users in memory, and each
+/api/changes stream sends its user's events as they are published.
+
+Event ids are "<epoch>-<n>", where the epoch changes on every start of
+the process. A client that reconnects with a Last-Event-ID still in the
+journal gets exactly the events it missed; one from another epoch, or
+older than the journal, gets a reset event telling it to reload its
+lists first. Like jobs, the journal lives in the worker's memory, so
+with several workers a stream only sees changes made through its own
+worker unless requests are routed per user.
+"""
+
+import asyncio
+import itertools
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.core.metrics import registry
+
+
+changes_published = registry.counter(
+    "change_feed_events_total", "Change feed events published", ("event",)
+)
+
+
+@dataclass(frozen=True)
+class Change:
+    seq: int
+    owner_id: int
+    event: str  # device.updated, project.deleted, ...
+    data: Dict[str, Any]
+
+
+class ChangeJournal:
+    def __init__(self, size: int):
+        self.epoch = uuid.uuid4().hex[:8]
+        self._changes: Deque[Change] = deque(maxlen=size)
+        self._next_seq = 1
+        # owner id -> events of that user's open streams
+        self._subscribers: Dict[int, Set[asyncio.Event]] = {}
+
+    def event_id(self, seq: int) -> str:
+        return f"{self.epoch}-{seq}"
+
+    @property
+    def last_seq(self) -> int:
+        return self._next_seq - 1
+
+    def publish(self, owner_id: int, event: str, data: Dict[str, Any]) -> None:
+        self._changes.append(Change(self._next_seq, owner_id, event, data))
+        self._next_seq += 1
+        changes_published.inc((event,))
+        for signal in self._subscribers.get(owner_id, ()):
+            signal.set()
+
+    def resume_point(self, last_event_id: Optional[str]) -> Optional[int]:
+        """Sequence number to continue after, or None when events were missed for good"""
+        if not last_event_id:
+            return self.last_seq
+        epoch, _, seq = last_event_id.partition("-")
+        if epoch != self.epoch or not seq.isdigit() or int(seq) > self.last_seq:
+            return None
+        oldest = self._changes[0].seq if self._changes else self._next_seq
+        return int(seq) if int(seq) >= oldest - 1 else None
+
+    def since(self, owner_id: int, seq: int) -> Tuple[List[Change], int]:
+        """A user's changes after seq, and the sequence number to continue from"""
+        if not self._changes:
+            return [], seq
+        # Sequence numbers in the journal are consecutive
+        start = max(seq + 1 - self._changes[0].seq, 0)
+        changes = [
+            change
+            for change in itertools.islice(self._changes, start, None)
+            if change.owner_id == owner_id
+        ]
+        return changes, self.last_seq
+
+    def subscribe(self, owner_id: int) -> asyncio.Event:
+        signal = asyncio.Event()
+        self._subscribers.setdefault(owner_id, set()).add(signal)
+        return signal
+
+    def unsubscribe(self, owner_id: int, signal: asyncio.Event) -> None:
+        signals = self._subscribers.get(owner_id)
+        if signals is not None:
+            signals.discard(signal)
+            if not signals:
+                del self._subscribers[owner_id]
+
+    @property
+    def streams(self) -> int:
+        return sum(len(signals) for signals in self._subscribers.values())
+
+
+change_journal = ChangeJournal(settings.CHANGE_FEED_JOURNAL_SIZE)
+
+registry.callback_gauge(
+    "change_feed_streams", "Open change feed streams", lambda: change_journal.streams
+)
@@ -2,18 +2,199 @@
 
 import re
 import xml.etree.ElementTree as ET
-from typing import List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional
+
+
+# MODEL field value of a classify block that uses a stored model, e.g. "model:12"
+MODEL_REFERENCE = re.compile(r"^model:(\d+)$")
+
+# Most readings POST /api/devices/{id}/data accepts in one batch
+TELEMETRY_MAX_BATCH = 1000
+
+# Device-side telemetry buffer emitted once into programs that use the
+# telemetry blocks. Readings wait in a ring buffer and go to the platform's
+# batch ingest endpoint every batch_size readings or flush_seconds, so a
+# device sampling once a second sends one request a minute instead of 60.
+# While the link is down the oldest readings are dropped and sends are
+# retried every flush_seconds; batches the server rejects (4xx) are dropped.
+TELEMETRY_PYTHON = '''class Telemetry:
+    """Sensor readings buffered on the device and sent in batches"""
+
+    def __init__(self, server, device_id, token, batch_size, flush_seconds, capacity):
+        self.url = f"{server.rstrip('/')}/api/devices/{device_id}/data"
+        self.token = token
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.buffer = collections.deque(maxlen=capacity)
+        self.last_sample = {}
+        self.last_flush = time.monotonic()
+        self.failed = False
+
+    def due(self, sensor_type, interval_ms):
+        """Whether sensor_type should be sampled again"""
+        now = time.monotonic()
+        last = self.last_sample.get(sensor_type)
+        if last is not None and (now - last) * 1000 < interval_ms:
+            return False
+        self.last_sample[sensor_type] = now
+        return True
+
+    def record(self, sensor_type, value, unit=None):
+        value = float(value)
+        if value != value:  # failed sensor read (NaN)
+            return
+        reading = {
+            "sensor_type": sensor_type,
+            "value": value,
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        }
+        if unit:
+            reading["unit"] = unit
+        self.buffer.append(reading)
+        full = len(self.buffer) >= self.batch_size and not self.failed
+        if full or time.monotonic() - self.last_flush >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        self.last_flush = time.monotonic()
+        while self.buffer:
+            batch = list(itertools.islice(self.buffer, self.batch_size))
+            body = json.dumps({"readings": batch}, separators=(",", ":")).encode()
+            headers = {"Content-Type": "application/json", "Authorization": f"Bearer {self.token}"}
+            if len(body) > 1024:
+                body = gzip.compress(body)
+                headers["Content-Encoding"] = "gzip"
+            try:
+                urllib.request.urlopen(urllib.request.Request(self.url, body, headers), timeout=10).close()
+            except urllib.error.HTTPError as e:
+                if e.code >= 500 or e.code in (408, 429):
+                    self.failed = True
+                    return
+            except OSError:
+                self.failed = True
+                return
+            for _ in batch:
+                self.buffer.popleft()
+        self.failed = False
+'''
+
+TELEMETRY_CPP = '''struct TelemetryReading {
+    const char* sensorType;
+    float value;
+    const char* unit;
+    time_t timestamp;  // 0 until the clock is set over NTP
+};
+
+// Sensor readings buffered on the device and sent in batches
+class Telemetry {
+  public:
+    Telemetry(const char* url, const char* token, size_t batchSize, unsigned long flushMs)
+        : url(url), token(token), batchSize(batchSize), flushMs(flushMs) {}
+
+    void record(const char* sensorType, float value, const char* unit) {
+        if (isnan(value)) return;  // failed sensor read
+        if (count == TELEMETRY_CAPACITY) {
+            head = (head + 1) % TELEMETRY_CAPACITY;
+            count--;
+        }
+        time_t now = time(nullptr);
+        buffer[(head + count) % TELEMETRY_CAPACITY] = {sensorType, value, unit, now > 1600000000 ? now : 0};
+        count++;
+        bool full = count >= batchSize && !failed;
+        if (full || millis() - lastFlush >= flushMs) flush();
+    }
+
+    void flush() {
+        lastFlush = millis();
+        while (count > 0) {
+            size_t n = count < batchSize ? count : batchSize;
+            String body = "{\\"readings\\":[";
+            for (size_t i = 0; i < n; i++) {
+                const TelemetryReading& r = buffer[(head + i) % TELEMETRY_CAPACITY];
+                if (i) body += ',';
+                body += "{\\"sensor_type\\":\\"";
+                body += r.sensorType;
+                body += "\\",\\"value\\":";
+                body += String(r.value, 3);
+                if (r.unit[0]) {
+                    body += ",\\"unit\\":\\"";
+                    body += r.unit;
+                    body += '"';
+                }
+                if (r.timestamp) {
+                    char ts[24];
+                    strftime(ts, sizeof ts, "%Y-%m-%dT%H:%M:%SZ", gmtime(&r.timestamp));
+                    body += ",\\"timestamp\\":\\"";
+                    body += ts;
+                    body += '"';
+                }
+                body += '}';
+            }
+            body += "]}";
+
+            HTTPClient http;
+            http.begin(url);
+            http.addHeader("Content-Type", "application/json");
+            http.addHeader("Authorization", String("Bearer ") + token);
+            int status = http.POST(body);
+            http.end();
+            if (status <= 0 || status >= 500 || status == 408 || status == 429) {
+                failed = true;
+                return;
+            }
+            head = (head + n) % TELEMETRY_CAPACITY;
+            count -= n;
+        }
+        failed = false;
+    }
+
+  private:
+    const char* url;
+    const char* token;
+    size_t batchSize;
+    unsigned long flushMs;
+    TelemetryReading buffer[TELEMETRY_CAPACITY];
+    size_t head = 0;
+    size_t count = 0;
+    unsigned long lastFlush = 0;
+    bool failed = false;
+};
+'''
+
+
+def model_references(blocks_xml: str) -> List[int]:
+    """Ids of the stored models a workspace classifies with"""
+    try:
+        root = ET.fromstring(blocks_xml)
+    except ET.ParseError:
+        return []
+    ids = []
+    for field in root.findall(".//block[@type='ai_image_classify']/field[@name='MODEL']"):
+        match = MODEL_REFERENCE.match((field.text or "").strip())
+        if match and int(match.group(1)) not in ids:
+            ids.append(int(match.group(1)))
+    return ids
 
 
 class CodeGenerator:
     """Generates code from Blockly workspace XML"""
 
-    def __init__(self, language: str = "python", target_device: Optional[str] = None):
+    def __init__(
+        self,
+        language: str = "python",
+        target_device: Optional[str] = None,
+        on_device_models: Optional[Dict[str, str]] = None,
+    ):
         self.language = language
         self.target_device = target_device
+        # MODEL field value -> symbol of an exported C header (cpp only)
+        self.on_device_models = on_device_models or {}
         self.variables = set()
         self.functions = []
         self.imports = set()
+        self.includes = set()
+        # Value blocks already generated as part of their parent
+        self.consumed = set()
 
     def generate(self, blocks_xml: str) -> Tuple[str, List[str]]:
         """Generate code from Blockly XML"""
@@ -33,6 +214,8 @@ class CodeGenerator:
         
         # Process each block
         for block in root.findall(".//block"):
+            if block in self.consumed:
+                continue
             block_type = block.get("type", "")
             block_code = self._process_block(block)
             if block_code:
@@ -74,6 +257,9 @@ class CodeGenerator:
             "iot_analog_read": self._gen_analog_read,
             "iot_led_set": self._gen_led_set,
             "iot_read_temperature": self._gen_read_temp,
+            "iot_telemetry_setup": self._gen_telemetry_setup,
+            "iot_telemetry_sample": self._gen_telemetry_sample,
+            "iot_telemetry_flush": self._gen_telemetry_flush,
             
             # AI
             "ai_image_classify": self._gen_ai_classify,
@@ -186,12 +372,86 @@ class CodeGenerator:
             return f'read_temperature("{sensor}", {pin})'
         return f'readTemperature({pin})'
 
+    def _gen_value(self, block: ET.Element, name: str, default: str) -> str:
+        """Code of the block plugged into a value input"""
+        child = block.find(f"value[@name='{name}']/block")
+        if child is None:
+            return default
+        self.consumed.add(child)
+        return self._process_block(child) or default
+
+    def _field(self, block: ET.Element, name: str, default: str) -> str:
+        field = block.find(f"field[@name='{name}']")
+        return field.text if field is not None and field.text is not None else default
+
+    def _gen_telemetry_setup(self, block: ET.Element) -> str:
+        server = self._field(block, "SERVER", "http://192.168.1.10:8000").rstrip("/")
+        device = int(float(self._field(block, "DEVICE", "1")))
+        token = self._field(block, "TOKEN", "")
+        batch_size = min(max(int(float(self._field(block, "COUNT", "50"))), 1), TELEMETRY_MAX_BATCH)
+        seconds = max(float(self._field(block, "SECONDS", "60")), 1)
+        capacity = max(int(float(self._field(block, "CAPACITY", "500"))), batch_size)
+
+        if self.language == "python":
+            self.imports.update({
+                "import collections", "import datetime", "import gzip", "import itertools",
+                "import json", "import time", "import urllib.error", "import urllib.request",
+            })
+            if TELEMETRY_PYTHON not in self.functions:
+                self.functions.append(TELEMETRY_PYTHON)
+            return (
+                f'telemetry = Telemetry("{server}", {device}, "{token}", '
+                f"batch_size={batch_size}, flush_seconds={seconds:g}, capacity={capacity})"
+            )
+        self.includes.update({"#include <HTTPClient.h>", "#include <time.h>"})
+        if not any(TELEMETRY_CPP in function for function in self.functions):
+            self.functions.append(
+                f"const size_t TELEMETRY_CAPACITY = {capacity};\n\n"
+                + TELEMETRY_CPP
+                + f'\nTelemetry telemetry("{server}/api/devices/{device}/data", "{token}", '
+                f"{batch_size}, {int(seconds * 1000)});"
+            )
+        return ""
+
+    def _gen_telemetry_sample(self, block: ET.Element) -> str:
+        name = self._field(block, "NAME", "temperature")
+        unit = self._field(block, "UNIT", "")
+        ms = int(float(self._field(block, "MS", "1000")))
+        value = self._gen_value(block, "VALUE", "0")
+
+        if self.language == "python":
+            unit_arg = f', "{unit}"' if unit else ""
+            return (
+                f'if telemetry.due("{name}", {ms}):\n'
+                f'    telemetry.record("{name}", {value}{unit_arg})'
+            )
+        return (
+            "{\n"
+            "    static unsigned long lastSample = 0;\n"
+            f"    if (lastSample == 0 || millis() - lastSample >= {ms}) {{\n"
+            "        lastSample = millis();\n"
+            f'        telemetry.record("{name}", {value}, "{unit}");\n'
+            "    }\n"
+            "}"
+        )
+
+    def _gen_telemetry_flush(self, block: ET.Element) -> str:
+        if self.language == "python":
+            return "telemetry.flush()"
+        return "telemetry.flush();"
+
     def _gen_ai_classify(self, block: ET.Element) -> str:
         model_field = block.find("field[@name='MODEL']")
         model = model_field.text if model_field is not None else "mobilenet"
         
         if self.language == "python":
             return f'ai_classify_image("{model}")'
+        symbol = self.on_device_models.get(model)
+        if symbol:
+            # Runs on the device from the exported header; the sketch fills
+            # the input with <symbol>_set_input()
+            self.includes.add(f'#include "{symbol}.h"')
+            return f"{symbol}_label({symbol}_classify())"
         return f'classifyImage("{model}")'
 
     def _gen_tts(self, block: ET.Element) -> str:
@@ -271,13 +531,16 @@ main().catch(console.error);
         if self.language == "python":
             header = "# IoT & AI Visual Platform\n# Generated Python Code\n\n"
             imports = "\n".join(sorted(self.imports)) + "\n\n" if self.imports else ""
+            functions = "\n\n".join(self.functions) + "\n\n" if self.functions else ""
             body = "\n".join(code_lines)
-            return header + imports + body
+            return header + imports + functions + body
         
         elif self.language == "cpp":
             header = "// IoT & AI Visual Platform\n// Generated Arduino C++ Code\n\n"
+            includes = "\n".join(sorted(self.includes)) + "\n\n" if self.includes else ""
+            functions = "\n\n".join(self.functions) + "\n\n" if self.functions else ""
             body = "\n".join(code_lines)
-            return header + body
+            return header + includes + functions + body
         
         else:
             header = "// IoT & AI Visual Platform\n// Generated JavaScript Code\n\n"
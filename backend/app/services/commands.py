@@ -0,0 +1,208 @@
+"""Per-device command queues
+
+Commands (pin writes, LED changes, config) are stored per device with a
+sequence number from Device.command_seq, and stay queued until the
+device acknowledges them. A device long-polls for its queue and acks
+cumulatively: acking seq N removes every command up to N. Delivery is
+at least once, so devices skip sequence numbers they have already run.
+
+A batch always starts at the device's oldest unacknowledged command. If
+the batch is not acknowledged it goes out again after a backoff that
+doubles per attempt, with anything queued behind it, so commands are
+never run out of order and a command that crashes the device does not
+resend in a tight loop.
+
+Commands that only set state coalesce: a new one deletes queued commands
+with the same key, so a device that was offline gets the latest state of
+each pin rather than every change in between. Pin commands share the key
+pin:<n>, set_config commands merge their params into the newest one, and
+callers may pass their own key. Commands with a ttl expire undelivered.
+"""
+
+import asyncio
+import weakref
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.models import Device, DeviceCommand
+
+
+# Commands that set the state of a pin; only the newest per pin matters
+PIN_COMMANDS = {"digital_write", "analog_write", "led", "servo_write", "set_pin_mode"}
+# Commands whose params are merged into the newest queued one
+MERGED_COMMANDS = {"set_config"}
+
+commands_queued = registry.counter(
+    "device_commands_queued_total", "Commands queued for devices", ("name",)
+)
+commands_coalesced = registry.counter(
+    "device_commands_coalesced_total", "Queued commands superseded before delivery"
+)
+commands_delivered = registry.counter(
+    "device_commands_delivered_total", "Command deliveries to devices", ("attempt",)
+)
+commands_acked = registry.counter(
+    "device_commands_acked_total", "Commands acknowledged by devices"
+)
+commands_expired = registry.counter(
+    "device_commands_expired_total", "Commands dropped when their ttl ran out"
+)
+
+
+def coalesce_key(name: str, params: Dict[str, Any], key: Optional[str] = None) -> Optional[str]:
+    if key is not None:
+        return key
+    if name in MERGED_COMMANDS:
+        return name
+    if name in PIN_COMMANDS and "pin" in params:
+        return f"pin:{params['pin']}"
+    return None
+
+
+def retry_delay(attempts: int) -> float:
+    """Seconds before a batch delivered `attempts` times is sent again"""
+    return min(
+        settings.DEVICE_COMMAND_RETRY_SECONDS * 2 ** (attempts - 1),
+        settings.DEVICE_COMMAND_MAX_RETRY_SECONDS,
+    )
+
+
+async def enqueue(
+    db: AsyncSession,
+    device_ids: List[int],
+    name: str,
+    params: Dict[str, Any],
+    key: Optional[str] = None,
+    ttl_seconds: Optional[int] = None,
+) -> Dict[int, Tuple[DeviceCommand, int]]:
+    """Queue a command for each device; device id -> (command, commands it superseded)
+
+    Devices whose queue already holds DEVICE_COMMAND_MAX_PENDING commands
+    are left out. The caller commits, then calls notify().
+    """
+    now = datetime.utcnow()
+    key = coalesce_key(name, params, key)
+    superseded: Dict[int, List[DeviceCommand]] = defaultdict(list)
+    if key is not None:
+        result = await db.execute(
+            select(DeviceCommand)
+            .where(DeviceCommand.device_id.in_(device_ids), DeviceCommand.key == key)
+            .order_by(DeviceCommand.seq)
+        )
+        for command in result.scalars().all():
+            superseded[command.device_id].append(command)
+
+    result = await db.execute(
+        select(DeviceCommand.device_id, func.count())
+        .where(DeviceCommand.device_id.in_(device_ids))
+        .group_by(DeviceCommand.device_id)
+    )
+    pending = dict(result.all())
+    accepted = [
+        device_id
+        for device_id in device_ids
+        if pending.get(device_id, 0) - len(superseded[device_id]) < settings.DEVICE_COMMAND_MAX_PENDING
+    ]
+    if not accepted:
+        return {}
+
+    result = await db.execute(
+        update(Device)
+        .where(Device.id.in_(accepted))
+        .values(command_seq=Device.command_seq + 1)
+        .returning(Device.id, Device.command_seq)
+        .execution_options(synchronize_session=False)
+    )
+    seqs = dict(result.all())
+    stale = [old.id for device_id in accepted for old in superseded[device_id]]
+    if stale:
+        await db.execute(delete(DeviceCommand).where(DeviceCommand.id.in_(stale)))
+        commands_coalesced.inc(amount=len(stale))
+
+    queued = {}
+    expires_at = now + timedelta(seconds=ttl_seconds) if ttl_seconds else None
+    for device_id in accepted:
+        merged: Dict[str, Any] = {}
+        if name in MERGED_COMMANDS:
+            for old in superseded[device_id]:
+                merged.update(old.params)
+        command = DeviceCommand(
+            device_id=device_id,
+            seq=seqs[device_id],
+            name=name,
+            params={**merged, **params},
+            key=key,
+            attempts=0,
+            expires_at=expires_at,
+            created_at=now,
+        )
+        db.add(command)
+        queued[device_id] = (command, len(superseded[device_id]))
+    await db.flush()
+    commands_queued.inc((name,), len(queued))
+    return queued
+
+
+async def acknowledge(db: AsyncSession, device_id: int, seq: int) -> int:
+    """Remove the commands a device has run, up to seq; returns how many"""
+    result = await db.execute(
+        delete(DeviceCommand).where(DeviceCommand.device_id == device_id, DeviceCommand.seq <= seq)
+    )
+    commands_acked.inc(amount=result.rowcount)
+    return result.rowcount
+
+
+async def take_batch(
+    db: AsyncSession, device_id: int, limit: int
+) -> Tuple[List[DeviceCommand], Optional[datetime]]:
+    """Commands to deliver now, or none and when the pending batch may be resent"""
+    now = datetime.utcnow()
+    result = await db.execute(
+        delete(DeviceCommand).where(
+            DeviceCommand.device_id == device_id, DeviceCommand.expires_at < now
+        )
+    )
+    if result.rowcount:
+        commands_expired.inc(amount=result.rowcount)
+
+    result = await db.execute(
+        select(DeviceCommand)
+        .where(DeviceCommand.device_id == device_id)
+        .order_by(DeviceCommand.seq)
+        .limit(limit)
+    )
+    batch = list(result.scalars().all())
+    if not batch:
+        return [], None
+    if batch[0].next_attempt_at is not None and batch[0].next_attempt_at > now:
+        return [], batch[0].next_attempt_at
+    for command in batch:
+        command.attempts += 1
+        command.next_attempt_at = now + timedelta(seconds=retry_delay(command.attempts))
+        commands_delivered.inc(("first" if command.attempts == 1 else "retry",))
+    return batch, None
+
+
+_signals: "weakref.WeakValueDictionary[int, asyncio.Event]" = weakref.WeakValueDictionary()
+
+
+def command_signal(device_id: int) -> asyncio.Event:
+    """Set when commands are queued for a device; take it before reading the queue"""
+    event = _signals.get(device_id)
+    if event is None:
+        event = _signals[device_id] = asyncio.Event()
+    return event
+
+
+def notify(device_ids: Iterable[int]) -> None:
+    """Wake long-polls of these devices in this process"""
+    for device_id in device_ids:
+        event = _signals.pop(device_id, None)
+        if event is not None:
+            event.set()
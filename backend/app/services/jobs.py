@@ -0,0 +1,160 @@
+"""In-process background jobs for long-running model work
+
+Quantization, benchmarking, training and similar requests return a job
+right away and run here on the event loop, with the heavy lifting pushed
+to thread or process pools by the job itself. At most
+JOBS_MAX_CONCURRENT jobs run at once; the rest wait in order.
+
+Jobs live in the memory of the worker that accepted them, so with several
+workers clients should poll through sticky sessions, and jobs still
+running at shutdown are cancelled. Finished jobs are kept for status
+polling until JOBS_HISTORY newer ones have finished.
+"""
+
+import asyncio
+import logging
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.metrics import registry
+
+
+logger = logging.getLogger(__name__)
+
+jobs_finished = registry.counter(
+    "jobs_finished_total", "Background jobs finished", ("kind", "status")
+)
+job_duration = registry.histogram(
+    "job_duration_seconds",
+    "Run time of background jobs",
+    ("kind",),
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 900),
+)
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    owner_id: int
+    # Model, device, ... the job works on
+    target_id: Optional[int] = None
+    status: str = "queued"  # queued, running, succeeded, failed, cancelled
+    progress: float = 0.0
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("succeeded", "failed", "cancelled")
+
+
+# Returns the job result; raising JobError fails the job with its message
+JobFunc = Callable[[Job], Awaitable[Optional[Dict[str, Any]]]]
+
+
+class JobError(Exception):
+    """An expected failure, reported to the client as the job's error"""
+
+
+class JobRegistry:
+    def __init__(self, max_concurrent: int, history: int):
+        self.max_concurrent = max_concurrent
+        self.history = history
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._slots = asyncio.Semaphore(self.max_concurrent)
+            self._loop = loop
+        return self._slots
+
+    def submit(
+        self, kind: str, owner_id: int, func: JobFunc, target_id: Optional[int] = None
+    ) -> Job:
+        job = Job(id=uuid.uuid4().hex, kind=kind, owner_id=owner_id, target_id=target_id)
+        self._jobs[job.id] = job
+        task = asyncio.ensure_future(self._run(job, func))
+        self._tasks[job.id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.id, None))
+        return job
+
+    async def _run(self, job: Job, func: JobFunc) -> None:
+        try:
+            async with self._semaphore():
+                job.status = "running"
+                job.started_at = datetime.utcnow()
+                job.result = await func(job)
+                job.status = "succeeded"
+                job.progress = 1.0
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+        except JobError as e:
+            job.status, job.error = "failed", str(e)
+        except Exception as e:
+            logger.exception("%s job %s failed", job.kind, job.id)
+            job.status, job.error = "failed", f"Internal error: {e.__class__.__name__}"
+        finally:
+            job.finished_at = datetime.utcnow()
+            jobs_finished.inc((job.kind, job.status))
+            if job.started_at is not None:
+                job_duration.observe(
+                    (job.finished_at - job.started_at).total_seconds(), (job.kind,)
+                )
+            self._prune()
+
+    def _prune(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[: max(len(finished) - self.history, 0)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def list(self, owner_id: int, kind: Optional[str] = None) -> List[Job]:
+        """A user's jobs, newest first"""
+        return [
+            job
+            for job in reversed(self._jobs.values())
+            if job.owner_id == owner_id and (kind is None or job.kind == kind)
+        ]
+
+    def active(self, kind: str, target_id: int) -> Optional[Job]:
+        """A queued or running job of this kind on the target, if any"""
+        for job in self._jobs.values():
+            if job.kind == kind and job.target_id == target_id and not job.done:
+                return job
+        return None
+
+    def cancel(self, job_id: str) -> bool:
+        task = self._tasks.get(job_id)
+        if task is None:
+            return False
+        task.cancel()
+        return True
+
+    async def close(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+jobs = JobRegistry(settings.JOBS_MAX_CONCURRENT, settings.JOBS_HISTORY)
+
+registry.callback_gauge(
+    "jobs_running",
+    "Background jobs queued or running",
+    lambda: sum(1 for job in jobs._jobs.values() if not job.done),
+)
@@ -0,0 +1 @@
+"""Model inference, optimization and training on NumPy"""
@@ -0,0 +1,245 @@
+"""Dynamic micro-batching of concurrent inference requests per model
+
+Each loaded model gets a MicroBatcher. Requests put their samples on the
+model's queue and await a future; a collector task groups queued samples
+into one batch and runs a single vectorized forward pass in the inference
+thread pool, then scatters the output rows back to the waiting requests.
+
+Batches form while the model's worker slots are busy, so a lone request
+on an idle model is dispatched immediately. Once a burst is under way
+(more than one request queued) the collector lingers up to
+MODEL_BATCH_MAX_DELAY_MS for stragglers, capped at MODEL_BATCH_MAX_SIZE
+samples per pass.
+"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.services.ml.cache import model_cache
+from app.services.ml.engine import Model, np
+
+
+batch_size_histogram = registry.histogram(
+    "inference_batch_size",
+    "Samples per batched forward pass",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+queue_time_histogram = registry.histogram(
+    "inference_queue_seconds",
+    "Time inference requests waited before their batch was dispatched",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0),
+)
+forward_time_histogram = registry.histogram(
+    "inference_forward_seconds",
+    "Duration of batched forward passes",
+)
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def inference_executor() -> ThreadPoolExecutor:
+    """Thread pool for forward passes; NumPy releases the GIL inside BLAS"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.INFERENCE_THREADS or os.cpu_count() or 1,
+            thread_name_prefix="inference",
+        )
+    return _executor
+
+
+@dataclass
+class _Request:
+    inputs: Any  # (n, *input_shape) float32
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+    @property
+    def size(self) -> int:
+        return self.inputs.shape[0]
+
+
+class MicroBatcher:
+    def __init__(self, model: Model, max_batch: int, max_delay: float, slots: int):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue: "asyncio.Queue[_Request]" = asyncio.Queue()
+        self._slots = asyncio.Semaphore(slots)
+        self._carry: Optional[_Request] = None
+        self._running: set = set()
+        self._retired = False
+        self._collector = asyncio.ensure_future(self._collect())
+
+    async def predict(self, inputs) -> Any:
+        """Forward pass for a batch of samples, shared with concurrent callers"""
+        inputs = np.asarray(inputs, dtype=np.float32)
+        if inputs.ndim < 2 or list(inputs.shape[1:]) != self.model.input_shape:
+            # Reject here so one malformed request cannot fail a whole batch
+            raise ValueError(
+                f"Expected inputs shaped (n, {', '.join(map(str, self.model.input_shape))}), "
+                f"got {inputs.shape}"
+            )
+        if inputs.shape[0] > self.max_batch or self._collector.done():
+            # Oversized requests are already a full batch of their own, and
+            # nothing collects for a batcher that retired meanwhile
+            return await self._run_alone(inputs)
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(_Request(inputs, future))
+        return await future
+
+    async def _run_alone(self, inputs):
+        async with self._slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(inference_executor(), self.model.predict, inputs)
+
+    async def _next(self) -> Optional[_Request]:
+        if self._carry is not None:
+            request, self._carry = self._carry, None
+            return request
+        return await self._queue.get()
+
+    def _take(self, batch: List[_Request], size: int) -> int:
+        """Move queued requests into the batch without waiting"""
+        while size < self.max_batch and not self._queue.empty():
+            request = self._queue.get_nowait()
+            if request is None:
+                # Wake-up from retire(); _collect checks _retired itself
+                continue
+            if size + request.size > self.max_batch:
+                self._carry = request
+                break
+            batch.append(request)
+            size += request.size
+        return size
+
+    async def _collect(self) -> None:
+        while True:
+            if self._retired and self._carry is None and self._queue.empty():
+                # Every request queued before retire() has been dispatched
+                return
+            first = await self._next()
+            if first is None:
+                continue
+            # Requests keep queueing while every slot is busy
+            await self._slots.acquire()
+            batch = [first]
+            size = self._take(batch, first.size)
+
+            if len(batch) > 1 and self._carry is None and self.max_delay > 0:
+                # A burst is under way: give stragglers until the deadline
+                remaining = first.enqueued_at + self.max_delay - time.perf_counter()
+                if size < self.max_batch and remaining > 0:
+                    await asyncio.sleep(remaining)
+                    size = self._take(batch, size)
+
+            task = asyncio.ensure_future(self._dispatch(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _dispatch(self, batch: List[_Request]) -> None:
+        try:
+            batch = [request for request in batch if not request.future.cancelled()]
+            if not batch:
+                return
+            size = sum(request.size for request in batch)
+            now = time.perf_counter()
+            for request in batch:
+                queue_time_histogram.observe(now - request.enqueued_at)
+            batch_size_histogram.observe(size)
+
+            inputs = (
+                batch[0].inputs
+                if len(batch) == 1
+                else np.concatenate([request.inputs for request in batch])
+            )
+            loop = asyncio.get_running_loop()
+            try:
+                outputs = await loop.run_in_executor(
+                    inference_executor(), self.model.predict, inputs
+                )
+            except Exception as exc:
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(exc)
+                return
+            forward_time_histogram.observe(time.perf_counter() - now)
+
+            offset = 0
+            for request in batch:
+                rows = outputs[offset:offset + request.size]
+                offset += request.size
+                if not request.future.done():
+                    request.future.set_result(rows)
+        finally:
+            self._slots.release()
+
+    def retire(self) -> None:
+        """Stop taking new requests; the collector exits once queued ones are served"""
+        self._retired = True
+        # Wakes a collector waiting on an empty queue
+        self._queue.put_nowait(None)
+
+    def close(self) -> None:
+        self._collector.cancel()
+        for task in list(self._running):
+            task.cancel()
+        pending = [self._carry] if self._carry is not None else []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for request in pending:
+            if request is not None and not request.future.done():
+                request.future.cancel()
+
+
+class BatcherRegistry:
+    """One MicroBatcher per loaded model, on the running event loop"""
+
+    def __init__(self):
+        self._batchers: Dict[str, MicroBatcher] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def get(self, model: Model) -> MicroBatcher:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Batchers from a previous event loop cannot be awaited here
+            self._batchers.clear()
+            self._loop = loop
+        batcher = self._batchers.get(model.path)
+        if batcher is None or batcher.model is not model:
+            # The model was reloaded (new weights or evicted and loaded again)
+            if batcher is not None:
+                batcher.retire()
+            batcher = MicroBatcher(
+                model,
+                max_batch=settings.MODEL_BATCH_MAX_SIZE,
+                max_delay=settings.MODEL_BATCH_MAX_DELAY_MS / 1000,
+                slots=settings.MODEL_BATCH_CONCURRENCY,
+            )
+            self._batchers[model.path] = batcher
+        return batcher
+
+    async def predict(self, model: Model, inputs) -> Any:
+        return await self.get(model).predict(inputs)
+
+    def discard(self, model: Model) -> None:
+        """Release the batcher of a model the cache let go of"""
+        batcher = self._batchers.get(model.path)
+        if batcher is not None and batcher.model is model:
+            del self._batchers[model.path]
+            batcher.retire()
+
+    def close(self) -> None:
+        for batcher in self._batchers.values():
+            batcher.close()
+        self._batchers.clear()
+
+
+batchers = BatcherRegistry()
+model_cache.on_evict.append(batchers.discard)
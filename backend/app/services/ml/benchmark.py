@@ -0,0 +1,108 @@
+"""Latency and throughput benchmarks of stored models
+
+For each batch size and thread count, `threads` workers each run
+`warmup` untimed then `iterations` timed forward passes on a generated
+batch at the same time, the way the inference pool serves concurrent
+requests. Latencies are per forward pass; throughput is samples per
+second over the whole timed phase.
+
+Peak memory is the model's mapped weights plus, per worker, the working
+memory one forward pass allocates (measured with tracemalloc, which
+NumPy reports its buffers to). BLAS may use threads of its own inside a
+pass; those are not controlled here.
+"""
+
+import os
+import platform
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from app.services.ml.engine import Model, np, sample_input
+
+
+def host_description() -> str:
+    return f"{platform.machine() or 'unknown'}, {os.cpu_count() or 1} CPUs"
+
+
+def forward_memory(model: Model, batch) -> int:
+    """Bytes allocated at peak by one forward pass"""
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        model.predict(batch)
+        return max(tracemalloc.get_traced_memory()[1] - before, 0)
+    finally:
+        if started:
+            tracemalloc.stop()
+
+
+def _timed_passes(model: Model, batch, warmup: int, iterations: int, start: threading.Barrier):
+    try:
+        for _ in range(warmup):
+            model.predict(batch)
+    except BaseException:
+        # Release the other workers; the error surfaces through the future
+        start.abort()
+        raise
+    start.wait()
+    latencies = []
+    for _ in range(iterations):
+        began = time.perf_counter()
+        model.predict(batch)
+        latencies.append(time.perf_counter() - began)
+    return latencies
+
+
+def measure(model: Model, batch_size: int, threads: int, iterations: int, warmup: int) -> Dict[str, Any]:
+    """One configuration: p50/p99/mean latency, throughput and peak memory"""
+    batch = sample_input(model, batch_size)
+    # Workers start timing together, so throughput covers only the timed phase
+    barrier = threading.Barrier(threads + 1)
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="benchmark") as pool:
+        futures = [
+            pool.submit(_timed_passes, model, batch, warmup, iterations, barrier)
+            for _ in range(threads)
+        ]
+        try:
+            barrier.wait()
+        except threading.BrokenBarrierError:
+            pass
+        began = time.perf_counter()
+        latencies = np.concatenate([future.result() for future in futures])
+        elapsed = time.perf_counter() - began
+
+    latencies_ms = latencies * 1000
+    return {
+        "batch_size": batch_size,
+        "threads": threads,
+        "iterations": iterations,
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 4),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 4),
+        "mean_ms": round(float(latencies_ms.mean()), 4),
+        "throughput": round(threads * iterations * batch_size / elapsed, 2),
+        "peak_memory_bytes": model.nbytes + threads * forward_memory(model, batch),
+    }
+
+
+def run_benchmark(
+    model: Model,
+    batch_sizes: Sequence[int],
+    thread_counts: Sequence[int],
+    iterations: int,
+    warmup: int,
+    progress: Optional[Callable[[float], None]] = None,
+) -> List[Dict[str, Any]]:
+    """Measure every batch size and thread count combination"""
+    configs = [(b, t) for b in batch_sizes for t in thread_counts]
+    results = []
+    for done, (batch_size, threads) in enumerate(configs, 1):
+        results.append(measure(model, batch_size, threads, iterations, warmup))
+        if progress is not None:
+            progress(done / len(configs))
+    return results
@@ -0,0 +1,662 @@
+"""Export of stored models as C headers for microcontrollers
+
+A model becomes one self-contained header: weights as const arrays that
+stay in flash (PROGMEM on AVR, .rodata elsewhere), plus integer-only
+inference code, so a sketch classifies on the device without a network
+round trip and without floating point inside the layers.
+
+The fixed-point scheme is symmetric int8 throughout:
+
+    weights      int8 per output channel (scale w[c]), as quantize.py makes
+    activations  int8 per tensor, scale a = max(|x|) / 127 over a
+                 calibration batch run through the float model
+    bias         int32 at scale a_in * w[c]
+
+A dense or conv2d layer accumulates int8 products in int32 and rescales
+to its output scale with one multiply and shift per output channel,
+
+    y = (acc * multiplier + 2^(shift-1)) >> shift
+    multiplier * 2^-shift = a_in * w[c] / a_out
+
+then clamps to int8 (and to zero for relu). Pooling keeps the scale of
+its input. A trailing softmax is dropped: it does not change which class
+wins, and outputs are logits. Only the float input is quantized and the
+outputs dequantized, at the edges.
+
+run_program() is the same integer arithmetic in NumPy, bit for bit, used
+to report how often the exported model agrees with the float one.
+"""
+
+import math
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.ml.engine import (
+    MANIFEST_NAME, Activation, Conv2D, Dense, Flatten, GlobalAveragePool, Model, Pool2D, np,
+    sample_input,
+)
+from app.services.ml.quantize import quantize_weights
+from app.services.ml.storage import format_size
+
+
+# Flash taken by the inference routines themselves, roughly
+RUNTIME_FLASH_BYTES = 2 * 1024
+# Largest int32 accumulator an int8 dot product may reach
+MAX_ACCUMULATOR = 2**31 - 1
+# Exports calibrated on generated samples, kept per model and symbol
+MAX_CACHED_EXPORTS = 16
+
+
+class ExportError(ValueError):
+    """A model the fixed-point runtime cannot run"""
+
+
+class ExportTooLarge(ExportError):
+    """A model that does not fit the target device"""
+
+
+@dataclass
+class QuantOp:
+    kind: str  # dense, conv2d, maxpool, avgpool, global_avgpool, relu
+    in_shape: List[int]
+    out_shape: List[int]
+    weights: Any = None  # int8, output channel first
+    bias: Any = None  # int32
+    multiplier: Any = None  # int32 per output channel
+    shift: Any = None  # uint8 per output channel
+    relu: bool = False
+    stride: int = 1
+    padding: Tuple[int, int] = (0, 0)  # top, left
+    size: int = 2
+
+    @property
+    def flash_bytes(self) -> int:
+        tensors = (self.weights, self.bias, self.multiplier, self.shift)
+        return sum(t.nbytes for t in tensors if t is not None)
+
+
+@dataclass
+class Program:
+    """A model lowered to int8 operations"""
+
+    input_shape: List[int]
+    input_inv_scale: Any  # float32, multiplies the float input
+    output_scale: float
+    task: str
+    labels: List[str] = field(default_factory=list)
+    ops: List[QuantOp] = field(default_factory=list)
+
+    @property
+    def input_size(self) -> int:
+        return int(np.prod(self.input_shape))
+
+    @property
+    def output_size(self) -> int:
+        shape = self.ops[-1].out_shape if self.ops else self.input_shape
+        return int(np.prod(shape))
+
+    @property
+    def arena_size(self) -> int:
+        """Elements of each of the two activation buffers layers alternate between"""
+        return max([self.input_size] + [int(np.prod(op.out_shape)) for op in self.ops])
+
+    @property
+    def flash_bytes(self) -> int:
+        labels = sum(len(label.encode()) + 1 for label in self.labels)
+        return RUNTIME_FLASH_BYTES + sum(op.flash_bytes for op in self.ops) + labels
+
+    @property
+    def ram_bytes(self) -> int:
+        # Label strings are copied to RAM on AVR
+        labels = sum(len(label.encode()) + 3 for label in self.labels)
+        return 2 * self.arena_size + labels
+
+
+# Lowering
+
+
+def _fixed_point(multipliers) -> Tuple[Any, Any]:
+    """(int32 multiplier, uint8 shift) with multiplier * 2^-shift ~= each value"""
+    mult = np.zeros(len(multipliers), dtype=np.int32)
+    shift = np.ones(len(multipliers), dtype=np.uint8)
+    for i, value in enumerate(multipliers):
+        if value <= 0:
+            continue
+        mantissa, exponent = math.frexp(float(value))
+        q = round(mantissa * (1 << 31))
+        if q == 1 << 31:
+            q, exponent = q // 2, exponent + 1
+        s = 31 - exponent
+        if s > 62:
+            # Rescales everything to zero
+            continue
+        if s < 1:
+            raise ExportError("Layer output range is too narrow for fixed point")
+        mult[i], shift[i] = q, s
+    return mult, shift
+
+
+def _activation_scale(x) -> float:
+    peak = float(np.abs(x).max()) if x.size else 0.0
+    return peak / 127.0 if peak > 0 else 1.0
+
+
+def _weighted_op(layer, in_shape, out_shape, in_scale, out_scale, relu) -> QuantOp:
+    if layer.scale is not None:
+        weights, w_scale = np.asarray(layer.weights), np.asarray(layer.scale, dtype=np.float32)
+    else:
+        weights, w_scale = quantize_weights(layer.weights)
+    cout = weights.shape[-1]
+    fan_in = int(np.prod(weights.shape[:-1]))
+    # Output channel first, so each output reads its weights sequentially
+    weights = np.ascontiguousarray(np.moveaxis(weights, -1, 0)).astype(np.int8)
+    accumulator_scale = in_scale * w_scale.astype(np.float64)
+
+    bias = np.zeros(cout, dtype=np.int64)
+    if layer.bias is not None:
+        bias = np.rint(np.asarray(layer.bias, dtype=np.float64) / accumulator_scale).astype(np.int64)
+    if fan_in * 127 * 127 + int(np.abs(bias).max()) > MAX_ACCUMULATOR:
+        raise ExportError(f"A layer with {fan_in} inputs per output overflows int32 accumulators")
+    mult, shift = _fixed_point(accumulator_scale / out_scale)
+
+    op = QuantOp(
+        kind="dense" if isinstance(layer, Dense) else "conv2d",
+        in_shape=list(in_shape),
+        out_shape=list(out_shape),
+        weights=weights,
+        bias=bias.astype(np.int32),
+        multiplier=mult,
+        shift=shift,
+        relu=relu,
+    )
+    if isinstance(layer, Conv2D):
+        kh, kw = layer.weights.shape[:2]
+        pad_h, pad_w = _same_padding(in_shape, kh, kw, layer.stride, layer.padding)
+        op.stride, op.padding = layer.stride, (pad_h, pad_w)
+    return op
+
+
+def _same_padding(in_shape, kh, kw, stride, padding) -> Tuple[int, int]:
+    if padding != "same":
+        return 0, 0
+    h, w = in_shape[:2]
+
+    def before(size, kernel):
+        out = -(-size // stride)
+        return max((out - 1) * stride + kernel - size, 0) // 2
+
+    return before(h, kh), before(w, kw)
+
+
+def lower_model(model: Model, calibration) -> Program:
+    """Lower a float or int8 model to fixed-point operations"""
+    x = np.array(calibration, dtype=np.float32)
+    if x.ndim < 2 or list(x.shape[1:]) != model.input_shape:
+        raise ValueError(
+            f"Expected calibration inputs shaped (n, {', '.join(map(str, model.input_shape))}), "
+            f"got {x.shape}"
+        )
+    scale = _activation_scale(x)
+    program = Program(
+        input_shape=model.input_shape,
+        input_inv_scale=np.float32(1.0 / scale),
+        output_scale=scale,
+        task=model.task,
+        labels=model.labels,
+    )
+    shape = model.input_shape
+    last = len(model.layers) - 1
+    for index, layer in enumerate(model.layers):
+        activation = getattr(layer, "activation", None)
+        if activation == "softmax" and index != last:
+            raise ExportError("Softmax is only supported as the last layer")
+        if activation not in (None, "linear", "relu", "softmax"):
+            raise ExportError(f"The {activation} activation has no fixed-point version")
+        out_shape = layer.output_shape(shape)
+
+        if isinstance(layer, (Dense, Conv2D)):
+            if isinstance(layer, Dense) and len(shape) != 1:
+                raise ExportError("Dense layers need flat inputs; add a flatten layer")
+            relu = activation == "relu"
+            # Calibrate on logits, since the softmax is dropped
+            y = layer.forward(x) if activation != "softmax" else _logits(layer, x)
+            out_scale = _activation_scale(y)
+            program.ops.append(_weighted_op(layer, shape, out_shape, scale, out_scale, relu))
+            x, scale = y, out_scale
+        elif isinstance(layer, Pool2D):
+            kind = "maxpool" if layer.mode == "max" else "avgpool"
+            program.ops.append(QuantOp(kind, list(shape), out_shape, size=layer.size))
+            x = layer.forward(x)
+        elif isinstance(layer, GlobalAveragePool):
+            program.ops.append(QuantOp("global_avgpool", list(shape), out_shape))
+            x = layer.forward(x)
+        elif isinstance(layer, Activation):
+            if activation == "relu":
+                previous = program.ops[-1] if program.ops else None
+                if previous is not None and previous.kind in ("dense", "conv2d"):
+                    previous.relu = True
+                else:
+                    program.ops.append(QuantOp("relu", list(shape), out_shape))
+                x = layer.forward(x)
+        elif isinstance(layer, Flatten):
+            # Channels-last activations are already laid out flat
+            x = layer.forward(x)
+        else:
+            raise ExportError(f"{type(layer).__name__} layers cannot be exported")
+        shape = out_shape
+    program.output_scale = scale
+    # Class indices stand in for missing labels
+    if program.task == "classification" and not program.labels:
+        program.labels = [str(i) for i in range(program.output_size)]
+    return program
+
+
+def _logits(layer, x):
+    return replace(layer, activation=None).forward(x)
+
+
+# Reference implementation
+
+
+def _requantize(acc, op: QuantOp):
+    prod = acc.astype(np.int64) * op.multiplier.astype(np.int64)
+    shift = op.shift.astype(np.int64)
+    y = (prod + (np.int64(1) << (shift - 1))) >> shift
+    return np.clip(y, 0 if op.relu else -127, 127).astype(np.int8)
+
+
+def _round_div(total, count: int):
+    half = count // 2
+    return np.where(total >= 0, (total + half) // count, -((-total + half) // count))
+
+
+def quantize_input(program: Program, x):
+    """Float inputs to int8 the way the C code does: round half away from zero"""
+    v = np.asarray(x, dtype=np.float32) * program.input_inv_scale
+    v = np.clip(v, np.float32(-127), np.float32(127))
+    return np.trunc(v + np.copysign(np.float32(0.5), v)).astype(np.int8)
+
+
+def run_program(program: Program, inputs):
+    """Dequantized outputs of the fixed-point operations on a float batch"""
+    x = quantize_input(program, inputs)
+    n = len(x)
+    for op in program.ops:
+        if op.kind == "dense":
+            x = x.reshape(n, -1)
+            acc = x.astype(np.int64) @ op.weights.astype(np.int64).T + op.bias
+            x = _requantize(acc, op)
+        elif op.kind == "conv2d":
+            cout, kh, kw, cin = op.weights.shape
+            oh, ow = op.out_shape[:2]
+            top, left = op.padding
+            h, w = op.in_shape[:2]
+            bottom = max((oh - 1) * op.stride + kh - h - top, 0)
+            right = max((ow - 1) * op.stride + kw - w - left, 0)
+            padded = np.pad(x.reshape(n, h, w, cin), ((0, 0), (top, bottom), (left, right), (0, 0)))
+            windows = np.lib.stride_tricks.sliding_window_view(padded, (kh, kw), axis=(1, 2))
+            windows = windows[:, :: op.stride, :: op.stride][:, :oh, :ow]
+            columns = windows.transpose(0, 1, 2, 4, 5, 3).reshape(n * oh * ow, kh * kw * cin)
+            acc = columns.astype(np.int64) @ op.weights.reshape(cout, -1).astype(np.int64).T
+            x = _requantize(acc + op.bias, op).reshape(n, oh, ow, cout)
+        elif op.kind in ("maxpool", "avgpool"):
+            h, w, c = op.in_shape
+            s = op.size
+            blocks = x.reshape(n, h, w, c)[:, : h - h % s, : w - w % s]
+            blocks = blocks.reshape(n, h // s, s, w // s, s, c).astype(np.int64)
+            if op.kind == "maxpool":
+                x = blocks.max(axis=(2, 4)).astype(np.int8)
+            else:
+                x = _round_div(blocks.sum(axis=(2, 4)), s * s).astype(np.int8)
+        elif op.kind == "global_avgpool":
+            h, w, c = op.in_shape
+            total = x.reshape(n, h * w, c).astype(np.int64).sum(axis=1)
+            x = _round_div(total, h * w).astype(np.int8)
+        elif op.kind == "relu":
+            x = np.maximum(x, 0)
+    return x.reshape(n, -1).astype(np.float32) * np.float32(program.output_scale)
+
+
+def agreement(model: Model, program: Program, inputs) -> Dict[str, Any]:
+    """How closely the fixed-point program follows the float model"""
+    reference = model.predict(inputs).reshape(len(inputs), -1)
+    outputs = run_program(program, inputs)
+    report: Dict[str, Any] = {"samples": len(inputs)}
+    if model.task == "classification":
+        same = reference.argmax(axis=-1) == outputs.argmax(axis=-1)
+        report["top1_agreement"] = float(same.mean() * 100)
+    else:
+        report["max_abs_error"] = float(np.abs(reference - outputs).max())
+    return report
+
+
+# Size budgets
+
+
+def device_budget(target_device: Optional[str]) -> Dict[str, int]:
+    """Flash and RAM a model may take on a device type"""
+    budget = settings.MODEL_EXPORT_BUDGETS.get(target_device or "")
+    return budget if budget is not None else {"flash": settings.MODEL_EXPORT_MAX_BYTES}
+
+
+def check_budget(program: Program, budget: Dict[str, int], target: Optional[str] = None) -> None:
+    over = []
+    for resource, needed in (("flash", program.flash_bytes), ("RAM", program.ram_bytes)):
+        available = budget.get(resource.lower())
+        if available is not None and needed > available:
+            over.append(f"{format_size(needed)} of {resource} ({format_size(available)} available)")
+    if over:
+        raise ExportTooLarge(f"Model needs {' and '.join(over)} on {target or 'the device'}")
+
+
+# C rendering
+
+
+def c_symbol(name: str, model_id: int) -> str:
+    """C identifier prefix for a model's header"""
+    stem = re.sub(r"[^0-9a-zA-Z]+", "_", name).strip("_").lower()[:32]
+    return f"{stem or 'model'}_{model_id}" if stem[:1].isalpha() else f"model_{model_id}"
+
+
+def _c_string(text: str) -> str:
+    escaped = []
+    for byte in text.encode():
+        char = chr(byte)
+        if char in '"\\':
+            escaped.append("\\" + char)
+        elif 32 <= byte < 127:
+            escaped.append(char)
+        else:
+            escaped.append(f"\\{byte:03o}")
+    return '"' + "".join(escaped) + '"'
+
+
+def _c_float(value) -> str:
+    return f"{float(np.float32(value)):.9g}f"
+
+
+def _c_array(ctype: str, name: str, values) -> str:
+    items = [str(v) for v in np.asarray(values).reshape(-1).tolist()]
+    rows = [", ".join(items[i:i + 24]) for i in range(0, len(items), 24)]
+    body = ",\n    ".join(rows)
+    return f"static const {ctype} {name}[{len(items)}] IOTAI_FLASH = {{\n    {body}\n}};\n"
+
+
+RUNTIME = r"""
+#ifndef IOTAI_RUNTIME_H
+#define IOTAI_RUNTIME_H
+
+#if defined(__AVR__)
+#include <avr/pgmspace.h>
+#define IOTAI_FLASH PROGMEM
+#define IOTAI_I8(p) ((int8_t)pgm_read_byte(p))
+#define IOTAI_U8(p) ((uint8_t)pgm_read_byte(p))
+#define IOTAI_I32(p) ((int32_t)pgm_read_dword(p))
+#else
+#define IOTAI_FLASH
+#define IOTAI_I8(p) (*(p))
+#define IOTAI_U8(p) (*(p))
+#define IOTAI_I32(p) (*(p))
+#endif
+
+static inline int8_t iotai_requantize(int32_t acc, int32_t multiplier, uint8_t shift, uint8_t relu) {
+    int64_t prod = (int64_t)acc * multiplier;
+    int64_t v = (prod + ((int64_t)1 << (shift - 1))) >> shift;
+    if (v > 127) v = 127;
+    if (v < (relu ? 0 : -127)) v = relu ? 0 : -127;
+    return (int8_t)v;
+}
+
+static inline int32_t iotai_round_div(int32_t total, int32_t count) {
+    return total >= 0 ? (total + count / 2) / count : -((-total + count / 2) / count);
+}
+
+static inline void iotai_dense(const int8_t *in, int8_t *out, int32_t n_in, int32_t n_out,
+                               const int8_t *w, const int32_t *bias, const int32_t *mult,
+                               const uint8_t *shift, uint8_t relu) {
+    for (int32_t o = 0; o < n_out; o++) {
+        const int8_t *row = w + o * n_in;
+        int32_t acc = IOTAI_I32(&bias[o]);
+        for (int32_t i = 0; i < n_in; i++) acc += (int32_t)in[i] * IOTAI_I8(&row[i]);
+        out[o] = iotai_requantize(acc, IOTAI_I32(&mult[o]), IOTAI_U8(&shift[o]), relu);
+    }
+}
+
+static inline void iotai_conv2d(const int8_t *in, int8_t *out, int32_t h, int32_t w, int32_t cin,
+                                int32_t oh, int32_t ow, int32_t cout, int32_t kh, int32_t kw,
+                                int32_t stride, int32_t pad_top, int32_t pad_left,
+                                const int8_t *wt, const int32_t *bias, const int32_t *mult,
+                                const uint8_t *shift, uint8_t relu) {
+    for (int32_t oy = 0; oy < oh; oy++) {
+        for (int32_t ox = 0; ox < ow; ox++) {
+            for (int32_t co = 0; co < cout; co++) {
+                int32_t acc = IOTAI_I32(&bias[co]);
+                for (int32_t ky = 0; ky < kh; ky++) {
+                    int32_t iy = oy * stride + ky - pad_top;
+                    if (iy < 0 || iy >= h) continue;
+                    for (int32_t kx = 0; kx < kw; kx++) {
+                        int32_t ix = ox * stride + kx - pad_left;
+                        if (ix < 0 || ix >= w) continue;
+                        const int8_t *px = in + (iy * w + ix) * cin;
+                        const int8_t *k = wt + ((co * kh + ky) * kw + kx) * cin;
+                        for (int32_t ci = 0; ci < cin; ci++) acc += (int32_t)px[ci] * IOTAI_I8(&k[ci]);
+                    }
+                }
+                out[(oy * ow + ox) * cout + co] =
+                    iotai_requantize(acc, IOTAI_I32(&mult[co]), IOTAI_U8(&shift[co]), relu);
+            }
+        }
+    }
+}
+
+static inline void iotai_pool2d(const int8_t *in, int8_t *out, int32_t h, int32_t w, int32_t c,
+                                int32_t size, uint8_t average) {
+    int32_t oh = h / size, ow = w / size;
+    for (int32_t oy = 0; oy < oh; oy++) {
+        for (int32_t ox = 0; ox < ow; ox++) {
+            for (int32_t ch = 0; ch < c; ch++) {
+                int32_t best = -128, total = 0;
+                for (int32_t ky = 0; ky < size; ky++) {
+                    for (int32_t kx = 0; kx < size; kx++) {
+                        int32_t v = in[((oy * size + ky) * w + ox * size + kx) * c + ch];
+                        total += v;
+                        if (v > best) best = v;
+                    }
+                }
+                out[(oy * ow + ox) * c + ch] =
+                    (int8_t)(average ? iotai_round_div(total, size * size) : best);
+            }
+        }
+    }
+}
+
+static inline void iotai_global_avgpool(const int8_t *in, int8_t *out, int32_t hw, int32_t c) {
+    for (int32_t ch = 0; ch < c; ch++) {
+        int32_t total = 0;
+        for (int32_t i = 0; i < hw; i++) total += in[i * c + ch];
+        out[ch] = (int8_t)iotai_round_div(total, hw);
+    }
+}
+
+static inline void iotai_relu(int8_t *x, int32_t n) {
+    for (int32_t i = 0; i < n; i++) if (x[i] < 0) x[i] = 0;
+}
+
+#endif /* IOTAI_RUNTIME_H */
+"""
+
+
+def _op_call(symbol: str, index: int, op: QuantOp, src: str, dst: str) -> str:
+    tensors = ", ".join(f"{symbol}_l{index}_{t}" for t in ("weights", "bias", "multiplier", "shift"))
+    if op.kind == "dense":
+        n_in, n_out = op.weights.shape[1], op.weights.shape[0]
+        return f"iotai_dense({src}, {dst}, {n_in}, {n_out}, {tensors}, {int(op.relu)});"
+    if op.kind == "conv2d":
+        h, w, cin = op.in_shape
+        oh, ow, cout = op.out_shape
+        kh, kw = op.weights.shape[1:3]
+        return (
+            f"iotai_conv2d({src}, {dst}, {h}, {w}, {cin}, {oh}, {ow}, {cout}, {kh}, {kw}, "
+            f"{op.stride}, {op.padding[0]}, {op.padding[1]}, {tensors}, {int(op.relu)});"
+        )
+    if op.kind in ("maxpool", "avgpool"):
+        h, w, c = op.in_shape
+        return f"iotai_pool2d({src}, {dst}, {h}, {w}, {c}, {op.size}, {int(op.kind == 'avgpool')});"
+    if op.kind == "global_avgpool":
+        h, w, c = op.in_shape
+        return f"iotai_global_avgpool({src}, {dst}, {h * w}, {c});"
+    return f"iotai_relu({src}, {int(np.prod(op.in_shape))});"
+
+
+def render_header(program: Program, symbol: str, title: str) -> str:
+    """The C header for a lowered model"""
+    guard = f"{symbol.upper()}_H"
+    upper = symbol.upper()
+    classifier = program.task == "classification"
+    usage = (
+        f" *   int best = {symbol}_classify();\n *   Serial.println({symbol}_label(best));\n"
+        if classifier
+        else f" *   {symbol}_invoke();\n *   float y = {symbol}_output(0);\n"
+    )
+    parts = [
+        f"/* {title}: int8 fixed-point inference, generated by IoT & AI Visual Platform\n"
+        f" *\n"
+        f" * Flash: {program.flash_bytes} bytes, RAM: {program.ram_bytes} bytes.\n"
+        f" * Weights are const and stay in flash (PROGMEM on AVR).\n"
+        f" *\n"
+        f" *   for (int32_t i = 0; i < {upper}_INPUT_SIZE; i++) {symbol}_set_input(i, value);\n"
+        f"{usage}"
+        f" */\n"
+        f"#ifndef {guard}\n#define {guard}\n\n#include <stdint.h>\n",
+        RUNTIME,
+        f"\n#define {upper}_INPUT_SIZE {program.input_size}\n"
+        f"#define {upper}_OUTPUT_SIZE {program.output_size}\n"
+        f"#define {upper}_ARENA_SIZE {program.arena_size}\n\n",
+    ]
+    for index, op in enumerate(program.ops):
+        if op.weights is None:
+            continue
+        parts.append(_c_array("int8_t", f"{symbol}_l{index}_weights", op.weights))
+        parts.append(_c_array("int32_t", f"{symbol}_l{index}_bias", op.bias))
+        parts.append(_c_array("int32_t", f"{symbol}_l{index}_multiplier", op.multiplier))
+        parts.append(_c_array("uint8_t", f"{symbol}_l{index}_shift", op.shift))
+        parts.append("\n")
+
+    # Layers alternate between the two buffers; relu works in place
+    calls, current = [], 0
+    for index, op in enumerate(program.ops):
+        src = f"{symbol}_arena[{current}]"
+        if op.kind == "relu":
+            calls.append("    " + _op_call(symbol, index, op, src, src))
+            continue
+        calls.append("    " + _op_call(symbol, index, op, src, f"{symbol}_arena[{1 - current}]"))
+        current = 1 - current
+    output = f"{symbol}_arena[{current}]"
+
+    parts.append(
+        f"static int8_t {symbol}_arena[2][{upper}_ARENA_SIZE];\n\n"
+        f"static inline void {symbol}_set_input(int32_t index, float value) {{\n"
+        f"    float v = value * {_c_float(program.input_inv_scale)};\n"
+        f"    if (v > 127.0f) v = 127.0f;\n"
+        f"    if (v < -127.0f) v = -127.0f;\n"
+        f"    {symbol}_arena[0][index] = (int8_t)(v >= 0.0f ? v + 0.5f : v - 0.5f);\n"
+        f"}}\n\n"
+        f"static inline void {symbol}_invoke(void) {{\n" + "\n".join(calls) + "\n}\n\n"
+        f"static inline float {symbol}_output(int32_t index) {{\n"
+        f"    return {output}[index] * {_c_float(program.output_scale)};\n"
+        f"}}\n"
+    )
+    if classifier:
+        labels = ", ".join(_c_string(label) for label in program.labels)
+        parts.append(
+            f"\nstatic inline int {symbol}_classify(void) {{\n"
+            f"    {symbol}_invoke();\n"
+            f"    int best = 0;\n"
+            f"    for (int32_t i = 1; i < {upper}_OUTPUT_SIZE; i++)\n"
+            f"        if ({output}[i] > {output}[best]) best = (int)i;\n"
+            f"    return best;\n"
+            f"}}\n"
+        )
+        parts.append(
+            f"\nstatic const char *const {symbol}_labels[{len(program.labels)}] = {{{labels}}};\n\n"
+            f"static inline const char *{symbol}_label(int index) {{\n"
+            f"    return index >= 0 && index < {len(program.labels)} ? {symbol}_labels[index] : \"\";\n"
+            f"}}\n"
+        )
+    parts.append(f"\n#endif /* {guard} */\n")
+    return "".join(parts)
+
+
+# Export
+
+
+@dataclass
+class CExport:
+    symbol: str
+    filename: str
+    header: str
+    flash_bytes: int
+    ram_bytes: int
+    report: Dict[str, Any]
+
+
+_exports: "OrderedDict[tuple, Tuple[Program, CExport]]" = OrderedDict()
+_exports_lock = threading.Lock()
+
+
+def _manifest_mtime(model: Model) -> int:
+    try:
+        return os.stat(os.path.join(model.path, MANIFEST_NAME)).st_mtime_ns
+    except OSError:
+        return 0
+
+
+def export_model(
+    model: Model,
+    symbol: str,
+    title: str,
+    target_device: Optional[str] = None,
+    inputs=None,
+    samples: int = 64,
+) -> CExport:
+    """Lower, size-check and render a model as a C header
+
+    Raises ExportTooLarge before rendering when the model does not fit the
+    device's budget. Exports calibrated on generated samples are cached.
+    """
+    budget = device_budget(target_device)
+    key = (model.path, _manifest_mtime(model), symbol, title, samples) if inputs is None else None
+    cached = None
+    if key is not None:
+        with _exports_lock:
+            cached = _exports.get(key)
+            if cached is not None:
+                _exports.move_to_end(key)
+    if cached is not None:
+        check_budget(cached[0], budget, target_device)
+        return cached[1]
+
+    if inputs is None:
+        inputs = sample_input(model, samples)
+    inputs = np.asarray(inputs, dtype=np.float32)
+    program = lower_model(model, inputs)
+    check_budget(program, budget, target_device)
+    result = CExport(
+        symbol=symbol,
+        filename=f"{symbol}.h",
+        header=render_header(program, symbol, title),
+        flash_bytes=program.flash_bytes,
+        ram_bytes=program.ram_bytes,
+        report=agreement(model, program, inputs),
+    )
+    if key is not None:
+        with _exports_lock:
+            _exports[key] = (program, result)
+            while len(_exports) > MAX_CACHED_EXPORTS:
+                _exports.popitem(last=False)
+    return result
@@ -0,0 +1,116 @@
+"""Process-wide cache of loaded models with an LRU byte budget"""
+
+import asyncio
+import os
+from collections import OrderedDict
+from typing import Callable, Dict, List, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.services.ml.engine import Model, load_model
+
+
+model_cache_loads = registry.counter(
+    "model_cache_loads_total", "Models loaded from disk into the model cache"
+)
+model_cache_evictions = registry.counter(
+    "model_cache_evictions_total", "Models evicted from the model cache"
+)
+
+# (path, manifest mtime) - rewriting a model directory yields a new key
+CacheKey = Tuple[str, int]
+
+
+class ModelCache:
+    """LRU of loaded models bounded by mapped weight bytes
+
+    Concurrent requests for a model that is not loaded yet wait on the same
+    load, so every request shares one copy. Evicted models stay usable by
+    requests already holding them; their maps close once those finish.
+    """
+
+    def __init__(self, max_bytes: int, max_models: int):
+        self.max_bytes = max_bytes
+        self.max_models = max_models
+        self._models: "OrderedDict[CacheKey, Model]" = OrderedDict()
+        self._loading: Dict[CacheKey, "asyncio.Task[Model]"] = {}
+        self.hits = 0
+        self.misses = 0
+        # Called with each model dropped from the cache
+        self.on_evict: List[Callable[[Model], None]] = []
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(model.nbytes for model in self._models.values())
+
+    def __len__(self) -> int:
+        return len(self._models)
+
+    @staticmethod
+    def _key(path: str) -> CacheKey:
+        return path, os.stat(os.path.join(path, "model.json")).st_mtime_ns
+
+    async def get(self, path: str) -> Model:
+        # One stat per call picks up rewritten model directories
+        key = self._key(path)
+        model = self._models.get(key)
+        if model is not None:
+            self.hits += 1
+            self._models.move_to_end(key)
+            return model
+
+        task = self._loading.get(key)
+        if task is None:
+            self.misses += 1
+            # A task of its own, so a cancelled first caller does not
+            # cancel the load for everyone else waiting on it
+            task = asyncio.ensure_future(self._load(key, path))
+            self._loading[key] = task
+        else:
+            self.hits += 1
+        return await asyncio.shield(task)
+
+    async def _load(self, key: CacheKey, path: str) -> Model:
+        try:
+            model = await run_in_threadpool(load_model, path)
+        finally:
+            del self._loading[key]
+        model_cache_loads.inc()
+        self._insert(key, model)
+        return model
+
+    def _drop(self, key: CacheKey) -> None:
+        model = self._models.pop(key)
+        for callback in self.on_evict:
+            callback(model)
+
+    def _insert(self, key: CacheKey, model: Model) -> None:
+        # Drop stale versions of the same directory first
+        for stale in [k for k in self._models if k[0] == key[0]]:
+            self._drop(stale)
+        self._models[key] = model
+        while len(self._models) > 1 and (
+            len(self._models) > self.max_models or self.total_bytes > self.max_bytes
+        ):
+            self._drop(next(iter(self._models)))
+            model_cache_evictions.inc()
+
+    def invalidate(self, path: str) -> None:
+        for key in [k for k in self._models if k[0] == path]:
+            self._drop(key)
+
+    def clear(self) -> None:
+        for key in list(self._models):
+            self._drop(key)
+
+
+model_cache = ModelCache(settings.MODEL_CACHE_MAX_BYTES, settings.MODEL_CACHE_MAX_MODELS)
+
+registry.callback_gauge(
+    "model_cache_bytes", "Weight bytes mapped by cached models", lambda: model_cache.total_bytes
+)
+registry.callback_gauge(
+    "model_cache_models", "Models held in the model cache", lambda: len(model_cache)
+)
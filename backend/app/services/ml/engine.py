@@ -0,0 +1,387 @@
+"""CPU inference engine for models stored as NumPy weight directories
+
+A model is a directory holding a model.json manifest and one .npy file
+per tensor:
+
+    model.json
+    {
+        "format": "iotai-numpy",
+        "version": 1,
+        "task": "classification",          # or "regression"
+        "input_shape": [28, 28, 1],         # one sample, channels last
+        "labels": ["cat", "dog"],
+        "preprocessing": {"resize": "crop"},  # optional, for image inputs (images.py)
+        "layers": [
+            {"type": "conv2d", "weights": "conv1.w.npy", "bias": "conv1.b.npy",
+             "stride": 1, "padding": "same", "activation": "relu"},
+            {"type": "maxpool2d", "size": 2},
+            {"type": "flatten"},
+            {"type": "dense", "weights": "fc.w.npy", "bias": "fc.b.npy",
+             "activation": "softmax"}
+        ]
+    }
+
+Dense weights are (inputs, outputs) and conv2d weights (kh, kw, cin, cout).
+Int8 weights carry a "weights_scale" tensor with one float32 scale per
+output channel (see quantize.py).
+Weights are memory-mapped read-only, so loading is cheap, pages are shared
+between worker processes through the page cache, and only the layers a
+forward pass touches are ever read from disk.
+"""
+
+import json
+import os
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+from app.core.config import settings
+from app.core.lazy import lazy_import
+
+
+np = lazy_import("numpy", "model inference")
+
+MANIFEST_NAME = "model.json"
+MODEL_FORMAT = "iotai-numpy"
+
+
+class ModelFormatError(ValueError):
+    pass
+
+
+def resolve_model_path(file_path: str) -> str:
+    """Absolute path of a stored model; relative paths live under MODEL_STORAGE_DIR"""
+    if os.path.isabs(file_path):
+        return file_path
+    return os.path.abspath(os.path.join(settings.MODEL_STORAGE_DIR, file_path))
+
+
+# Activations
+
+
+def _softmax(x):
+    shifted = x - x.max(axis=-1, keepdims=True)
+    np.exp(shifted, out=shifted)
+    shifted /= shifted.sum(axis=-1, keepdims=True)
+    return shifted
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+ACTIVATIONS = {
+    None: lambda x: x,
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0, out=x),
+    "sigmoid": _sigmoid,
+    "tanh": lambda x: np.tanh(x, out=x),
+    "softmax": _softmax,
+}
+
+
+# Layers
+
+# Int8 weights are dequantized in blocks of this many elements (1 MB as float32)
+DEQUANT_BLOCK_ELEMENTS = 256 * 1024
+
+
+def _matmul(x, weights, scale):
+    """x @ weights, with int8 weights dequantized a block of input rows at a time"""
+    if scale is None:
+        return x @ weights
+    rows, cols = weights.shape
+    # Row blocks are contiguous in memory, unlike column blocks
+    step = max(DEQUANT_BLOCK_ELEMENTS // cols, 1)
+    if step >= rows:
+        y = x @ weights.astype(np.float32)
+    else:
+        block = np.empty((step, cols), dtype=np.float32)
+        y = np.zeros((x.shape[0], cols), dtype=np.float32)
+        for start in range(0, rows, step):
+            part = weights[start:start + step]
+            np.copyto(block[: len(part)], part, casting="unsafe")
+            y += x[:, start:start + step] @ block[: len(part)]
+    # Per-output-channel scales factor out of the product
+    y *= scale
+    return y
+
+
+class Layer(ABC):
+    @abstractmethod
+    def forward(self, x):
+        ...
+
+    def output_shape(self, input_shape: Sequence[int]) -> List[int]:
+        return list(input_shape)
+
+    @property
+    def nbytes(self) -> int:
+        return 0
+
+
+@dataclass
+class Dense(Layer):
+    weights: Any
+    bias: Optional[Any] = None
+    activation: Optional[str] = None
+    scale: Optional[Any] = None  # per-output scales of int8 weights
+
+    def forward(self, x):
+        y = _matmul(x, self.weights, self.scale)
+        if self.bias is not None:
+            y += self.bias
+        return ACTIVATIONS[self.activation](y)
+
+    def output_shape(self, input_shape):
+        return [self.weights.shape[1]]
+
+    @property
+    def nbytes(self):
+        return sum(t.nbytes for t in (self.weights, self.bias, self.scale) if t is not None)
+
+
+def _pad_amounts(size: int, kernel: int, stride: int, padding: str):
+    if padding == "valid":
+        return 0, 0
+    out = -(-size // stride)
+    total = max((out - 1) * stride + kernel - size, 0)
+    return total // 2, total - total // 2
+
+
+@dataclass
+class Conv2D(Layer):
+    weights: Any  # (kh, kw, cin, cout)
+    bias: Optional[Any] = None
+    stride: int = 1
+    padding: str = "valid"  # valid or same
+    activation: Optional[str] = None
+    scale: Optional[Any] = None  # per-output scales of int8 weights
+
+    def _pad(self, x):
+        kh, kw = self.weights.shape[:2]
+        top, bottom = _pad_amounts(x.shape[1], kh, self.stride, self.padding)
+        left, right = _pad_amounts(x.shape[2], kw, self.stride, self.padding)
+        if top or bottom or left or right:
+            x = np.pad(x, ((0, 0), (top, bottom), (left, right), (0, 0)))
+        return x
+
+    def forward(self, x):
+        kh, kw, cin, cout = self.weights.shape
+        x = self._pad(x)
+        # (n, oh, ow, cin, kh, kw) view without copying, then one GEMM
+        windows = np.lib.stride_tricks.sliding_window_view(x, (kh, kw), axis=(1, 2))
+        windows = windows[:, :: self.stride, :: self.stride]
+        n, oh, ow = windows.shape[:3]
+        columns = windows.transpose(0, 1, 2, 4, 5, 3).reshape(n * oh * ow, kh * kw * cin)
+        y = _matmul(columns, self.weights.reshape(kh * kw * cin, cout), self.scale)
+        if self.bias is not None:
+            y += self.bias
+        return ACTIVATIONS[self.activation](y.reshape(n, oh, ow, cout))
+
+    def output_shape(self, input_shape):
+        h, w, _ = input_shape
+        kh, kw, _, cout = self.weights.shape
+        if self.padding == "same":
+            return [-(-h // self.stride), -(-w // self.stride), cout]
+        return [(h - kh) // self.stride + 1, (w - kw) // self.stride + 1, cout]
+
+    @property
+    def nbytes(self):
+        return sum(t.nbytes for t in (self.weights, self.bias, self.scale) if t is not None)
+
+
+@dataclass
+class Pool2D(Layer):
+    size: int = 2
+    mode: str = "max"
+
+    def forward(self, x):
+        n, h, w, c = x.shape
+        s = self.size
+        x = x[:, : h - h % s, : w - w % s]
+        blocks = x.reshape(n, h // s, s, w // s, s, c)
+        if self.mode == "max":
+            return blocks.max(axis=(2, 4))
+        return blocks.mean(axis=(2, 4))
+
+    def output_shape(self, input_shape):
+        h, w, c = input_shape
+        return [h // self.size, w // self.size, c]
+
+
+@dataclass
+class GlobalAveragePool(Layer):
+    def forward(self, x):
+        return x.mean(axis=(1, 2))
+
+    def output_shape(self, input_shape):
+        return [input_shape[-1]]
+
+
+@dataclass
+class Flatten(Layer):
+    def forward(self, x):
+        return x.reshape(x.shape[0], -1)
+
+    def output_shape(self, input_shape):
+        return [int(np.prod(input_shape))]
+
+
+@dataclass
+class Activation(Layer):
+    activation: str = "relu"
+
+    def forward(self, x):
+        return ACTIVATIONS[self.activation](x)
+
+
+# Model
+
+
+@dataclass
+class Model:
+    path: str
+    manifest: Dict[str, Any]
+    layers: List[Layer] = field(default_factory=list)
+
+    @property
+    def input_shape(self) -> List[int]:
+        return list(self.manifest["input_shape"])
+
+    @property
+    def labels(self) -> List[str]:
+        return list(self.manifest.get("labels") or [])
+
+    @property
+    def task(self) -> str:
+        return self.manifest.get("task", "classification")
+
+    @property
+    def nbytes(self) -> int:
+        """Mapped weight bytes, what the model cache budgets against"""
+        return sum(layer.nbytes for layer in self.layers)
+
+    def predict(self, batch):
+        """Forward pass over a batch shaped (n, *input_shape)"""
+        # Copy, since activations run in place
+        x = np.array(batch, dtype=np.float32)
+        if list(x.shape[1:]) != self.input_shape:
+            raise ValueError(
+                f"Expected inputs shaped (n, {', '.join(map(str, self.input_shape))}), "
+                f"got {x.shape}"
+            )
+        for layer in self.layers:
+            x = layer.forward(x)
+        return x
+
+
+def _load_tensor(directory: str, name: Optional[str], mmap: bool):
+    if name is None:
+        return None
+    path = os.path.join(directory, name)
+    if os.path.dirname(os.path.normpath(name)) or not name.endswith(".npy"):
+        raise ModelFormatError(f"Invalid tensor file name: {name}")
+    return np.load(path, mmap_mode="r" if mmap else None, allow_pickle=False)
+
+
+def build_layer(directory: str, spec: Dict[str, Any], mmap: bool = True) -> Layer:
+    kind = spec.get("type")
+    activation = spec.get("activation")
+    if activation not in ACTIVATIONS:
+        raise ModelFormatError(f"Unknown activation: {activation}")
+    if kind == "dense":
+        return Dense(
+            weights=_load_tensor(directory, spec["weights"], mmap),
+            bias=_load_tensor(directory, spec.get("bias"), mmap),
+            activation=activation,
+            scale=_load_tensor(directory, spec.get("weights_scale"), mmap),
+        )
+    if kind == "conv2d":
+        return Conv2D(
+            weights=_load_tensor(directory, spec["weights"], mmap),
+            bias=_load_tensor(directory, spec.get("bias"), mmap),
+            stride=int(spec.get("stride", 1)),
+            padding=spec.get("padding", "valid"),
+            activation=activation,
+            scale=_load_tensor(directory, spec.get("weights_scale"), mmap),
+        )
+    if kind in ("maxpool2d", "avgpool2d"):
+        return Pool2D(size=int(spec.get("size", 2)), mode=kind[:3])
+    if kind == "global_avgpool":
+        return GlobalAveragePool()
+    if kind == "flatten":
+        return Flatten()
+    if kind == "activation":
+        return Activation(activation=activation)
+    raise ModelFormatError(f"Unknown layer type: {kind}")
+
+
+def load_model(path: str, mmap: bool = True) -> Model:
+    """Load a model directory, memory-mapping its weights"""
+    manifest_path = os.path.join(path, MANIFEST_NAME)
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        raise ModelFormatError(f"No {MANIFEST_NAME} in {path}")
+    if manifest.get("format") != MODEL_FORMAT:
+        raise ModelFormatError(f"Unsupported model format: {manifest.get('format')}")
+
+    model = Model(path=path, manifest=manifest)
+    shape = model.input_shape
+    for spec in manifest.get("layers", []):
+        layer = build_layer(path, spec, mmap)
+        model.layers.append(layer)
+        shape = layer.output_shape(shape)
+    if model.task == "classification" and model.labels and shape != [len(model.labels)]:
+        raise ModelFormatError(
+            f"Model outputs {shape} but has {len(model.labels)} labels"
+        )
+    return model
+
+
+def save_model(path: str, manifest: Dict[str, Any], tensors: Dict[str, Any]) -> None:
+    """Write a model directory: tensors as .npy files plus the manifest
+
+    The manifest is written last, so a half-written directory never loads.
+    """
+    os.makedirs(path, exist_ok=True)
+    for name, array in tensors.items():
+        np.save(os.path.join(path, name), np.ascontiguousarray(array), allow_pickle=False)
+    manifest = {"format": MODEL_FORMAT, "version": 1, **manifest}
+    tmp_path = os.path.join(path, MANIFEST_NAME + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(path, MANIFEST_NAME))
+
+
+def sample_input(model: Model, batch_size: int = 1, seed: int = 0):
+    """Deterministic input batch for smoke-testing a model"""
+    rng = np.random.default_rng(seed)
+    return rng.random((batch_size, *model.input_shape), dtype=np.float32)
+
+
+def top_k(model: Model, outputs, k: int) -> List[List[Dict[str, Any]]]:
+    """Per-sample predictions: top-k labels for classifiers, raw values otherwise"""
+    results = []
+    if model.task != "classification":
+        for row in outputs.reshape(outputs.shape[0], -1):
+            results.append([{"index": i, "value": float(v)} for i, v in enumerate(row)])
+        return results
+
+    labels = model.labels
+    k = min(k, outputs.shape[-1])
+    best = np.argsort(-outputs, axis=-1)[:, :k]
+    for row, indices in zip(outputs, best):
+        results.append(
+            [
+                {
+                    "index": int(i),
+                    "label": labels[i] if i < len(labels) else str(int(i)),
+                    "confidence": float(row[i]),
+                }
+                for i in indices
+            ]
+        )
+    return results
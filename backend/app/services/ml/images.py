@@ -0,0 +1,253 @@
+"""Image preprocessing for vision models
+
+Turns encoded images into the float32 tensors a model's input_shape asks
+for: (height, width, 1) models get grayscale input, (height, width, 3)
+models RGB. How pixels are fitted and normalized comes from the optional
+"preprocessing" section of model.json:
+
+    "preprocessing": {
+        "resize": "crop",                  # crop (cover, then center crop) or stretch
+        "scale": 0.00392156862745098,      # applied to 0-255 pixel values first
+        "mean": [0.485, 0.456, 0.406],     # then (x - mean) / std per channel
+        "std": [0.229, 0.224, 0.225]
+    }
+
+JPEGs are decoded with Pillow's draft mode, which lets libjpeg decode
+straight to 1/2, 1/4 or 1/8 scale when the model input is that much
+smaller, skipping most of the decode work. Images of a batch are decoded
+in parallel on a dedicated thread pool (Pillow releases the GIL while
+decoding and resizing), and preprocessed tensors are cached by content
+hash so a repeated image costs one SHA-256.
+"""
+
+import asyncio
+import hashlib
+import io
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.core.lazy import lazy_import
+from app.core.metrics import registry
+from app.services.ml.engine import Model, np
+
+
+Image = lazy_import("PIL.Image", "image preprocessing")
+ImageOps = lazy_import("PIL.ImageOps", "image preprocessing")
+
+# EXIF orientations that swap width and height
+_TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
+image_preprocess_time = registry.histogram(
+    "image_preprocess_seconds",
+    "Time to decode and preprocess one image (cache misses only)",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+image_tensor_cache_lookups = registry.counter(
+    "image_tensor_cache_lookups_total",
+    "Preprocessed tensor cache lookups",
+    ("result",),
+)
+
+
+class ImageError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class ImageSpec:
+    """How to turn an image into one model input sample"""
+
+    height: int
+    width: int
+    channels: int
+    resize: str = "crop"
+    scale: float = 1 / 255
+    mean: Tuple[float, ...] = (0.0,)
+    std: Tuple[float, ...] = (1.0,)
+
+    @property
+    def mode(self) -> str:
+        return "L" if self.channels == 1 else "RGB"
+
+
+def image_spec(model: Model) -> ImageSpec:
+    """Preprocessing for a model, or ImageError if it does not take images"""
+    shape = model.input_shape
+    if len(shape) != 3 or shape[2] not in (1, 3):
+        raise ImageError(
+            f"Model input {shape} is not an image; expected (height, width, 1 or 3)"
+        )
+    options = model.manifest.get("preprocessing") or {}
+    resize = options.get("resize", "crop")
+    if resize not in ("crop", "stretch"):
+        raise ImageError(f"Unknown resize mode: {resize}")
+    mean = tuple(float(v) for v in options.get("mean", (0.0,)))
+    std = tuple(float(v) for v in options.get("std", (1.0,)))
+    if len(mean) not in (1, shape[2]) or len(std) not in (1, shape[2]):
+        raise ImageError(f"Preprocessing mean and std need 1 or {shape[2]} values")
+    return ImageSpec(
+        height=shape[0],
+        width=shape[1],
+        channels=shape[2],
+        resize=resize,
+        scale=float(options.get("scale", 1 / 255)),
+        mean=mean,
+        std=std,
+    )
+
+
+def _crop_box(size: Tuple[int, int], spec: ImageSpec) -> Optional[Tuple[float, ...]]:
+    """Centered source region with the model's aspect ratio"""
+    if spec.resize == "stretch":
+        return None
+    w, h = size
+    target = spec.width / spec.height
+    if w / h > target:
+        crop_w, crop_h = h * target, h
+    else:
+        crop_w, crop_h = w, w / target
+    return ((w - crop_w) / 2, (h - crop_h) / 2, (w + crop_w) / 2, (h + crop_h) / 2)
+
+
+def _draft_size(size: Tuple[int, int], spec: ImageSpec, transposed: bool) -> Tuple[int, int]:
+    """Smallest decode size that still covers the model input"""
+    width, height = (spec.height, spec.width) if transposed else (spec.width, spec.height)
+    if spec.resize == "stretch":
+        return width, height
+    w, h = size
+    factor = max(width / w, height / h)
+    return math.ceil(w * factor), math.ceil(h * factor)
+
+
+def preprocess_image(data: bytes, spec: ImageSpec):
+    """Decode one encoded image into a (height, width, channels) float32 tensor"""
+    try:
+        image = Image.open(io.BytesIO(data))
+        w, h = image.size
+        if w * h > settings.IMAGE_MAX_PIXELS:
+            raise ImageError(f"Image is {w}x{h}; at most {settings.IMAGE_MAX_PIXELS} pixels")
+        transposed = image.getexif().get(0x0112) in _TRANSPOSED_ORIENTATIONS
+        # No-op for formats other than JPEG
+        image.draft(spec.mode, _draft_size(image.size, spec, transposed))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert(spec.mode)
+        image = image.resize(
+            (spec.width, spec.height),
+            Image.Resampling.BILINEAR,
+            box=_crop_box(image.size, spec),
+            reducing_gap=3.0,
+        )
+    except ImageError:
+        raise
+    except Image.UnidentifiedImageError:
+        raise ImageError("Unsupported or corrupt image file")
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError) as e:
+        raise ImageError(f"Cannot decode image: {e}")
+
+    tensor = np.asarray(image, dtype=np.float32)
+    if tensor.ndim == 2:
+        tensor = tensor[..., None]
+    tensor *= spec.scale
+    if spec.mean != (0.0,):
+        tensor -= np.asarray(spec.mean, dtype=np.float32)
+    if spec.std != (1.0,):
+        tensor /= np.asarray(spec.std, dtype=np.float32)
+    return tensor
+
+
+class TensorCache:
+    """Thread-safe LRU of preprocessed tensors bounded by bytes"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._tensors: "OrderedDict[Tuple[str, ImageSpec], Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._tensors)
+
+    def get(self, key):
+        with self._lock:
+            tensor = self._tensors.get(key)
+            if tensor is not None:
+                self._tensors.move_to_end(key)
+            return tensor
+
+    def put(self, key, tensor) -> None:
+        if tensor.nbytes > self.max_bytes:
+            return
+        # Shared between requests, so never modified in place
+        tensor.setflags(write=False)
+        with self._lock:
+            previous = self._tensors.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= previous.nbytes
+            self._tensors[key] = tensor
+            self.total_bytes += tensor.nbytes
+            while self.total_bytes > self.max_bytes:
+                _, evicted = self._tensors.popitem(last=False)
+                self.total_bytes -= evicted.nbytes
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tensors.clear()
+            self.total_bytes = 0
+
+
+tensor_cache = TensorCache(settings.IMAGE_TENSOR_CACHE_MAX_BYTES)
+
+registry.callback_gauge(
+    "image_tensor_cache_bytes",
+    "Bytes held by the preprocessed tensor cache",
+    lambda: tensor_cache.total_bytes,
+)
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def preprocess_executor() -> ThreadPoolExecutor:
+    """Thread pool for image decoding, separate from the inference pool"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_PREPROCESS_THREADS or os.cpu_count() or 1,
+            thread_name_prefix="preprocess",
+        )
+    return _executor
+
+
+def _prepare(data: bytes, spec: ImageSpec) -> Tuple[Any, Optional[float]]:
+    """Cached tensor for an image, plus the preprocessing time on a miss"""
+    key = (hashlib.sha256(data).hexdigest(), spec)
+    tensor = tensor_cache.get(key)
+    if tensor is not None:
+        return tensor, None
+    start = time.perf_counter()
+    tensor = preprocess_image(data, spec)
+    elapsed = time.perf_counter() - start
+    tensor_cache.put(key, tensor)
+    return tensor, elapsed
+
+
+async def preprocess_images(images: Sequence[bytes], spec: ImageSpec):
+    """Batch (n, height, width, channels) from encoded images, decoded in parallel"""
+    loop = asyncio.get_running_loop()
+    executor = preprocess_executor()
+    results = await asyncio.gather(
+        *(loop.run_in_executor(executor, _prepare, data, spec) for data in images)
+    )
+    for _, elapsed in results:
+        if elapsed is None:
+            image_tensor_cache_lookups.inc(("hit",))
+        else:
+            image_tensor_cache_lookups.inc(("miss",))
+            image_preprocess_time.observe(elapsed)
+    return np.stack([tensor for tensor, _ in results])
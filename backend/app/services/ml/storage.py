@@ -0,0 +1,151 @@
+"""On-disk layout of stored models
+
+    MODEL_STORAGE_DIR/
+        sha256/<digest>/        extracted model directories, one per distinct
+                                uploaded archive (content-addressed)
+        uploads/<id>.part       archives being uploaded in chunks
+
+AIModel.file_path holds paths relative to MODEL_STORAGE_DIR, e.g.
+"sha256/<digest>", so the storage root can move without rewriting rows.
+"""
+
+import os
+import shutil
+import tarfile
+import uuid
+import zipfile
+from typing import Iterator, Tuple
+
+from app.core.config import settings
+from app.services.ml.engine import MANIFEST_NAME, load_model
+
+
+# Archive members a model directory may contain
+ALLOWED_SUFFIXES = (".npy", ".json")
+
+
+class ModelArchiveError(ValueError):
+    pass
+
+
+def storage_path(*parts: str) -> str:
+    return os.path.abspath(os.path.join(settings.MODEL_STORAGE_DIR, *parts))
+
+
+def upload_part_path(upload_id: str) -> str:
+    return storage_path("uploads", f"{upload_id}.part")
+
+
+def content_path(digest: str) -> str:
+    """Relative file_path of the model extracted from an archive with this digest"""
+    return f"sha256/{digest}"
+
+
+def has_content(digest: str) -> bool:
+    return os.path.isfile(storage_path(content_path(digest), MANIFEST_NAME))
+
+
+def format_size(num_bytes: int) -> str:
+    """Human readable size as shown on model cards, e.g. '14 MB'"""
+    size = float(num_bytes)
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" or size >= 10 else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def directory_size(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(path, name))
+        for name in os.listdir(path)
+        if os.path.isfile(os.path.join(path, name))
+    )
+
+
+def _members(archive_path: str) -> Iterator[Tuple[str, object, callable]]:
+    """(name, member, opener) for each file in a zip or tar archive"""
+    if zipfile.is_zipfile(archive_path):
+        with zipfile.ZipFile(archive_path) as archive:
+            for info in archive.infolist():
+                if not info.is_dir():
+                    yield info.filename, info, archive.open
+        return
+    try:
+        archive = tarfile.open(archive_path)
+    except tarfile.TarError:
+        raise ModelArchiveError("Model archives must be .zip or .tar(.gz) files")
+    with archive:
+        for info in archive:
+            if info.isfile():
+                yield info.name, info, archive.extractfile
+            elif not info.isdir():
+                raise ModelArchiveError(f"Unsupported archive entry: {info.name}")
+
+
+def _copy_limited(source, out, budget: int) -> int:
+    """Copy at most budget bytes; returns how many were copied"""
+    copied = 0
+    while True:
+        chunk = source.read(1024 * 1024)
+        if not chunk:
+            return copied
+        copied += len(chunk)
+        if copied > budget:
+            raise ModelArchiveError(
+                f"Model archive unpacks to more than "
+                f"{format_size(settings.MODEL_ARCHIVE_MAX_UNPACKED_BYTES)}"
+            )
+        out.write(chunk)
+
+
+def extract_model_archive(archive_path: str, digest: str) -> str:
+    """Unpack a model archive into content storage and validate it
+
+    Members are streamed to disk one at a time, so memory use does not
+    depend on the archive size, and unpacking stops once the archive
+    exceeds MODEL_ARCHIVE_MAX_MEMBERS or MODEL_ARCHIVE_MAX_UNPACKED_BYTES.
+    Returns the relative file_path. Content that is already stored is
+    reused without extracting again.
+    """
+    relative = content_path(digest)
+    if has_content(digest):
+        return relative
+
+    target = storage_path(relative)
+    staging = f"{target}.tmp-{uuid.uuid4().hex}"
+    os.makedirs(staging)
+    try:
+        names = set()
+        unpacked = 0
+        for name, member, opener in _members(archive_path):
+            if len(names) >= settings.MODEL_ARCHIVE_MAX_MEMBERS:
+                raise ModelArchiveError(
+                    f"Model archives may hold at most {settings.MODEL_ARCHIVE_MAX_MEMBERS} files"
+                )
+            # Archives may wrap the files in a single top-level directory
+            base = os.path.basename(name)
+            if not base.endswith(ALLOWED_SUFFIXES) or base in names:
+                raise ModelArchiveError(f"Unexpected file in model archive: {name}")
+            names.add(base)
+            with opener(member) as source, open(os.path.join(staging, base), "wb") as out:
+                unpacked += _copy_limited(
+                    source, out, settings.MODEL_ARCHIVE_MAX_UNPACKED_BYTES - unpacked
+                )
+        if MANIFEST_NAME not in names:
+            raise ModelArchiveError(f"Model archive has no {MANIFEST_NAME}")
+
+        # Fails on unknown layers or missing and mismatched tensors
+        load_model(staging)
+
+        try:
+            os.rename(staging, target)
+        except OSError:
+            # Another upload of the same content finished first
+            if not has_content(digest):
+                raise
+            shutil.rmtree(staging, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return relative
@@ -0,0 +1,203 @@
+"""Autoregressive forecasting models trained on sensor readings
+
+A forecaster predicts a sensor's next reading from its previous `lags`
+readings. Both algorithms learn incrementally: partial_fit only looks at
+readings that arrived since the previous fit, so an update costs time in
+proportion to the new data, not to the whole history.
+
+    ridge  exact ridge regression from running sufficient statistics.
+           New windows add their X'X and X'y, then a (lags + 1)-square
+           system is solved again.
+    sgd    mini-batch stochastic gradient descent on squared error with
+           an L2 penalty, `epochs` passes over the new windows.
+
+Readings are standardized with the mean and standard deviation of the
+first fit, which then stay fixed so earlier statistics remain valid. The
+served model folds the standardization back into a single dense layer
+(input_shape [lags], task "regression"), so it runs on the ordinary
+engine. The training state is stored next to the served weights in the
+model directory: the statistics or weights, the last `lags` readings (so
+windows span consecutive fits) and counters.
+
+Fits run in a process pool, since the windowing and SGD loops hold the
+GIL the inference threads need.
+"""
+
+import json
+import multiprocessing
+import os
+import shutil
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.services.ml.engine import MANIFEST_NAME, np, save_model
+
+
+ALGORITHMS = ("ridge", "sgd")
+SGD_BATCH_SIZE = 64
+# State tensors saved beside the served weights
+STATE_TENSORS = ("xtx", "xty", "coef", "tail")
+
+
+class TrainingError(ValueError):
+    pass
+
+
+def _design(series, lags: int):
+    """Windows of `lags` readings plus a bias column, and the reading after each"""
+    view = np.lib.stride_tricks.sliding_window_view(series, lags + 1)
+    x = np.empty((len(view), lags + 1))
+    x[:, :lags] = view[:, :lags]
+    x[:, lags] = 1.0
+    return x, view[:, lags]
+
+
+def _new_state(values, lags: int) -> Dict[str, Any]:
+    if len(values) < lags + 2:
+        raise TrainingError(f"Need at least {lags + 2} readings to start, got {len(values)}")
+    std = float(values.std())
+    return {
+        "mean": float(values.mean()),
+        "std": std if std > 0 else 1.0,
+        "samples": 0,
+        "steps": 0,
+        "xtx": np.zeros((lags + 1, lags + 1)),
+        "xty": np.zeros(lags + 1),
+        "coef": np.zeros(lags + 1),
+        "tail": np.zeros(0),
+    }
+
+
+def _sgd(state: Dict[str, Any], x, y, params: Dict[str, Any]) -> None:
+    coef = state["coef"]
+    penalty = np.ones_like(coef)
+    penalty[-1] = 0.0  # the bias is not regularized
+    rng = np.random.default_rng(state["steps"])
+    for _ in range(params["epochs"]):
+        order = rng.permutation(len(y))
+        for start in range(0, len(y), SGD_BATCH_SIZE):
+            batch = order[start:start + SGD_BATCH_SIZE]
+            xb, yb = x[batch], y[batch]
+            gradient = xb.T @ (xb @ coef - yb) / len(batch) + params["alpha"] * penalty * coef
+            state["steps"] += 1
+            coef -= params["learning_rate"] / state["steps"] ** 0.25 * gradient
+
+
+def _ridge(state: Dict[str, Any], x, y, params: Dict[str, Any]) -> None:
+    state["xtx"] += x.T @ x
+    state["xty"] += x.T @ y
+    regularized = state["xtx"] + params["alpha"] * np.diag([1.0] * params["lags"] + [0.0])
+    try:
+        state["coef"] = np.linalg.solve(regularized, state["xty"])
+    except np.linalg.LinAlgError:
+        state["coef"] = np.linalg.lstsq(regularized, state["xty"], rcond=None)[0]
+
+
+def partial_fit(
+    state: Optional[Dict[str, Any]], values, params: Dict[str, Any]
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Update a training state (None = start over) with new readings, in time order"""
+    lags = params["lags"]
+    values = np.asarray(values, dtype=np.float64)
+    if state is None:
+        state = _new_state(values, lags)
+    series = np.concatenate([state["tail"], (values - state["mean"]) / state["std"]])
+    state["tail"] = series[-lags:]
+    report: Dict[str, Any] = {"windows": 0, "samples": state["samples"]}
+    if len(series) <= lags:
+        return state, report
+
+    x, y = _design(series, lags)
+    if state["samples"]:
+        # Error of the previous model on readings it has not seen
+        report["previous_rmse"] = float(np.sqrt(np.mean((x @ state["coef"] - y) ** 2)) * state["std"])
+    if params["algorithm"] == "ridge":
+        _ridge(state, x, y, params)
+    else:
+        _sgd(state, x, y, params)
+    state["samples"] += len(y)
+
+    residual = x @ state["coef"] - y
+    spread = float(np.sum((y - y.mean()) ** 2))
+    report.update(
+        windows=len(y),
+        samples=state["samples"],
+        rmse=float(np.sqrt(np.mean(residual ** 2)) * state["std"]),
+        r2=1.0 - float(np.sum(residual ** 2)) / spread if spread > 0 else None,
+    )
+    return state, report
+
+
+def read_state(path: str) -> Dict[str, Any]:
+    with open(os.path.join(path, MANIFEST_NAME)) as f:
+        training = json.load(f).get("training")
+    if not training:
+        raise TrainingError("Model has no training state; retrain it from scratch")
+    state = {key: training[key] for key in ("mean", "std", "samples", "steps")}
+    for name in STATE_TENSORS:
+        state[name] = np.load(os.path.join(path, f"state.{name}.npy"), allow_pickle=False)
+    return state
+
+
+def write_forecaster(path: str, state: Dict[str, Any], params: Dict[str, Any]) -> None:
+    """Served weights plus training state, staged and renamed into place"""
+    lags = params["lags"]
+    coef, mean, std = state["coef"], state["mean"], state["std"]
+    # y = mean + std * (w . (x - mean) / std + b)  =  w . x + mean * (1 - sum(w)) + std * b
+    weights = coef[:lags].reshape(lags, 1)
+    bias = np.array([mean * (1.0 - coef[:lags].sum()) + std * coef[lags]])
+    manifest = {
+        "task": "regression",
+        "input_shape": [lags],
+        "layers": [{"type": "dense", "weights": "forecast.w.npy", "bias": "forecast.b.npy"}],
+        "training": {
+            **params,
+            **{key: state[key] for key in ("mean", "std", "samples", "steps")},
+        },
+    }
+    tensors = {
+        "forecast.w.npy": weights.astype(np.float32),
+        "forecast.b.npy": bias.astype(np.float32),
+        **{f"state.{name}.npy": state[name] for name in STATE_TENSORS},
+    }
+    staging = f"{path}.tmp-{uuid.uuid4().hex}"
+    try:
+        save_model(staging, manifest, tensors)
+        os.rename(staging, path)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+
+def train_step(previous: Optional[str], target: str, values, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Fit readings on top of the model at previous (None = from scratch), written to target
+
+    Runs in a training process.
+    """
+    state = read_state(previous) if previous else None
+    state, report = partial_fit(state, values, params)
+    write_forecaster(target, state, params)
+    return report
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def training_executor() -> ProcessPoolExecutor:
+    """Process pool for fits; spawned, since forking a threaded server is unsafe"""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.MODEL_TRAINING_PROCESSES or os.cpu_count() or 1,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def close_training_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,144 @@
+"""Chunked, resumable model uploads
+
+A client starts an upload with the archive size, then PUTs numbered
+chunks of chunk_size bytes in order. Each chunk is streamed straight to
+uploads/<id>.part while the running SHA-256 of the archive is updated, so
+memory per upload stays constant whatever the model size.
+
+The running hash lives in process memory between chunks. When it is gone
+(restart, eviction, or a chunk that lands on another worker) it is
+rebuilt by hashing the part file up to the bytes already received, which
+is what makes an interrupted upload resumable from next_chunk.
+"""
+
+import asyncio
+import hashlib
+import os
+import weakref
+from collections import OrderedDict
+from typing import AsyncIterator, Tuple
+
+import aiofiles
+from starlette.concurrency import run_in_threadpool
+
+from app.models import ModelUpload
+from app.services.ml.storage import upload_part_path
+
+
+HASH_READ_SIZE = 1024 * 1024
+# Running hashes kept between chunks; evicted ones are rebuilt from disk
+MAX_HASHERS = 1024
+
+
+class ChunkError(ValueError):
+    """A chunk body that does not match the upload"""
+
+
+class ChunkOutOfOrder(Exception):
+    """A chunk sent before the chunks preceding it"""
+
+
+# upload id -> (sha256 of the first n bytes, n)
+_hashers: "OrderedDict[str, Tuple[object, int]]" = OrderedDict()
+_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+def upload_lock(upload_id: str) -> asyncio.Lock:
+    """Serializes chunk writes and completion of one upload in this process"""
+    lock = _locks.get(upload_id)
+    if lock is None:
+        lock = _locks[upload_id] = asyncio.Lock()
+    return lock
+
+
+def _hash_prefix(path: str, length: int):
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        remaining = length
+        while remaining:
+            data = f.read(min(HASH_READ_SIZE, remaining))
+            if not data:
+                raise ChunkError("Upload data is missing on disk; start a new upload")
+            hasher.update(data)
+            remaining -= len(data)
+    return hasher
+
+
+async def _hasher_at(upload: ModelUpload):
+    """Running hash of the bytes received so far"""
+    state = _hashers.get(upload.id)
+    if state is not None and state[1] == upload.received_bytes:
+        _hashers.move_to_end(upload.id)
+        return state[0]
+    if upload.received_bytes == 0:
+        return hashlib.sha256()
+    return await run_in_threadpool(
+        _hash_prefix, upload_part_path(upload.id), upload.received_bytes
+    )
+
+
+def _remember(upload_id: str, hasher, length: int) -> None:
+    _hashers[upload_id] = (hasher, length)
+    _hashers.move_to_end(upload_id)
+    while len(_hashers) > MAX_HASHERS:
+        _hashers.popitem(last=False)
+
+
+async def receive_chunk(
+    upload: ModelUpload, index: int, stream: AsyncIterator[bytes]
+) -> bool:
+    """Append chunk `index` to the part file and advance upload.received_bytes
+
+    Returns False for a chunk that was already received, which retrying
+    clients may resend. A short, oversized or interrupted body leaves the
+    upload as it was before the chunk.
+    """
+    if index < upload.next_chunk or upload.received_bytes == upload.total_size:
+        return False
+    if index >= upload.total_chunks:
+        raise ChunkError(f"Chunk {index} is past the end of the upload")
+    if index > upload.next_chunk:
+        raise ChunkOutOfOrder(f"Expected chunk {upload.next_chunk}, got {index}")
+
+    offset = upload.received_bytes
+    expected = min(upload.chunk_size, upload.total_size - offset)
+    # Work on a copy so a failed chunk leaves the running hash untouched
+    hasher = (await _hasher_at(upload)).copy()
+
+    path = upload_part_path(upload.id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    async with aiofiles.open(path, "r+b" if os.path.exists(path) else "wb") as f:
+        # Drops whatever an interrupted attempt at this chunk left behind
+        await f.truncate(offset)
+        await f.seek(offset)
+        written = 0
+        try:
+            async for data in stream:
+                written += len(data)
+                if written > expected:
+                    raise ChunkError(f"Chunk {index} must be {expected} bytes")
+                hasher.update(data)
+                await f.write(data)
+            if written != expected:
+                raise ChunkError(f"Chunk {index} must be {expected} bytes, got {written}")
+        except BaseException:
+            await f.truncate(offset)
+            raise
+
+    upload.received_bytes = offset + written
+    _remember(upload.id, hasher, upload.received_bytes)
+    return True
+
+
+async def upload_digest(upload: ModelUpload) -> str:
+    """SHA-256 of a fully received upload"""
+    return (await _hasher_at(upload)).hexdigest()
+
+
+def discard_upload(upload_id: str) -> None:
+    """Forget the running hash and delete the part file"""
+    _hashers.pop(upload_id, None)
+    try:
+        os.remove(upload_part_path(upload_id))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1 @@
+"""Over-the-air firmware updates: deltas, transports and simulated devices"""
@@ -0,0 +1,191 @@
+"""Binary deltas between firmware images
+
+The encoder works like rsync: the base image is cut into fixed blocks
+indexed by a rolling checksum, the new image is scanned at every byte
+offset for blocks the base already has, and each match is extended byte
+by byte in both directions. What is left over is sent literally. Code
+inserted or removed in the middle of an image only shifts what follows,
+so an edit costs roughly its own size plus a block, not the image size.
+
+Checksums of all offsets are computed at once with NumPy prefix sums, a
+segment of the image at a time; only offsets whose checksum matches a
+base block are looked at in Python.
+
+Format (after the magic, zlib-compressed):
+
+    varint base_size, varint new_size, then ops until the end:
+        0x00 varint length <length bytes>     literal
+        0x01 varint offset varint length      copy from the base image
+"""
+
+import bisect
+import zlib
+from typing import Dict, List
+
+from app.core.lazy import lazy_import
+
+
+np = lazy_import("numpy", "firmware deltas")
+
+MAGIC = b"IOTD1"
+LITERAL, COPY = 0, 1
+# Offsets whose checksums are computed in one go
+SEGMENT_SIZE = 256 * 1024
+_LOW16 = 0xFFFF
+
+
+class DeltaError(ValueError):
+    pass
+
+
+def _varint(value: int, out: bytearray) -> None:
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return
+
+
+def _read_varint(data: bytes, pos: int):
+    value = shift = 0
+    while True:
+        if pos >= len(data):
+            raise DeltaError("Truncated delta")
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+def _pack(a, b):
+    mask = np.uint64(_LOW16)
+    return (a & mask) | ((b & mask) << np.uint64(16))
+
+
+def _weak_sums(data, block: int):
+    """rsync's rolling checksum of every block-sized window of data"""
+    x = data.astype(np.uint64)
+    # Wrapping arithmetic is fine: only the low 16 bits of each half are kept
+    s1 = np.concatenate((np.zeros(1, np.uint64), np.cumsum(x)))
+    s2 = np.concatenate((np.zeros(1, np.uint64), np.cumsum(x * np.arange(len(x), dtype=np.uint64))))
+    count = len(x) - block + 1
+    end = np.arange(block, block + count, dtype=np.uint64)
+    a = s1[block:] - s1[:count]
+    # sum of (block - i) * x[k + i] over the window at k
+    b = end * a - (s2[block:] - s2[:count])
+    return _pack(a, b)
+
+
+def _block_sums(data, block: int):
+    """The same checksum for each aligned block of data"""
+    weights = np.arange(block, 0, -1, dtype=np.uint64)
+    step = max(SEGMENT_SIZE // block, 1) * block
+    sums = []
+    for start in range(0, len(data) - block + 1, step):
+        blocks = data[start: start + step]
+        blocks = blocks[: len(blocks) // block * block].reshape(-1, block).astype(np.uint64)
+        sums.append(_pack(blocks.sum(axis=1), blocks @ weights))
+    return np.concatenate(sums) if sums else np.zeros(0, np.uint64)
+
+
+def _match_length(a, b) -> int:
+    """Length of the common prefix of two uint8 arrays"""
+    n = min(len(a), len(b))
+    done, step = 0, 256
+    while done < n:
+        size = min(step, n - done)
+        differs = np.flatnonzero(a[done:done + size] != b[done:done + size])
+        if differs.size:
+            return done + int(differs[0])
+        done += size
+        step = min(step * 4, SEGMENT_SIZE)
+    return n
+
+
+def make_delta(base: bytes, new: bytes, block: int = 256) -> bytes:
+    """Delta that turns base into new"""
+    out = bytearray()
+    _varint(len(base), out)
+    _varint(len(new), out)
+    old_arr = np.frombuffer(base, dtype=np.uint8)
+    new_arr = np.frombuffer(new, dtype=np.uint8)
+
+    table: Dict[int, List[int]] = {}
+    if len(new) >= block:
+        for index, value in enumerate(_block_sums(old_arr, block).tolist()):
+            table.setdefault(value, []).append(index * block)
+    known = np.fromiter(table, dtype=np.uint64, count=len(table))
+
+    def literal(start: int, end: int) -> None:
+        if end > start:
+            out.append(LITERAL)
+            _varint(end - start, out)
+            out.extend(new[start:end])
+
+    pending = 0  # start of the bytes no op covers yet
+    for seg in range(0, max(len(new) - block + 1, 0), SEGMENT_SIZE):
+        if pending >= seg + SEGMENT_SIZE or not table:
+            continue
+        sums = _weak_sums(new_arr[seg: seg + SEGMENT_SIZE + block - 1], block)
+        hits = np.flatnonzero(np.isin(sums, known))
+        offsets, values = (hits + seg).tolist(), sums[hits].tolist()
+        i = bisect.bisect_left(offsets, pending)
+        while i < len(offsets):
+            offset = offsets[i]
+            chunk = new[offset: offset + block]
+            source = next((o for o in table[values[i]] if base[o: o + block] == chunk), None)
+            if source is None:
+                i += 1
+                continue
+            # Grow the match backwards into pending bytes and forwards past the block
+            back = _match_length(new_arr[pending:offset][::-1], old_arr[:source][::-1])
+            ahead = _match_length(new_arr[offset + block:], old_arr[source + block:])
+            start, end = offset - back, offset + block + ahead
+            literal(pending, start)
+            out.append(COPY)
+            _varint(source - back, out)
+            _varint(end - start, out)
+            pending = end
+            i = bisect.bisect_left(offsets, pending, i)
+    literal(pending, len(new))
+    return MAGIC + zlib.compress(bytes(out), 9)
+
+
+def apply_delta(base: bytes, delta: bytes) -> bytes:
+    """The image a delta describes, built from base"""
+    if not delta.startswith(MAGIC):
+        raise DeltaError("Not a firmware delta")
+    try:
+        data = zlib.decompress(delta[len(MAGIC):])
+    except zlib.error as e:
+        raise DeltaError(f"Corrupt delta: {e}")
+    base_size, pos = _read_varint(data, 0)
+    new_size, pos = _read_varint(data, pos)
+    if base_size != len(base):
+        raise DeltaError(f"Delta is for a {base_size}-byte base image, not {len(base)} bytes")
+    out = bytearray()
+    while pos < len(data):
+        op = data[pos]
+        pos += 1
+        if op == LITERAL:
+            length, pos = _read_varint(data, pos)
+            if pos + length > len(data):
+                raise DeltaError("Truncated delta")
+            out += data[pos: pos + length]
+            pos += length
+        elif op == COPY:
+            offset, pos = _read_varint(data, pos)
+            length, pos = _read_varint(data, pos)
+            if offset + length > len(base):
+                raise DeltaError("Delta copies past the end of the base image")
+            out += base[offset: offset + length]
+        else:
+            raise DeltaError(f"Unknown delta op {op}")
+    if len(out) != new_size:
+        raise DeltaError(f"Delta produced {len(out)} bytes, expected {new_size}")
+    return bytes(out)
@@ -0,0 +1,54 @@
+"""The OTA protocol between the server and a device
+
+A device answers four requests under its OTA base URL, http://<ip>/ota
+(simulated devices: /api/simulator/devices/<id>/ota):
+
+    GET  /ota                        {"firmware_sha256": ..., "transfer": {"id", "offset"} | null}
+    POST /ota                        start or resume a transfer; returns {"offset"}
+         {"id", "size", "sha256", "base_sha256", "target_sha256"}
+    PUT  /ota/<id>/chunks?offset=N   raw chunk bytes with an X-Chunk-CRC32 header; returns {"offset"}
+    POST /ota/<id>/apply             patch, verify and boot; returns {"firmware_sha256"}
+
+A transfer carries a delta (delta.py) from the image the device runs,
+base_sha256, to target_sha256; a null base means the delta is a whole
+image. The device keeps what it has received, so an interrupted
+transfer resumes from its offset. Errors:
+
+    409  chunk at another offset than the device expects; body has "offset"
+    422  chunk failed its CRC32, resend it
+    400  transfer refused (wrong base, bad delta, ...)
+    5xx, timeouts  the link; retry
+"""
+
+import zlib
+
+
+CHUNK_CRC_HEADER = "X-Chunk-CRC32"
+
+
+def chunk_crc(data: bytes) -> str:
+    return f"{zlib.crc32(data):08x}"
+
+
+class OTAError(Exception):
+    """An OTA update that failed"""
+
+
+class DeviceRejected(OTAError):
+    """The device refused the update; resending will not help"""
+
+
+class LinkError(OTAError):
+    """A request that was lost, or whose answer was; safe to retry"""
+
+
+class ChunkCorrupted(LinkError):
+    """A chunk that arrived damaged"""
+
+
+class OffsetMismatch(OTAError):
+    """A chunk sent at another offset than the device expects"""
+
+    def __init__(self, expected: int):
+        super().__init__(f"Device expects offset {expected}")
+        self.expected = expected
@@ -0,0 +1,140 @@
+"""Simulated devices that take OTA updates
+
+Each device registered with device_type "simulator" gets an in-memory
+firmware image and OTA receiver here, served over HTTP by
+/api/simulator and called directly by updates pushed to it. A failure
+rate makes the simulated Wi-Fi lose requests, lose acknowledgements
+after a chunk was stored, and corrupt chunks in flight, which is what
+the resume and retry paths are for.
+"""
+
+import hashlib
+import random
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.services.ota.delta import DeltaError, apply_delta
+from app.services.ota.protocol import (
+    ChunkCorrupted, DeviceRejected, LinkError, OffsetMismatch, chunk_crc,
+)
+
+
+@dataclass
+class _Transfer:
+    id: str
+    size: int
+    sha256: str
+    base_sha256: Optional[str]
+    target_sha256: str
+    data: bytearray = field(default_factory=bytearray)
+
+
+class SimulatedDevice:
+    def __init__(self, device_id: int, failure_rate: float = 0.0):
+        self.device_id = device_id
+        self.failure_rate = failure_rate
+        self.firmware = b""
+        self.transfer: Optional[_Transfer] = None
+        self.applied: Optional[str] = None  # id of the last applied transfer
+        self.bytes_received = 0
+        self._random = random.Random(device_id)
+
+    @property
+    def firmware_sha256(self) -> Optional[str]:
+        return hashlib.sha256(self.firmware).hexdigest() if self.firmware else None
+
+    def _link(self) -> None:
+        if self.failure_rate and self._random.random() < self.failure_rate:
+            raise LinkError("Simulated Wi-Fi dropout")
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "device_id": self.device_id,
+            "firmware_sha256": self.firmware_sha256,
+            "firmware_size": len(self.firmware),
+            "failure_rate": self.failure_rate,
+            "bytes_received": self.bytes_received,
+        }
+
+    def status(self) -> Dict[str, Any]:
+        self._link()
+        transfer = self.transfer
+        return {
+            "firmware_sha256": self.firmware_sha256,
+            "transfer": {"id": transfer.id, "offset": len(transfer.data)} if transfer else None,
+        }
+
+    def begin(
+        self, transfer_id: str, size: int, sha256: str, base_sha256: Optional[str], target_sha256: str
+    ) -> int:
+        self._link()
+        if base_sha256 is not None and base_sha256 != self.firmware_sha256:
+            raise DeviceRejected("Transfer is a delta from another firmware image")
+        if self.transfer is None or self.transfer.id != transfer_id:
+            self.transfer = _Transfer(transfer_id, size, sha256, base_sha256, target_sha256)
+        return len(self.transfer.data)
+
+    def _current(self, transfer_id: str) -> _Transfer:
+        if self.transfer is None or self.transfer.id != transfer_id:
+            raise DeviceRejected("No such transfer in progress")
+        return self.transfer
+
+    def receive(self, transfer_id: str, offset: int, data: bytes, crc: str) -> int:
+        self._link()
+        transfer = self._current(transfer_id)
+        if offset != len(transfer.data):
+            raise OffsetMismatch(len(transfer.data))
+        if self.failure_rate and self._random.random() < self.failure_rate:
+            data = bytes([data[0] ^ 0xFF]) + data[1:] if data else data
+        if chunk_crc(data) != crc:
+            raise ChunkCorrupted("Chunk checksum mismatch")
+        if offset + len(data) > transfer.size:
+            raise DeviceRejected("Chunk runs past the end of the transfer")
+        transfer.data += data
+        self.bytes_received += len(data)
+        # Stored, but the acknowledgement can still be lost
+        self._link()
+        return len(transfer.data)
+
+    def apply(self, transfer_id: str) -> Optional[str]:
+        self._link()
+        if self.transfer is None and self.applied == transfer_id:
+            # Repeated because the first answer was lost
+            return self.firmware_sha256
+        transfer = self._current(transfer_id)
+        if len(transfer.data) != transfer.size:
+            raise DeviceRejected(f"Transfer has {len(transfer.data)} of {transfer.size} bytes")
+        self.transfer = None
+        if hashlib.sha256(transfer.data).hexdigest() != transfer.sha256:
+            raise DeviceRejected("Transfer checksum mismatch")
+        base = self.firmware if transfer.base_sha256 is not None else b""
+        try:
+            image = apply_delta(base, bytes(transfer.data))
+        except DeltaError as e:
+            raise DeviceRejected(str(e))
+        if hashlib.sha256(image).hexdigest() != transfer.target_sha256:
+            raise DeviceRejected("Patched image does not match the target")
+        self.firmware = image
+        self.applied = transfer_id
+        self._link()
+        return self.firmware_sha256
+
+
+class DeviceSimulator:
+    def __init__(self):
+        self._devices: Dict[int, SimulatedDevice] = {}
+
+    def get(self, device_id: int) -> SimulatedDevice:
+        device = self._devices.get(device_id)
+        if device is None:
+            device = self._devices[device_id] = SimulatedDevice(
+                device_id, settings.DEVICE_SIMULATOR_FAILURE_RATE
+            )
+        return device
+
+    def remove(self, device_id: int) -> None:
+        self._devices.pop(device_id, None)
+
+
+simulator = DeviceSimulator()
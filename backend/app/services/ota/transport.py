@@ -0,0 +1,126 @@
+"""How OTA requests reach a device: HTTP, or in process for simulators"""
+
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+
+import httpx
+
+from app.core.config import settings
+from app.models import Device, DeviceType
+from app.services.ota.protocol import (
+    CHUNK_CRC_HEADER, ChunkCorrupted, DeviceRejected, LinkError, OffsetMismatch, chunk_crc,
+)
+from app.services.ota.simulator import SimulatedDevice, simulator
+
+
+class Transport(ABC):
+    @abstractmethod
+    async def status(self) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    async def begin(
+        self, transfer_id: str, size: int, sha256: str, base_sha256: Optional[str], target_sha256: str
+    ) -> int:
+        ...
+
+    @abstractmethod
+    async def send_chunk(self, transfer_id: str, offset: int, data: bytes) -> int:
+        ...
+
+    @abstractmethod
+    async def apply(self, transfer_id: str) -> Optional[str]:
+        ...
+
+
+class SimulatedTransport(Transport):
+    def __init__(self, device: SimulatedDevice):
+        self.device = device
+
+    async def _network(self) -> None:
+        # Yields even without latency, so pushes to many devices interleave
+        await asyncio.sleep(settings.DEVICE_SIMULATOR_LATENCY_MS / 1000)
+
+    async def status(self):
+        await self._network()
+        return self.device.status()
+
+    async def begin(self, transfer_id, size, sha256, base_sha256, target_sha256):
+        await self._network()
+        return self.device.begin(transfer_id, size, sha256, base_sha256, target_sha256)
+
+    async def send_chunk(self, transfer_id, offset, data):
+        await self._network()
+        return self.device.receive(transfer_id, offset, data, chunk_crc(data))
+
+    async def apply(self, transfer_id):
+        await self._network()
+        return self.device.apply(transfer_id)
+
+
+class HttpTransport(Transport):
+    def __init__(self, client: httpx.AsyncClient, base_url: str):
+        self.client = client
+        self.base_url = base_url
+
+    async def _request(self, method: str, path: str = "", **kwargs) -> Dict[str, Any]:
+        try:
+            response = await self.client.request(method, self.base_url + path, **kwargs)
+        except httpx.TransportError as e:
+            raise LinkError(f"{e.__class__.__name__}: {e}")
+        try:
+            body = response.json()
+        except ValueError:
+            body = {}
+        if response.status_code >= 500 or response.status_code == 429:
+            raise LinkError(f"Device answered {response.status_code}")
+        if not isinstance(body, dict):
+            raise DeviceRejected(f"Device answered {response.status_code} with a non-object body")
+        detail = body.get("detail")
+        if response.status_code == 409 and isinstance(body.get("offset"), int):
+            raise OffsetMismatch(body["offset"])
+        if response.status_code == 422:
+            raise ChunkCorrupted(detail or "Chunk checksum mismatch")
+        if response.status_code >= 400:
+            raise DeviceRejected(detail or f"Device answered {response.status_code}")
+        return body
+
+    async def status(self):
+        return await self._request("GET")
+
+    async def begin(self, transfer_id, size, sha256, base_sha256, target_sha256):
+        body = await self._request(
+            "POST",
+            json={
+                "id": transfer_id,
+                "size": size,
+                "sha256": sha256,
+                "base_sha256": base_sha256,
+                "target_sha256": target_sha256,
+            },
+        )
+        return int(body["offset"])
+
+    async def send_chunk(self, transfer_id, offset, data):
+        body = await self._request(
+            "PUT",
+            f"/{transfer_id}/chunks",
+            params={"offset": offset},
+            content=data,
+            headers={CHUNK_CRC_HEADER: chunk_crc(data)},
+        )
+        return int(body["offset"])
+
+    async def apply(self, transfer_id):
+        body = await self._request("POST", f"/{transfer_id}/apply")
+        return body.get("firmware_sha256")
+
+
+def transport_for(device: Device, client: httpx.AsyncClient) -> Transport:
+    if device.device_type == DeviceType.SIMULATOR:
+        return SimulatedTransport(simulator.get(device.id))
+    if not device.ip_address:
+        raise DeviceRejected("Device has no IP address to send the update to")
+    host = f"[{device.ip_address}]" if ":" in device.ip_address else device.ip_address
+    return HttpTransport(client, f"http://{host}/ota")
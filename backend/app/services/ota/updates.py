@@ -0,0 +1,157 @@
+"""Pushing firmware images to devices
+
+Uploaded images are stored by SHA-256 under FIRMWARE_STORAGE_DIR/images,
+so the server knows every image it has ever sent. A device reports the
+hash of the image it runs; when that image is known, only a delta from
+it is sent, otherwise a delta from nothing (the whole image, compressed).
+Deltas are computed once per (base, target) pair and cached on disk next
+to the images, however many devices need them.
+
+The delta goes out in OTA_CHUNK_SIZE chunks, each with a CRC32. Lost
+requests, lost acknowledgements and corrupted chunks are retried with
+backoff; after an offset mismatch the sender continues from whatever
+offset the device says it has. The transfer id is derived from the base
+and target, so a later push of the same update resumes the transfer
+instead of starting over.
+"""
+
+import asyncio
+import hashlib
+import os
+import uuid
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import aiofiles
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.services.ota.delta import make_delta
+from app.services.ota.protocol import DeviceRejected, LinkError, OffsetMismatch
+from app.services.ota.transport import Transport
+
+
+RETRY_DELAY_SECONDS = 0.05
+MAX_RETRY_DELAY_SECONDS = 2.0
+
+
+@dataclass(frozen=True)
+class Delta:
+    path: str
+    size: int
+    sha256: str
+
+
+def firmware_version(sha256: str) -> str:
+    """Version recorded on devices running an uploaded image"""
+    return sha256[:16]
+
+
+def image_path(sha256: str) -> str:
+    return os.path.join(settings.FIRMWARE_STORAGE_DIR, "images", f"{sha256}.bin")
+
+
+def _delta_path(base: Optional[str], target: str) -> str:
+    return os.path.join(settings.FIRMWARE_STORAGE_DIR, "deltas", f"{base or 'empty'}-{target}.delta")
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    staging = f"{path}.tmp-{uuid.uuid4().hex}"
+    with open(staging, "wb") as f:
+        f.write(data)
+    os.replace(staging, path)
+
+
+def store_image(data: bytes) -> str:
+    """Keep an uploaded image; returns its SHA-256"""
+    sha256 = hashlib.sha256(data).hexdigest()
+    if not os.path.exists(image_path(sha256)):
+        _write_atomic(image_path(sha256), data)
+    return sha256
+
+
+def _build_delta(base: Optional[str], target: str) -> Delta:
+    path = _delta_path(base, target)
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            delta = f.read()
+    else:
+        old = b""
+        if base:
+            with open(image_path(base), "rb") as f:
+                old = f.read()
+        with open(image_path(target), "rb") as f:
+            new = f.read()
+        delta = make_delta(old, new, settings.OTA_DELTA_BLOCK_SIZE)
+        _write_atomic(path, delta)
+    return Delta(path, len(delta), hashlib.sha256(delta).hexdigest())
+
+
+_deltas: Dict[Tuple[Optional[str], str], "asyncio.Future[Delta]"] = {}
+
+
+async def delta_for(base: Optional[str], target: str) -> Delta:
+    """The delta from base (None = nothing) to target, built once for all callers"""
+    key = (base, target)
+    future = _deltas.get(key)
+    if future is None or (future.done() and future.exception() is not None):
+        future = _deltas[key] = asyncio.ensure_future(run_in_threadpool(_build_delta, base, target))
+    return await asyncio.shield(future)
+
+
+async def _retry(call: Callable[..., Awaitable[Any]], *args, counter: Dict[str, int]) -> Any:
+    for attempt in range(settings.OTA_RETRIES + 1):
+        try:
+            return await call(*args)
+        except LinkError:
+            if attempt == settings.OTA_RETRIES:
+                raise
+            counter["retries"] += 1
+            await asyncio.sleep(min(RETRY_DELAY_SECONDS * 2 ** attempt, MAX_RETRY_DELAY_SECONDS))
+
+
+async def push_firmware(
+    transport: Transport, target: str, progress: Callable[[int, int], None]
+) -> Dict[str, Any]:
+    """Bring one device to the target image; progress(done, total) gets bytes of the delta
+
+    Raises an OTAError when the device refuses the update or stays
+    unreachable through all retries.
+    """
+    counter = {"retries": 0}
+    status = await _retry(transport.status, counter=counter)
+    current = status.get("firmware_sha256")
+    report = {"status": "up_to_date", "base_sha256": current, "delta_bytes": 0, "bytes_sent": 0}
+    if current == target:
+        progress(1, 1)
+        return {**report, **counter}
+
+    base = current if current and os.path.exists(image_path(current)) else None
+    delta = await delta_for(base, target)
+    transfer_id = f"{(base or 'full')[:16]}-{target[:16]}"
+    offset = await _retry(
+        transport.begin, transfer_id, delta.size, delta.sha256, base, target, counter=counter
+    )
+    sent = mismatches = 0
+    async with aiofiles.open(delta.path, "rb") as f:
+        while offset < delta.size:
+            progress(offset, delta.size)
+            await f.seek(offset)
+            chunk = await f.read(settings.OTA_CHUNK_SIZE)
+            try:
+                offset = await _retry(transport.send_chunk, transfer_id, offset, chunk, counter=counter)
+                sent += len(chunk)
+                mismatches = 0
+            except OffsetMismatch as e:
+                # Usually a chunk whose acknowledgement was lost: the device has it already
+                mismatches += 1
+                if mismatches > settings.OTA_RETRIES or not 0 <= e.expected <= delta.size:
+                    raise DeviceRejected(f"Device keeps expecting offset {e.expected}")
+                offset = e.expected
+    progress(delta.size, delta.size)
+
+    running = await _retry(transport.apply, transfer_id, counter=counter)
+    if running != target:
+        raise DeviceRejected("Device runs another image after applying the update")
+    return {**report, "status": "updated", "delta_bytes": delta.size, "bytes_sent": sent, **counter}
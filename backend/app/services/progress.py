@@ -0,0 +1,130 @@
+"""Learning progress service - aggregate counters for tutorials and XP"""
+
+import time
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.lazy import lazy_import
+from app.models import Tutorial, UserProgress, UserStats
+
+
+# Only the dialect the app actually runs on gets imported
+_UPSERT_DIALECTS = {
+    "sqlite": lazy_import("sqlalchemy.dialects.sqlite"),
+    "postgresql": lazy_import("sqlalchemy.dialects.postgresql"),
+}
+
+
+class PublishedTutorialCounter:
+    """Caches the number of published tutorials for a short period"""
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._count: Optional[int] = None
+        self._expires_at = 0.0
+
+    async def get(self, db: AsyncSession) -> int:
+        now = time.monotonic()
+        if self._count is None or now >= self._expires_at:
+            result = await db.execute(
+                select(func.count()).select_from(Tutorial).where(Tutorial.is_published == True)
+            )
+            self._count = result.scalar_one()
+            self._expires_at = now + self.ttl_seconds
+        return self._count
+
+    def invalidate(self) -> None:
+        self._count = None
+
+
+published_tutorials = PublishedTutorialCounter(settings.TUTORIAL_COUNT_CACHE_SECONDS)
+
+
+async def get_user_stats(db: AsyncSession, user_id: int) -> UserStats:
+    """Return the stats row for a user, or empty stats if they have none yet"""
+    stats = await db.get(UserStats, user_id)
+    if stats is None:
+        # Not added to the session: rows are only written by record_completion
+        stats = UserStats(user_id=user_id, completed_count=0, total_xp=0)
+    return stats
+
+
+async def _ensure_user_stats(db: AsyncSession, user_id: int) -> None:
+    """Create an empty stats row unless one exists, safe against concurrent callers"""
+    dialect = _UPSERT_DIALECTS.get(db.bind.dialect.name)
+    if dialect is not None:
+        await db.execute(
+            dialect.insert(UserStats)
+            .values(user_id=user_id, completed_count=0, total_xp=0)
+            .on_conflict_do_nothing(index_elements=[UserStats.user_id])
+        )
+    elif await db.get(UserStats, user_id) is None:
+        db.add(UserStats(user_id=user_id, completed_count=0, total_xp=0))
+        await db.flush()
+
+
+async def mark_completed(
+    db: AsyncSession, user_id: int, tutorial_id: int, xp: int, completed_at: datetime
+) -> bool:
+    """Mark a tutorial completed for a user; False if it already was
+
+    A single upsert that only touches rows not yet completed, so of two
+    concurrent completions exactly one returns True.
+    """
+    values = {"completed": True, "completed_at": completed_at, "xp_earned": xp}
+    dialect = _UPSERT_DIALECTS.get(db.bind.dialect.name)
+    if dialect is not None:
+        stmt = dialect.insert(UserProgress).values(
+            user_id=user_id, tutorial_id=tutorial_id, **values
+        )
+        result = await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[UserProgress.user_id, UserProgress.tutorial_id],
+                set_=values,
+                where=UserProgress.completed == False,
+            ).returning(UserProgress.id)
+        )
+        return result.first() is not None
+
+    result = await db.execute(
+        update(UserProgress)
+        .where(
+            UserProgress.user_id == user_id,
+            UserProgress.tutorial_id == tutorial_id,
+            UserProgress.completed == False,
+        )
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount:
+        return True
+    existing = await db.execute(
+        select(UserProgress.id).where(
+            UserProgress.user_id == user_id, UserProgress.tutorial_id == tutorial_id
+        )
+    )
+    if existing.first() is not None:
+        return False
+    db.add(UserProgress(user_id=user_id, tutorial_id=tutorial_id, **values))
+    await db.flush()
+    return True
+
+
+async def record_completion(
+    db: AsyncSession, user_id: int, xp: int, completed_at: datetime
+) -> None:
+    """Add a completed tutorial to the user's stats in the current transaction"""
+    await _ensure_user_stats(db, user_id)
+    await db.execute(
+        update(UserStats)
+        .where(UserStats.user_id == user_id)
+        .values(
+            completed_count=UserStats.completed_count + 1,
+            total_xp=UserStats.total_xp + xp,
+            last_completed_at=completed_at,
+        )
+    )
@@ -0,0 +1,209 @@
+"""Project revision service - keyframe + delta history of Blockly workspaces"""
+
+import json
+import re
+import zlib
+from difflib import SequenceMatcher
+from typing import List, Optional, Tuple
+
+from sqlalchemy import select, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.core.config import settings
+from app.models import Project, ProjectRevision
+from app.services.blob_store import add_reference, release_blob
+
+
+# Split XML into tags and the text between them; joining the tokens
+# always reproduces the input exactly
+_TOKEN_RE = re.compile(r"<[^>]*>?|[^<]+")
+
+Opcode = Tuple[str, int, int, int, int]
+
+
+def tokenize(xml: str) -> List[str]:
+    return _TOKEN_RE.findall(xml)
+
+
+def diff_opcodes(old: List[str], new: List[str]) -> List[Opcode]:
+    """SequenceMatcher opcodes, computed only over the changed middle section
+
+    Editor saves usually touch a few blocks, so trimming the common prefix
+    and suffix first keeps this close to linear in the workspace size.
+    """
+    prefix = 0
+    limit = min(len(old), len(new))
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    limit -= prefix
+    while suffix < limit and old[-1 - suffix] == new[-1 - suffix]:
+        suffix += 1
+
+    opcodes: List[Opcode] = []
+    if prefix:
+        opcodes.append(("equal", 0, prefix, 0, prefix))
+    old_mid = old[prefix:len(old) - suffix]
+    new_mid = new[prefix:len(new) - suffix]
+    if old_mid or new_mid:
+        matcher = SequenceMatcher(None, old_mid, new_mid, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            opcodes.append((tag, i1 + prefix, i2 + prefix, j1 + prefix, j2 + prefix))
+    if suffix:
+        opcodes.append(
+            ("equal", len(old) - suffix, len(old), len(new) - suffix, len(new))
+        )
+    return opcodes
+
+
+def make_delta(old: str, new: str) -> bytes:
+    """Encode new as copy/insert operations against old's tokens"""
+    old_tokens, new_tokens = tokenize(old), tokenize(new)
+    ops = []
+    for tag, i1, i2, j1, j2 in diff_opcodes(old_tokens, new_tokens):
+        if tag == "equal":
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append("".join(new_tokens[j1:j2]))
+    return zlib.compress(json.dumps(ops, separators=(",", ":")).encode("utf-8"))
+
+
+def apply_delta(old: str, delta: bytes) -> str:
+    old_tokens = tokenize(old)
+    parts = []
+    for op in json.loads(zlib.decompress(delta)):
+        if isinstance(op, str):
+            parts.append(op)
+        else:
+            parts.append("".join(old_tokens[op[0]:op[1]]))
+    return "".join(parts)
+
+
+def diff_changes(old: Optional[str], new: Optional[str]) -> List[dict]:
+    """Describe the token ranges that differ between two workspaces"""
+    old_tokens, new_tokens = tokenize(old or ""), tokenize(new or "")
+    return [
+        {
+            "op": tag,
+            "old_start": i1,
+            "old_end": i2,
+            "new_start": j1,
+            "new_end": j2,
+            "old": "".join(old_tokens[i1:i2]),
+            "new": "".join(new_tokens[j1:j2]),
+        }
+        for tag, i1, i2, j1, j2 in diff_opcodes(old_tokens, new_tokens)
+        if tag != "equal"
+    ]
+
+
+async def record_revision(
+    db: AsyncSession,
+    project: Project,
+    old_blocks: Optional[str],
+    new_blocks: Optional[str],
+) -> Optional[ProjectRevision]:
+    """Append a revision for a blocks change, in the caller's transaction
+
+    project.blocks_hash must already point at the blob holding new_blocks.
+    old_blocks is the content of the latest revision (the blocks before the
+    change), which is what deltas are computed against. The caller must
+    already have written the project row in this transaction (holding its
+    lock), otherwise concurrent saves can take the same revision number.
+    """
+    result = await db.execute(
+        select(func.max(ProjectRevision.revision)).where(
+            ProjectRevision.project_id == project.id
+        )
+    )
+    latest = result.scalar_one() or 0
+    if latest and old_blocks == new_blocks:
+        return None
+
+    number = latest + 1
+    revision = ProjectRevision(
+        project_id=project.id,
+        revision=number,
+        size=len(new_blocks.encode("utf-8")) if new_blocks is not None else 0,
+    )
+    interval = settings.REVISION_KEYFRAME_INTERVAL
+    if (
+        latest == 0
+        or (number - 1) % interval == 0
+        or old_blocks is None
+        or new_blocks is None
+    ):
+        revision.is_keyframe = True
+        revision.blob_hash = project.blocks_hash
+        await add_reference(db, project.blocks_hash)
+    else:
+        revision.delta = make_delta(old_blocks, new_blocks)
+    db.add(revision)
+    return revision
+
+
+async def list_revisions(
+    db: AsyncSession, project_id: int, skip: int, limit: int
+) -> List[ProjectRevision]:
+    result = await db.execute(
+        select(ProjectRevision)
+        .where(ProjectRevision.project_id == project_id)
+        .order_by(ProjectRevision.revision.desc())
+        .offset(skip)
+        .limit(limit)
+    )
+    return result.scalars().all()
+
+
+async def load_revision(
+    db: AsyncSession, project_id: int, number: int
+) -> Tuple[Optional[ProjectRevision], Optional[str]]:
+    """Rebuild a revision's blocks from its nearest keyframe
+
+    Keyframes are written at least every REVISION_KEYFRAME_INTERVAL
+    revisions, so one bounded query always reaches one.
+    """
+    result = await db.execute(
+        select(ProjectRevision)
+        .options(selectinload(ProjectRevision.blob))
+        .where(
+            ProjectRevision.project_id == project_id,
+            ProjectRevision.revision <= number,
+        )
+        .order_by(ProjectRevision.revision.desc())
+        .limit(settings.REVISION_KEYFRAME_INTERVAL)
+    )
+    chain = []
+    for revision in result.scalars():
+        chain.append(revision)
+        if revision.is_keyframe:
+            break
+    if not chain or chain[0].revision != number or not chain[-1].is_keyframe:
+        return None, None
+
+    keyframe = chain.pop()
+    blocks = keyframe.blob.text if keyframe.blob is not None else None
+    for revision in reversed(chain):
+        blocks = apply_delta(blocks, revision.delta)
+    return (chain[0] if chain else keyframe), blocks
+
+
+async def delete_revisions(db: AsyncSession, project_id: int) -> None:
+    """Remove a project's history and release its keyframe blobs"""
+    result = await db.execute(
+        select(ProjectRevision.blob_hash, func.count())
+        .where(
+            ProjectRevision.project_id == project_id,
+            ProjectRevision.blob_hash.is_not(None),
+        )
+        .group_by(ProjectRevision.blob_hash)
+    )
+    keyframe_refs = result.all()
+    await db.execute(
+        delete(ProjectRevision)
+        .where(ProjectRevision.project_id == project_id)
+        .execution_options(synchronize_session=False)
+    )
+    for blob_hash, count in keyframe_refs:
+        await release_blob(db, blob_hash, count)
@@ -0,0 +1,256 @@
+"""Search service - full-text index over projects, tutorials and AI models"""
+
+import re
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+from sqlalchemy import String, cast, event, inspect, or_, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models import Project, Tutorial, AIModel
+
+
+SEARCH_KINDS = ("project", "tutorial", "model")
+
+
+@dataclass
+class SearchDocument:
+    kind: str
+    ref_id: int
+    title: str
+    body: str
+    owner_id: Optional[int]
+    is_public: bool
+
+
+@dataclass
+class SearchHit:
+    kind: str
+    ref_id: int
+    title: str
+    snippet: str
+    score: float
+
+
+def project_document(project: Project) -> SearchDocument:
+    tags = " ".join(project.tags or [])
+    return SearchDocument(
+        kind="project",
+        ref_id=project.id,
+        title=project.name,
+        body=f"{project.description or ''} {tags}",
+        owner_id=project.owner_id,
+        is_public=bool(project.is_public),
+    )
+
+
+def tutorial_document(tutorial: Tutorial) -> SearchDocument:
+    return SearchDocument(
+        kind="tutorial",
+        ref_id=tutorial.id,
+        title=tutorial.title,
+        body=f"{tutorial.description or ''} {tutorial.content or ''}",
+        owner_id=None,
+        is_public=bool(tutorial.is_published),
+    )
+
+
+def model_document(model: AIModel) -> SearchDocument:
+    return SearchDocument(
+        kind="model",
+        ref_id=model.id,
+        title=model.name,
+        body=model.description or "",
+        owner_id=model.owner_id,
+        is_public=bool(model.is_public),
+    )
+
+
+class SearchBackend(ABC):
+    """Interface for full-text search backends
+
+    Index maintenance runs on the flushing connection, inside the same
+    transaction as the row change that triggered it.
+    """
+
+    def upsert(self, conn: Connection, document: SearchDocument) -> None:
+        pass
+
+    def remove(self, conn: Connection, kind: str, ref_id: int) -> None:
+        pass
+
+    @abstractmethod
+    async def search(
+        self,
+        db: AsyncSession,
+        query: str,
+        kinds: Sequence[str],
+        user_id: Optional[int],
+        skip: int,
+        limit: int,
+    ) -> List[SearchHit]:
+        ...
+
+
+class SQLiteFTS5Backend(SearchBackend):
+    """SQLite FTS5 virtual table ranked with bm25
+
+    The search_index table is created and backfilled by migration 0002.
+    """
+
+    # Kind is packed into the rowid so updates and deletes hit the rowid
+    # b-tree instead of scanning the UNINDEXED columns
+    KIND_CODES = {"project": 1, "tutorial": 2, "model": 3}
+
+    def _rowid(self, kind: str, ref_id: int) -> int:
+        return ref_id * 8 + self.KIND_CODES[kind]
+
+    def upsert(self, conn: Connection, document: SearchDocument) -> None:
+        rowid = self._rowid(document.kind, document.ref_id)
+        conn.execute(text("DELETE FROM search_index WHERE rowid = :rowid"), {"rowid": rowid})
+        conn.execute(
+            text(
+                "INSERT INTO search_index "
+                "(rowid, title, body, kind, ref_id, owner_id, is_public) "
+                "VALUES (:rowid, :title, :body, :kind, :ref_id, :owner_id, :is_public)"
+            ),
+            {
+                "rowid": rowid,
+                "title": document.title,
+                "body": document.body,
+                "kind": document.kind,
+                "ref_id": document.ref_id,
+                "owner_id": document.owner_id,
+                "is_public": int(document.is_public),
+            },
+        )
+
+    def remove(self, conn: Connection, kind: str, ref_id: int) -> None:
+        conn.execute(
+            text("DELETE FROM search_index WHERE rowid = :rowid"),
+            {"rowid": self._rowid(kind, ref_id)},
+        )
+
+    async def search(self, db, query, kinds, user_id, skip, limit):
+        match = build_match_query(query)
+        if not match:
+            return []
+        params = {"match": match, "user_id": user_id, "skip": skip, "limit": limit}
+        kind_params = {f"kind{i}": kind for i, kind in enumerate(kinds)}
+        params.update(kind_params)
+        result = await db.execute(
+            text(
+                "SELECT kind, ref_id, title, "
+                "snippet(search_index, 1, '<b>', '</b>', '…', 12) AS snippet, "
+                "bm25(search_index, 10.0, 1.0) AS score "
+                "FROM search_index WHERE search_index MATCH :match "
+                f"AND kind IN ({', '.join(':' + name for name in kind_params)}) "
+                "AND (is_public = 1 OR (kind = 'project' AND owner_id = :user_id)) "
+                "ORDER BY score LIMIT :limit OFFSET :skip"
+            ),
+            params,
+        )
+        return [
+            SearchHit(
+                kind=row.kind,
+                ref_id=row.ref_id,
+                title=row.title,
+                snippet=row.snippet,
+                score=-row.score,
+            )
+            for row in result
+        ]
+
+
+class LikeSearchBackend(SearchBackend):
+    """Unindexed LIKE fallback for databases without a full-text backend"""
+
+    async def search(self, db, query, kinds, user_id, skip, limit):
+        terms = re.findall(r"\w+", query)
+        if not terms:
+            return []
+        hits: List[SearchHit] = []
+        sources = {
+            "project": (
+                Project,
+                Project.name,
+                # Tags are indexed by the FTS5 backend too; match their JSON text
+                [Project.description, cast(Project.tags, String)],
+                or_(Project.is_public == True, Project.owner_id == user_id),
+            ),
+            "tutorial": (
+                Tutorial,
+                Tutorial.title,
+                [Tutorial.description, Tutorial.content],
+                Tutorial.is_published == True,
+            ),
+            "model": (AIModel, AIModel.name, [AIModel.description], AIModel.is_public == True),
+        }
+        for kind in kinds:
+            model, title, body_columns, visible = sources[kind]
+            # Every term must appear in at least one searchable column
+            conditions = [
+                or_(*[column.ilike(f"%{term}%") for column in [title, *body_columns]])
+                for term in terms
+            ]
+            result = await db.execute(
+                select(model.id, title).where(visible, *conditions).limit(skip + limit)
+            )
+            hits.extend(
+                SearchHit(kind=kind, ref_id=row[0], title=row[1], snippet="", score=0.0)
+                for row in result
+            )
+        return hits[skip:skip + limit]
+
+
+def build_match_query(query: str) -> str:
+    """Turn free text into an FTS5 query of quoted prefix terms (implicit AND)"""
+    terms = re.findall(r"\w+", query)
+    return " ".join(f'"{term}"*' for term in terms[:16])
+
+
+def _select_backend() -> SearchBackend:
+    backend = settings.SEARCH_BACKEND
+    if backend == "auto":
+        backend = "fts5" if settings.DATABASE_URL.startswith("sqlite") else "like"
+    if backend == "fts5":
+        return SQLiteFTS5Backend()
+    return LikeSearchBackend()
+
+
+search_backend = _select_backend()
+
+
+# Incremental index maintenance
+
+_DOCUMENT_BUILDERS = {
+    Project: (project_document, ("name", "description", "tags", "is_public")),
+    Tutorial: (tutorial_document, ("title", "description", "content", "is_published")),
+    AIModel: (model_document, ("name", "description", "is_public")),
+}
+
+
+def _index_after_insert(mapper, connection, target):
+    build, _ = _DOCUMENT_BUILDERS[mapper.class_]
+    search_backend.upsert(connection, build(target))
+
+
+def _index_after_update(mapper, connection, target):
+    build, fields = _DOCUMENT_BUILDERS[mapper.class_]
+    state = inspect(target)
+    if any(state.attrs[field].history.has_changes() for field in fields):
+        search_backend.upsert(connection, build(target))
+
+
+def _index_after_delete(mapper, connection, target):
+    build, _ = _DOCUMENT_BUILDERS[mapper.class_]
+    search_backend.remove(connection, build(target).kind, target.id)
+
+
+for _model in _DOCUMENT_BUILDERS:
+    event.listen(_model, "after_insert", _index_after_insert)
+    event.listen(_model, "after_update", _index_after_update)
+    event.listen(_model, "after_delete", _index_after_delete)
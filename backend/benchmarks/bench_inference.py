@@ -0,0 +1,122 @@
+"""Benchmark micro-batched against per-request model inference
+
+Builds a small synthetic conv net, then fires bursts of concurrent
+single-sample requests through two paths:
+
+  * unbatched - one forward pass per request in the inference pool
+  * batched   - the MicroBatcher used by /ai-models/{id}/test
+
+and reports throughput plus the latency of a lone request on an idle
+model, which batching must not make worse.
+
+Usage (from backend/):
+    python -m benchmarks.bench_inference --concurrency 64 --bursts 20
+"""
+
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+
+import numpy as np
+
+from app.services.ml.batching import MicroBatcher, inference_executor
+from app.services.ml.engine import load_model, save_model
+
+
+def make_model(path: str, size: int, channels: int, classes: int):
+    rng = np.random.default_rng(0)
+    pooled = (size // 2) * (size // 2) * channels
+    save_model(
+        path,
+        {
+            "task": "classification",
+            "input_shape": [size, size, 1],
+            "labels": [f"class_{i}" for i in range(classes)],
+            "layers": [
+                {"type": "conv2d", "weights": "c1.w.npy", "bias": "c1.b.npy",
+                 "padding": "same", "activation": "relu"},
+                {"type": "maxpool2d", "size": 2},
+                {"type": "flatten"},
+                {"type": "dense", "weights": "d1.w.npy", "bias": "d1.b.npy",
+                 "activation": "relu"},
+                {"type": "dense", "weights": "d2.w.npy", "bias": "d2.b.npy",
+                 "activation": "softmax"},
+            ],
+        },
+        {
+            "c1.w.npy": rng.normal(0, 0.1, (3, 3, 1, channels)).astype(np.float32),
+            "c1.b.npy": np.zeros(channels, np.float32),
+            "d1.w.npy": rng.normal(0, 0.01, (pooled, 128)).astype(np.float32),
+            "d1.b.npy": np.zeros(128, np.float32),
+            "d2.w.npy": rng.normal(0, 0.1, (128, classes)).astype(np.float32),
+            "d2.b.npy": np.zeros(classes, np.float32),
+        },
+    )
+    return load_model(path)
+
+
+async def run(concurrency: int, bursts: int, size: int, max_batch: int, delay_ms: float) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        model = make_model(directory, size, 16, 10)
+        sample = np.random.default_rng(1).random((1, size, size, 1), dtype=np.float32)
+        loop = asyncio.get_running_loop()
+        executor = inference_executor()
+
+        async def unbatched():
+            return await loop.run_in_executor(executor, model.predict, sample)
+
+        batcher = MicroBatcher(model, max_batch=max_batch, max_delay=delay_ms / 1000, slots=2)
+
+        async def batched():
+            return await batcher.predict(sample)
+
+        results = {}
+        for name, call in (("unbatched", unbatched), ("batched", batched)):
+            await call()  # warm up
+            single = []
+            for _ in range(20):
+                start = time.perf_counter()
+                await call()
+                single.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            for _ in range(bursts):
+                await asyncio.gather(*(call() for _ in range(concurrency)))
+            elapsed = time.perf_counter() - start
+            results[name] = {
+                "throughput_rps": round(concurrency * bursts / elapsed, 1),
+                "single_p50_ms": round(sorted(single)[len(single) // 2] * 1000, 3),
+            }
+        batcher.close()
+
+    results["speedup"] = round(
+        results["batched"]["throughput_rps"] / results["unbatched"]["throughput_rps"], 1
+    )
+    return {
+        "concurrency": concurrency,
+        "bursts": bursts,
+        "input": [size, size, 1],
+        "max_batch": max_batch,
+        "max_delay_ms": delay_ms,
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--bursts", type=int, default=20)
+    parser.add_argument("--size", type=int, default=28, help="input height and width")
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-delay-ms", type=float, default=2.0)
+    args = parser.parse_args()
+    report = asyncio.run(
+        run(args.concurrency, args.bursts, args.size, args.max_batch, args.max_delay_ms)
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
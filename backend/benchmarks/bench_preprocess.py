@@ -0,0 +1,102 @@
+"""Benchmark the image preprocessing pipeline
+
+Encodes synthetic photos as JPEG and preprocesses batches of them for a
+224x224 RGB model three ways:
+
+  * serial    - one image after another, full-size decode (no draft mode)
+  * parallel  - the preprocessing pool with draft-mode decoding
+  * cached    - the same batch again, served from the tensor cache
+
+Usage (from backend/):
+    python -m benchmarks.bench_preprocess --images 32 --width 1920 --height 1080
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import time
+
+import numpy as np
+from PIL import Image
+
+from app.services.ml import images
+from app.services.ml.images import ImageSpec, preprocess_images, tensor_cache
+
+
+def make_images(count: int, width: int, height: int):
+    rng = np.random.default_rng(0)
+    encoded = []
+    for _ in range(count):
+        # Smooth gradients plus noise compress like photos, unlike pure noise
+        base = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+        pixels = base + rng.normal(0, 20, (height, width, 3))
+        buffer = io.BytesIO()
+        Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(buffer, "JPEG", quality=90)
+        encoded.append(buffer.getvalue())
+    return encoded
+
+
+def full_decode(data: bytes, spec: ImageSpec):
+    image = Image.open(io.BytesIO(data)).convert(spec.mode)
+    image = image.resize((spec.width, spec.height), Image.Resampling.BILINEAR)
+    return np.asarray(image, dtype=np.float32) * spec.scale
+
+
+async def run(count: int, width: int, height: int, repeats: int) -> dict:
+    encoded = make_images(count, width, height)
+    spec = ImageSpec(height=224, width=224, channels=3)
+
+    def timed(call):
+        best = float("inf")
+        for _ in range(repeats):
+            tensor_cache.clear()
+            start = time.perf_counter()
+            call()
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    serial = timed(lambda: [full_decode(data, spec) for data in encoded])
+
+    parallel = float("inf")
+    for _ in range(repeats):
+        tensor_cache.clear()
+        start = time.perf_counter()
+        await preprocess_images(encoded, spec)
+        parallel = min(parallel, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await preprocess_images(encoded, spec)
+    cached = time.perf_counter() - start
+
+    def rate(seconds):
+        return round(count / seconds, 1)
+
+    return {
+        "images": count,
+        "source": [width, height],
+        "threads": images.preprocess_executor()._max_workers,
+        "cpus": os.cpu_count(),
+        "images_per_second": {
+            "serial": rate(serial),
+            "parallel": rate(parallel),
+            "cached": rate(cached),
+        },
+        "speedup": round(serial / parallel, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", type=int, default=32)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    report = asyncio.run(run(args.images, args.width, args.height, args.repeats))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Benchmark JSON serialization and gzip cost for large API responses
+
+Compares bytes on the wire and CPU time per response for the encoder
+paths the API can take when returning a page of projects:
+
+  * fastapi  - jsonable_encoder + stdlib json.dumps (FastAPI's generic path)
+  * orjson   - jsonable_encoder + FastJSONResponse rendering
+  * adapter  - prebuilt TypeAdapter validate + dump_json (model_response)
+
+Each path is measured raw and gzip-compressed at the configured level.
+
+Usage (from backend/):
+    python -m benchmarks.bench_responses --projects 50 --xml-kb 64
+"""
+
+import argparse
+import gzip
+import json
+import random
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Callable, List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from app.core.config import settings
+from app.core.responses import FastJSONResponse, serialize
+from app.schemas import ProjectResponse
+
+
+def make_projects(count: int, xml_kb: int) -> List[SimpleNamespace]:
+    """Build ORM-like project rows carrying Blockly XML of roughly xml_kb"""
+    rng = random.Random(42)
+    block_types = ["iot_digital_write", "time_delay", "iot_led_set", "controls_repeat_ext"]
+    projects = []
+    for i in range(count):
+        parts = ['<xml xmlns="https://developers.google.com/blockly/xml">']
+        while sum(len(p) for p in parts) < xml_kb * 1024:
+            block_type = rng.choice(block_types)
+            parts.append(
+                f'<block type="{block_type}" id="b{rng.getrandbits(40):x}" '
+                f'x="{rng.randint(0, 800)}" y="{rng.randint(0, 600)}">'
+                f'<field name="PIN">{rng.randint(0, 40)}</field></block>'
+            )
+        parts.append("</xml>")
+        projects.append(
+            SimpleNamespace(
+                id=i + 1,
+                name=f"Project {i}",
+                description="Benchmark project " * 4,
+                tags=["iot", "benchmark"],
+                blocks="".join(parts),
+                generated_code="digital_write(13, HIGH)\ntime.sleep(1)\n" * 200,
+                thumbnail=None,
+                is_public=bool(i % 2),
+                owner_id=1,
+                created_at=datetime(2024, 1, 1),
+                updated_at=datetime(2024, 1, 2),
+            )
+        )
+    return projects
+
+
+def measure(encode: Callable[[], bytes], rounds: int, level: int) -> dict:
+    body = encode()
+    start = time.process_time()
+    for _ in range(rounds):
+        encode()
+    encode_cpu = (time.process_time() - start) / rounds
+
+    compressed = gzip.compress(body, compresslevel=level)
+    start = time.process_time()
+    for _ in range(rounds):
+        gzip.compress(body, compresslevel=level)
+    gzip_cpu = (time.process_time() - start) / rounds
+
+    return {
+        "bytes": len(body),
+        "gzip_bytes": len(compressed),
+        "encode_ms": round(encode_cpu * 1000, 3),
+        "gzip_ms": round(gzip_cpu * 1000, 3),
+    }
+
+
+def run(count: int, xml_kb: int, rounds: int, level: int) -> dict:
+    projects = make_projects(count, xml_kb)
+    adapter = TypeAdapter(List[ProjectResponse])
+
+    def fastapi_default() -> bytes:
+        models = [ProjectResponse.model_validate(p) for p in projects]
+        return json.dumps(
+            jsonable_encoder(models), ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
+
+    def orjson_path() -> bytes:
+        models = [ProjectResponse.model_validate(p) for p in projects]
+        return FastJSONResponse(jsonable_encoder(models)).body
+
+    def adapter_path() -> bytes:
+        return serialize(adapter, projects)
+
+    return {
+        "projects": count,
+        "xml_kb": xml_kb,
+        "gzip_level": level,
+        "results": {
+            "fastapi": measure(fastapi_default, rounds, level),
+            "orjson": measure(orjson_path, rounds, level),
+            "adapter": measure(adapter_path, rounds, level),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--projects", type=int, default=50)
+    parser.add_argument("--xml-kb", type=int, default=64)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--gzip-level", type=int, default=settings.GZIP_COMPRESS_LEVEL)
+    parser.add_argument("--json", action="store_true", help="print raw JSON results")
+    args = parser.parse_args()
+
+    report = run(args.projects, args.xml_kb, args.rounds, args.gzip_level)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(
+        f"{report['projects']} projects, ~{report['xml_kb']} KB XML each, "
+        f"gzip level {report['gzip_level']}"
+    )
+    print(f"{'path':<10}{'bytes':>12}{'gzip bytes':>12}{'encode ms':>12}{'gzip ms':>10}")
+    for name, row in report["results"].items():
+        print(
+            f"{name:<10}{row['bytes']:>12}{row['gzip_bytes']:>12}"
+            f"{row['encode_ms']:>12}{row['gzip_ms']:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
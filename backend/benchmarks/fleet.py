@@ -0,0 +1,403 @@
+"""Simulate a fleet of devices against the API to size ingest capacity
+
+Each virtual device is one asyncio task, so thousands fit in a process.
+Devices are registered in bulk under a few owner accounts (type
+"simulator", so the server can also push firmware to them), then each
+loops until the run ends:
+
+  * every --interval seconds (jittered) it samples its sensors: a
+    diurnal baseline plus a slow random walk and --noise Gaussian noise
+  * the batch goes to /api/devices/{id}/data over HTTP, or with
+    --transport mqtt to an in-process broker stand-in, from which
+    --bridge-workers forward it, as an MQTT-to-HTTP bridge would
+  * every --heartbeat seconds it pings /api/devices/{id}/ping
+  * with probability --dropout per interval it goes offline for an
+    exponentially distributed time (mean --dropout-seconds), buffering
+    readings and flushing them on reconnect; --loss drops batches outright
+
+A --probe-rate fraction of batches is followed until the newest reading
+is returned by GET /api/devices/{id}/data, which gives end-to-end
+latency from send to query visibility. With --uploads N, each owner
+pushes a firmware image to its devices N times during the run (the
+first in full, later ones as small deltas) and the OTA job durations are
+reported.
+
+The report has the per-request latency summary of loadtest plus
+telemetry counts, accepted readings per second and visibility latency.
+As with loadtest, set RATE_LIMIT_ENABLED=false to measure the ingest
+path rather than admission control.
+
+Usage (from backend/):
+    python -m benchmarks.fleet --devices 1000 --duration 60
+    python -m benchmarks.fleet --devices 5000 --interval 10 --transport mqtt --bridge-workers 32
+    python -m benchmarks.fleet --url http://localhost:8000 --devices 500 --uploads 2
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.loadtest import Stats, open_client, summarize
+
+
+# (unit, baseline, diurnal amplitude, random walk step)
+SENSORS = {
+    "temperature": ("C", 21.0, 3.0, 0.05),
+    "humidity": ("%", 45.0, 10.0, 0.2),
+    "light": ("lux", 300.0, 250.0, 2.0),
+    "pressure": ("hPa", 1013.0, 1.5, 0.05),
+}
+MAX_BATCH = 1000  # readings per ingest request
+PROBE_POLL_SECONDS = 0.05
+PROBE_TIMEOUT_SECONDS = 30.0
+JOB_POLL_SECONDS = 0.2
+
+
+class Fleet:
+    """Shared client, settings and counters for all virtual devices"""
+
+    def __init__(self, client: httpx.AsyncClient, args: argparse.Namespace, deadline: float):
+        self.client = client
+        self.args = args
+        self.deadline = deadline
+        self.stats = Stats()
+        self.counts: Counter = Counter()
+        self.visibility: List[float] = []
+        self.probe_timeouts = 0
+        self.probes = asyncio.Semaphore(args.max_probes)
+        self.broker: Optional[asyncio.Queue] = None
+        self.tasks: List[asyncio.Task] = []
+
+    async def request(
+        self, name: str, method: str, url: str, headers: Dict[str, str], expect: int = 200, **kwargs
+    ) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, headers=headers, **kwargs)
+        except httpx.HTTPError:
+            self.stats.record(name, time.perf_counter() - start, 0, False)
+            return None
+        ok = response.status_code == expect
+        self.stats.record(name, time.perf_counter() - start, response.status_code, ok)
+        return response if ok else None
+
+    async def ingest(self, device: "VirtualDevice", readings: List[dict]) -> bool:
+        response = await self.request(
+            "devices.ingest",
+            "POST",
+            f"/api/devices/{device.id}/data",
+            device.headers,
+            expect=201,
+            json={"readings": readings},
+        )
+        if response is None:
+            return False
+        self.counts["readings_accepted"] += len(readings)
+        return True
+
+    async def bridge(self) -> None:
+        """Forward broker messages to the ingest endpoint, like an MQTT bridge"""
+        while True:
+            device, readings, published = await self.broker.get()
+            try:
+                self.stats.record("mqtt.queue_wait", time.perf_counter() - published, 200, True)
+                await self.ingest(device, readings)
+            finally:
+                self.broker.task_done()
+
+    async def probe(self, device: "VirtualDevice", reading: dict, sent: float) -> None:
+        """Poll until a reading is visible to queries and record how long it took"""
+        async with self.probes:
+            while time.perf_counter() - sent < PROBE_TIMEOUT_SECONDS:
+                response = await self.request(
+                    "devices.data",
+                    "GET",
+                    f"/api/devices/{device.id}/data",
+                    device.headers,
+                    params={"sensor_type": reading["sensor_type"], "limit": 5},
+                )
+                if response is not None and any(
+                    row["timestamp"] == reading["timestamp"] for row in response.json()
+                ):
+                    self.visibility.append(time.perf_counter() - sent)
+                    return
+                await asyncio.sleep(PROBE_POLL_SECONDS)
+            self.probe_timeouts += 1
+
+    def spawn(self, coro) -> None:
+        self.tasks.append(asyncio.ensure_future(coro))
+
+
+class VirtualDevice:
+    def __init__(self, fleet: Fleet, device_id: int, headers: Dict[str, str], seed: str):
+        self.fleet = fleet
+        self.id = device_id
+        self.headers = headers
+        self.rng = random.Random(seed)
+        names = self.rng.sample(sorted(SENSORS), self.rng.randint(1, fleet.args.sensors))
+        # Sensor name -> current random walk offset
+        self.sensors: Dict[str, float] = {name: 0.0 for name in names}
+        self.phase = self.rng.uniform(0, 2 * math.pi)
+        self.buffer: List[dict] = []
+
+    def sample(self, now: datetime) -> None:
+        day = (now.hour * 3600 + now.minute * 60 + now.second) / 86400
+        for name, offset in self.sensors.items():
+            unit, baseline, amplitude, step = SENSORS[name]
+            offset += self.rng.gauss(0, step)
+            self.sensors[name] = offset
+            value = baseline + amplitude * math.sin(2 * math.pi * day + self.phase) + offset
+            value += self.rng.gauss(0, self.fleet.args.noise)
+            self.buffer.append(
+                {"sensor_type": name, "value": round(value, 3), "unit": unit, "timestamp": now.isoformat()}
+            )
+
+    async def send(self) -> None:
+        fleet = self.fleet
+        while self.buffer:
+            readings, self.buffer = self.buffer[:MAX_BATCH], self.buffer[MAX_BATCH:]
+            fleet.counts["batches"] += 1
+            fleet.counts["readings_sent"] += len(readings)
+            if self.rng.random() < fleet.args.loss:
+                fleet.counts["batches_lost"] += 1
+                continue
+            sent = time.perf_counter()
+            if fleet.broker is not None:
+                await fleet.broker.put((self, readings, sent))
+            elif not await fleet.ingest(self, readings):
+                continue
+            if self.rng.random() < fleet.args.probe_rate:
+                fleet.spawn(fleet.probe(self, readings[-1], sent))
+
+    async def run(self) -> None:
+        fleet, args = self.fleet, self.fleet.args
+        # Spread the first reports over one interval
+        await asyncio.sleep(self.rng.uniform(0, args.interval))
+        offline_until = 0.0
+        next_heartbeat = time.perf_counter() + self.rng.uniform(0, args.heartbeat)
+        while True:
+            now = time.perf_counter()
+            if now >= fleet.deadline:
+                return
+            self.sample(datetime.utcnow())
+            if now < offline_until:
+                fleet.counts["readings_buffered"] += len(self.sensors)
+            elif self.rng.random() < args.dropout:
+                fleet.counts["dropouts"] += 1
+                offline_until = now + self.rng.expovariate(1 / args.dropout_seconds)
+            else:
+                await self.send()
+                if now >= next_heartbeat:
+                    await fleet.request("devices.ping", "POST", f"/api/devices/{self.id}/ping", self.headers)
+                    next_heartbeat = now + args.heartbeat
+            await asyncio.sleep(args.interval * self.rng.uniform(0.8, 1.2))
+
+
+async def register_owner(
+    fleet: Fleet, run_id: str, index: int, count: int
+) -> Tuple[Dict[str, str], List[int]]:
+    """An owner account and its devices"""
+    email = f"fleet-{run_id}-{index}@example.com"
+    password = "fleet-test-password"
+    await fleet.request(
+        "auth.register", "POST", "/api/auth/register", {},
+        json={"email": email, "name": "Fleet Owner", "password": password},
+    )
+    response = await fleet.request(
+        "auth.login", "POST", "/api/auth/login", {}, data={"username": email, "password": password}
+    )
+    if response is None:
+        raise RuntimeError(f"owner {email} could not log in")
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    ids: List[int] = []
+    for start in range(0, count, 1000):
+        response = await fleet.request(
+            "devices.bulk_register",
+            "POST",
+            "/api/devices/bulk",
+            headers,
+            json={
+                "devices": [
+                    {"name": f"fleet-{run_id}-{index}-{n}", "device_type": "simulator"}
+                    for n in range(start, min(start + 1000, count))
+                ]
+            },
+        )
+        if response is None:
+            raise RuntimeError("device registration failed")
+        ids += [item["id"] for item in response.json()["results"] if item["id"] is not None]
+    return headers, ids
+
+
+async def push_firmware(fleet: Fleet, headers: Dict[str, str], ids: List[int], image: bytes) -> None:
+    """One OTA job over an owner's devices, timed until it finishes"""
+    start = time.perf_counter()
+    response = await fleet.request(
+        "devices.bulk_upload",
+        "POST",
+        "/api/devices/bulk/upload",
+        headers,
+        expect=202,
+        files={"firmware": ("firmware.bin", image)},
+        data={"ids": [str(i) for i in ids]},
+    )
+    if response is None:
+        return
+    job_id = response.json()["id"]
+    while True:
+        await asyncio.sleep(JOB_POLL_SECONDS)
+        response = await fleet.request("jobs.get", "GET", f"/api/jobs/{job_id}", headers)
+        if response is None:
+            continue
+        job = response.json()
+        if job["status"] in ("succeeded", "failed", "cancelled"):
+            break
+    ok = job["status"] == "succeeded"
+    fleet.stats.record("ota.job", time.perf_counter() - start, 200 if ok else 500, ok)
+    if ok:
+        fleet.counts["ota_updated"] += job["result"]["updated"]
+        fleet.counts["ota_failed"] += job["result"]["failed"]
+        fleet.counts["ota_bytes_sent"] += job["result"]["bytes_sent"]
+
+
+async def uploads(fleet: Fleet, owners: List[Tuple[Dict[str, str], List[int]]], start: float) -> None:
+    args = fleet.args
+    rng = random.Random(args.seed)
+    image = bytearray(rng.randbytes(args.firmware_kb * 1024))
+    for n in range(args.uploads):
+        await asyncio.sleep(max(start + args.duration * n / args.uploads - time.perf_counter(), 0))
+        if n:
+            # A small code change: a few bytes somewhere in the image
+            offset = rng.randrange(len(image) - 16)
+            image[offset: offset + 16] = rng.randbytes(16)
+        await asyncio.gather(*(push_firmware(fleet, headers, ids, bytes(image)) for headers, ids in owners))
+
+
+async def run(args: argparse.Namespace) -> dict:
+    run_id = uuid.uuid4().hex[:8]
+    async with open_client(args.url, args.timeout) as client:
+        fleet = Fleet(client, args, deadline=math.inf)
+        counts = [
+            min(args.devices_per_owner, args.devices - start)
+            for start in range(0, args.devices, args.devices_per_owner)
+        ]
+        owners = await asyncio.gather(
+            *(register_owner(fleet, run_id, index, count) for index, count in enumerate(counts))
+        )
+        devices = [
+            VirtualDevice(fleet, device_id, headers, f"{args.seed}-{device_id}")
+            for headers, ids in owners
+            for device_id in ids
+        ]
+
+        # Registration is not part of the measured window
+        fleet.stats = Stats()
+        start = time.perf_counter()
+        fleet.deadline = start + args.duration
+        bridges: List[asyncio.Task] = []
+        if args.transport == "mqtt":
+            fleet.broker = asyncio.Queue(args.broker_queue)
+            bridges = [asyncio.ensure_future(fleet.bridge()) for _ in range(args.bridge_workers)]
+        if args.uploads:
+            fleet.spawn(uploads(fleet, owners, start))
+
+        await asyncio.gather(*(device.run() for device in devices))
+        if fleet.broker is not None:
+            await fleet.broker.join()
+        for bridge in bridges:
+            bridge.cancel()
+        elapsed = time.perf_counter() - start
+        # Probes and uploads still in flight finish; nothing new starts
+        while fleet.tasks:
+            pending, fleet.tasks = fleet.tasks, []
+            await asyncio.gather(*pending)
+        drained = time.perf_counter() - start
+
+    counts = fleet.counts
+    all_latencies = [
+        value for name, values in fleet.stats.latencies.items()
+        if not name.startswith(("mqtt.", "ota."))
+        for value in values
+    ]
+    visibility = sorted(fleet.visibility)
+    return {
+        "target": args.url or "in-process",
+        "devices": len(devices),
+        "owners": len(owners),
+        "transport": args.transport,
+        "duration_s": round(elapsed, 2),
+        "drain_s": round(drained - elapsed, 2),
+        "telemetry": {
+            **{key: counts[key] for key in (
+                "batches", "batches_lost", "readings_sent", "readings_accepted",
+                "readings_buffered", "dropouts",
+            )},
+            "accepted_readings_per_s": round(counts["readings_accepted"] / elapsed, 2),
+        },
+        "visibility": {
+            "probes": len(visibility),
+            "timeouts": fleet.probe_timeouts,
+            **{
+                key: value
+                for key, value in summarize(visibility, 0, elapsed).items()
+                if key.endswith("_ms")
+            },
+        },
+        "ota": {key: counts[f"ota_{key}"] for key in ("updated", "failed", "bytes_sent")},
+        "overall": summarize(all_latencies, sum(fleet.stats.errors.values()), elapsed),
+        "operations": {
+            name: {
+                **summarize(fleet.stats.latencies[name], fleet.stats.errors[name], elapsed),
+                "statuses": dict(fleet.stats.statuses[name]),
+            }
+            for name in sorted(fleet.stats.latencies)
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="target a running server instead of the in-process app")
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument("--devices-per-owner", type=int, default=500, help="at most 1000, one OTA job each")
+    parser.add_argument("--duration", type=float, default=30.0, help="measured seconds")
+    parser.add_argument("--interval", type=float, default=5.0, help="seconds between a device's reports")
+    parser.add_argument("--sensors", type=int, default=3, help="most sensors per device")
+    parser.add_argument("--noise", type=float, default=0.1, help="standard deviation of sensor noise")
+    parser.add_argument("--heartbeat", type=float, default=30.0, help="seconds between pings")
+    parser.add_argument("--dropout", type=float, default=0.005, help="chance per interval of going offline")
+    parser.add_argument("--dropout-seconds", type=float, default=20.0, help="mean time offline")
+    parser.add_argument("--loss", type=float, default=0.0, help="chance a batch is lost in transit")
+    parser.add_argument("--transport", choices=("http", "mqtt"), default="http")
+    parser.add_argument("--bridge-workers", type=int, default=16, help="mqtt to http forwarders")
+    parser.add_argument("--broker-queue", type=int, default=10000, help="messages the broker holds")
+    parser.add_argument("--probe-rate", type=float, default=0.02, help="fraction of batches followed to visibility")
+    parser.add_argument("--max-probes", type=int, default=50, help="probes polling at once")
+    parser.add_argument("--uploads", type=int, default=0, help="firmware pushes per owner")
+    parser.add_argument("--firmware-kb", type=int, default=256)
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-request timeout")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+    if not 1 <= args.devices_per_owner <= 1000:
+        parser.error("--devices-per-owner must be between 1 and 1000")
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,417 @@
+"""Load-test the API with weighted, scripted user scenarios
+
+Virtual users each log in once, register a device, then loop picking a
+scenario by weight until the run ends:
+
+  * login_storm    - repeated password logins
+  * project_crud   - create, read, update, list and delete a project
+  * codegen        - generate Python and C++ from a Blockly workspace
+  * device_ping    - single and bulk device heartbeats
+  * sensor_ingest  - a burst of sensor reading batches, then a read back
+
+The app runs in-process through httpx's ASGI transport by default, or a
+running server is targeted with --url. Results (throughput, latency
+percentiles and error rates, overall and per operation) are printed as
+JSON and can be saved as a baseline and compared on later runs; the
+process exits non-zero when a comparison finds a regression.
+
+Virtual users share one client address, so admission control will
+answer 429/503 once they outrun the per-IP buckets (visible under each
+operation's statuses). Set RATE_LIMIT_ENABLED=false to measure raw
+capacity rather than the limiter.
+
+Usage (from backend/):
+    python -m benchmarks.loadtest --users 20 --duration 30
+    python -m benchmarks.loadtest --save-baseline benchmarks/baseline.json
+    python -m benchmarks.loadtest --baseline benchmarks/baseline.json --tolerance 0.2
+    python -m benchmarks.loadtest --url http://localhost:8000 --mix codegen=5,sensor_ingest=5
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+
+BLINK_XML = (
+    '<xml xmlns="https://developers.google.com/blockly/xml">'
+    '<block type="event_on_start" x="20" y="20"><next>'
+    '<block type="iot_digital_write"><field name="PIN">13</field>'
+    '<field name="STATE">HIGH</field><next>'
+    '<block type="time_delay"><field name="SECONDS">1</field><next>'
+    '<block type="iot_digital_write"><field name="PIN">13</field>'
+    '<field name="STATE">LOW</field><next>'
+    '<block type="time_delay"><field name="SECONDS">1</field>'
+    "</block></next></block></next></block></next></block></next></block></xml>"
+)
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+class Stats:
+    """Latency samples and status codes per operation"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+        self.errors: Counter = Counter()
+
+    def record(self, name: str, elapsed: float, status: int, ok: bool) -> None:
+        self.latencies[name].append(elapsed)
+        self.statuses[name][str(status)] += 1
+        if not ok:
+            self.errors[name] += 1
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> dict:
+    values = sorted(latencies)
+    count = len(values)
+    summary = {
+        "requests": count,
+        "errors": errors,
+        "error_rate": round(errors / count, 4) if count else 0.0,
+        "throughput_rps": round(count / elapsed, 2) if elapsed else 0.0,
+    }
+    for pct in PERCENTILES:
+        summary[f"p{pct}_ms"] = round(percentile(values, pct) * 1000, 2)
+    summary["max_ms"] = round(values[-1] * 1000, 2) if values else 0.0
+    return summary
+
+
+class VirtualUser:
+    """One simulated client: its own credentials, device and request helper"""
+
+    def __init__(self, client: httpx.AsyncClient, stats: Stats, index: int, run_id: str):
+        self.client = client
+        self.stats = stats
+        self.email = f"load-{run_id}-{index}@example.com"
+        self.password = "load-test-password"
+        self.headers: Dict[str, str] = {}
+        self.device_id: Optional[int] = None
+        self.rng = random.Random(f"{run_id}-{index}")
+
+    async def request(
+        self, name: str, method: str, url: str, expect: int = 200, **kwargs
+    ) -> Optional[httpx.Response]:
+        kwargs.setdefault("headers", self.headers)
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.stats.record(name, time.perf_counter() - start, 0, False)
+            return None
+        ok = response.status_code == expect
+        self.stats.record(name, time.perf_counter() - start, response.status_code, ok)
+        return response if ok else None
+
+    async def login(self) -> bool:
+        response = await self.request(
+            "auth.login",
+            "POST",
+            "/api/auth/login",
+            data={"username": self.email, "password": self.password},
+            headers={},
+        )
+        if response is None:
+            return False
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        return True
+
+    async def setup(self) -> bool:
+        await self.request(
+            "auth.register",
+            "POST",
+            "/api/auth/register",
+            json={"email": self.email, "name": "Load Test", "password": self.password},
+            headers={},
+        )
+        if not await self.login():
+            return False
+        response = await self.request(
+            "devices.register",
+            "POST",
+            "/api/devices/",
+            expect=201,
+            json={"name": f"load-device-{self.email}", "device_type": "simulator"},
+        )
+        if response is None:
+            return False
+        self.device_id = response.json()["id"]
+        return True
+
+
+# Scenarios
+
+
+async def login_storm(user: VirtualUser) -> None:
+    for _ in range(3):
+        await user.login()
+
+
+async def project_crud(user: VirtualUser) -> None:
+    response = await user.request(
+        "projects.create",
+        "POST",
+        "/api/projects/",
+        expect=201,
+        json={"name": "Load test project", "description": "blink", "blocks": BLINK_XML},
+    )
+    if response is None:
+        return
+    project_id = response.json()["id"]
+    await user.request("projects.get", "GET", f"/api/projects/{project_id}")
+    await user.request(
+        "projects.update",
+        "PUT",
+        f"/api/projects/{project_id}",
+        json={"blocks": BLINK_XML.replace('"SECONDS">1<', '"SECONDS">2<')},
+    )
+    await user.request("projects.list", "GET", "/api/projects/", params={"limit": 20})
+    await user.request(
+        "projects.delete", "DELETE", f"/api/projects/{project_id}", expect=204
+    )
+
+
+async def codegen(user: VirtualUser) -> None:
+    for language in ("python", "cpp"):
+        await user.request(
+            "code.generate",
+            "POST",
+            "/api/code/generate",
+            json={"blocks": BLINK_XML, "language": language},
+        )
+
+
+async def device_ping(user: VirtualUser) -> None:
+    await user.request("devices.ping", "POST", f"/api/devices/{user.device_id}/ping")
+    await user.request(
+        "devices.bulk_ping",
+        "POST",
+        "/api/devices/bulk/ping",
+        json={"ids": [user.device_id]},
+    )
+
+
+async def sensor_ingest(user: VirtualUser) -> None:
+    for _ in range(user.rng.randint(2, 5)):
+        readings = [
+            {
+                "sensor_type": user.rng.choice(("temperature", "humidity", "light")),
+                "value": round(user.rng.uniform(0, 100), 2),
+            }
+            for _ in range(user.rng.randint(10, 50))
+        ]
+        await user.request(
+            "devices.ingest",
+            "POST",
+            f"/api/devices/{user.device_id}/data",
+            expect=201,
+            json={"readings": readings},
+        )
+    await user.request(
+        "devices.data", "GET", f"/api/devices/{user.device_id}/data", params={"limit": 50}
+    )
+
+
+SCENARIOS: Dict[str, Callable[[VirtualUser], Awaitable[None]]] = {
+    "login_storm": login_storm,
+    "project_crud": project_crud,
+    "codegen": codegen,
+    "device_ping": device_ping,
+    "sensor_ingest": sensor_ingest,
+}
+
+DEFAULT_MIX = {
+    "login_storm": 1,
+    "project_crud": 3,
+    "codegen": 2,
+    "device_ping": 3,
+    "sensor_ingest": 3,
+}
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+@asynccontextmanager
+async def open_client(url: Optional[str], timeout: float):
+    if url:
+        async with httpx.AsyncClient(base_url=url, timeout=timeout) as client:
+            yield client
+        return
+
+    from app.main import app
+
+    # Unhandled errors become 500s, as a running server would answer
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://loadtest", timeout=timeout
+        ) as client:
+            yield client
+
+
+async def run(
+    users: int,
+    duration: float,
+    mix: Dict[str, float],
+    url: Optional[str] = None,
+    ramp_up: float = 0.0,
+    timeout: float = 30.0,
+) -> dict:
+    stats = Stats()
+    scenario_counts: Counter = Counter()
+    run_id = uuid.uuid4().hex[:8]
+    names = list(mix)
+    weights = [mix[name] for name in names]
+
+    async with open_client(url, timeout) as client:
+        vusers = [VirtualUser(client, stats, i, run_id) for i in range(users)]
+        ready = await asyncio.gather(*(user.setup() for user in vusers))
+        vusers = [user for user, ok in zip(vusers, ready) if ok]
+        if not vusers:
+            raise RuntimeError("no virtual user completed setup")
+
+        # Setup traffic is not part of the measured window
+        stats = Stats()
+        for user in vusers:
+            user.stats = stats
+
+        start = time.perf_counter()
+        deadline = start + duration
+
+        async def loop(user: VirtualUser, delay: float) -> None:
+            await asyncio.sleep(delay)
+            while time.perf_counter() < deadline:
+                name = user.rng.choices(names, weights)[0]
+                scenario_counts[name] += 1
+                await SCENARIOS[name](user)
+
+        await asyncio.gather(
+            *(
+                loop(user, ramp_up * i / len(vusers))
+                for i, user in enumerate(vusers)
+            )
+        )
+        elapsed = time.perf_counter() - start
+
+    all_latencies = [value for values in stats.latencies.values() for value in values]
+    return {
+        "target": url or "in-process",
+        "users": len(vusers),
+        "duration_s": round(elapsed, 2),
+        "mix": mix,
+        "scenarios": dict(scenario_counts),
+        "overall": summarize(all_latencies, sum(stats.errors.values()), elapsed),
+        "operations": {
+            name: {
+                **summarize(stats.latencies[name], stats.errors[name], elapsed),
+                "statuses": dict(stats.statuses[name]),
+            }
+            for name in sorted(stats.latencies)
+        },
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float, error_margin: float) -> List[str]:
+    """List regressions of the report against a baseline report
+
+    Latency percentiles may grow and throughput may drop by at most
+    tolerance (a fraction); error rates may grow by at most error_margin.
+    """
+    regressions = []
+    sections = [("overall", report["overall"], baseline.get("overall", {}))]
+    for name, current in report["operations"].items():
+        previous = baseline.get("operations", {}).get(name)
+        if previous:
+            sections.append((name, current, previous))
+
+    for name, current, previous in sections:
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            if previous.get(key) and current[key] > previous[key] * (1 + tolerance):
+                regressions.append(
+                    f"{name} {key} {current[key]} > baseline {previous[key]}"
+                )
+        if name == "overall" and previous.get("throughput_rps"):
+            if current["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+                regressions.append(
+                    f"{name} throughput_rps {current['throughput_rps']} "
+                    f"< baseline {previous['throughput_rps']}"
+                )
+        if current["error_rate"] > previous.get("error_rate", 0.0) + error_margin:
+            regressions.append(
+                f"{name} error_rate {current['error_rate']} "
+                f"> baseline {previous.get('error_rate', 0.0)}"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="target a running server instead of the in-process app")
+    parser.add_argument("--users", type=int, default=10, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=20.0, help="measured seconds")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="seconds to start all users")
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-request timeout")
+    parser.add_argument(
+        "--mix",
+        type=parse_mix,
+        default=DEFAULT_MIX,
+        help="scenario weights, e.g. project_crud=3,codegen=1",
+    )
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    parser.add_argument("--baseline", help="compare against this saved report")
+    parser.add_argument("--save-baseline", help="write this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--error-margin", type=float, default=0.01)
+    args = parser.parse_args()
+
+    report = asyncio.run(
+        run(args.users, args.duration, args.mix, args.url, args.ramp_up, args.timeout)
+    )
+
+    regressions: List[str] = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance, args.error_margin)
+        report["baseline"] = args.baseline
+        report["regressions"] = regressions
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                f.write(text + "\n")
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Test fixtures - the app on a throwaway SQLite database and model store"""
+
+import os
+import tempfile
+
+_db_dir = tempfile.mkdtemp(prefix="iot-platform-tests-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_db_dir}/test.db"
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+os.environ["MODEL_STORAGE_DIR"] = f"{_db_dir}/models"
+
+import httpx
+import pytest
+from sqlalchemy import event
+
+from app.core.database import engine
+from app.core.security import create_access_token
+from app.main import app, lifespan
+
+
+@event.listens_for(engine.sync_engine, "connect")
+def _enforce_foreign_keys(dbapi_connection, connection_record):
+    # Off by default in SQLite; on here so tests catch what Postgres would reject
+    dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+async def client():
+    async with lifespan(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            yield client
+
+
+@pytest.fixture(scope="session")
+async def users(client):
+    """Auth headers of two registered users, by name"""
+    headers = {}
+    for name in ("alice", "bob"):
+        response = await client.post(
+            "/api/auth/register",
+            json={"email": f"{name}@example.com", "name": name, "password": "secret"},
+        )
+        token = create_access_token({"sub": str(response.json()["id"])})
+        headers[name] = {"Authorization": f"Bearer {token}"}
+    return headers
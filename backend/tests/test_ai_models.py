@@ -0,0 +1,100 @@
+"""Visibility of private AI models across read, test and export routes"""
+
+import numpy as np
+import pytest
+
+from app.core.database import async_session
+from app.models import AIModel
+from tests.test_model_uploads import _archive, _upload
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(scope="module")
+async def private_model(client, users):
+    """A private model of alice's, like the ones train_model creates"""
+    me = await client.get("/api/auth/me", headers=users["alice"])
+    async with async_session() as db:
+        model = AIModel(
+            name="Private forecast",
+            model_type="prediction",
+            owner_id=me.json()["id"],
+            is_pretrained=False,
+            is_public=False,
+        )
+        db.add(model)
+        await db.commit()
+        return model.id
+
+
+READS = [
+    ("GET", "/api/ai-models/{id}"),
+    ("GET", "/api/ai-models/{id}/benchmarks"),
+    ("POST", "/api/ai-models/{id}/test"),
+]
+
+
+@pytest.mark.parametrize("method, path", READS)
+async def test_private_model_is_hidden_from_anonymous_clients(client, private_model, method, path):
+    response = await client.request(method, path.format(id=private_model))
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize("method, path", READS)
+async def test_private_model_is_hidden_from_other_users(client, users, private_model, method, path):
+    response = await client.request(method, path.format(id=private_model), headers=users["bob"])
+    assert response.status_code == 404
+
+
+async def test_private_model_images_test_is_hidden(client, users, private_model):
+    files = [("images", ("a.png", b"not an image", "image/png"))]
+    for headers in ({}, users["bob"]):
+        response = await client.post(
+            f"/api/ai-models/{private_model}/test/images", files=files, headers=headers
+        )
+        assert response.status_code == 404
+
+
+async def test_owner_sees_private_model(client, users, private_model):
+    response = await client.get(f"/api/ai-models/{private_model}", headers=users["alice"])
+    assert response.status_code == 200
+    assert response.json()["name"] == "Private forecast"
+
+    # Visible, but there are no weights to run yet
+    response = await client.post(f"/api/ai-models/{private_model}/test", headers=users["alice"])
+    assert response.status_code == 409
+
+    response = await client.get(f"/api/ai-models/{private_model}/benchmarks", headers=users["alice"])
+    assert response.status_code == 200
+
+
+async def test_private_model_is_not_served_from_cache(client, users, private_model):
+    await client.get(f"/api/ai-models/{private_model}", headers=users["alice"])
+    response = await client.get(f"/api/ai-models/{private_model}")
+    assert response.status_code == 404
+
+
+async def _uploaded_model(client, headers, fill: float, is_public: bool) -> int:
+    data = _archive(np.full((4, 2), fill, np.float32))
+    response = await _upload(client, headers, data)
+    assert response.status_code == 201, response.text
+    model_id = response.json()["model"]["id"]
+    async with async_session() as db:
+        model = await db.get(AIModel, model_id)
+        model.is_public = is_public
+        await db.commit()
+    return model_id
+
+
+async def test_export_follows_model_visibility(client, users):
+    public_model = await _uploaded_model(client, users["alice"], 0.125, is_public=True)
+    own_model = await _uploaded_model(client, users["bob"], 0.375, is_public=False)
+    others_model = await _uploaded_model(client, users["alice"], 0.625, is_public=False)
+
+    for model_id in (public_model, own_model):
+        response = await client.post(f"/api/ai-models/{model_id}/export/c", headers=users["bob"])
+        assert response.status_code == 200, response.text
+        assert response.json()["header"]
+
+    response = await client.post(f"/api/ai-models/{others_model}/export/c", headers=users["bob"])
+    assert response.status_code == 404
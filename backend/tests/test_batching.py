@@ -0,0 +1,53 @@
+"""Micro-batching of inference requests"""
+
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.services.ml.batching import MicroBatcher
+from app.services.ml.engine import load_model, save_model
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def model(tmp_path):
+    save_model(
+        str(tmp_path),
+        {
+            "task": "classification",
+            "input_shape": [4],
+            "labels": ["a", "b"],
+            "layers": [{"type": "dense", "weights": "w.npy", "activation": "softmax"}],
+        },
+        {"w.npy": np.full((4, 2), 0.5, np.float32)},
+    )
+    return load_model(str(tmp_path))
+
+
+async def _retired_collector_exits(batcher):
+    batcher.retire()
+    await asyncio.wait_for(batcher._collector, timeout=1)
+
+
+async def test_idle_batcher_stops_when_retired(model):
+    batcher = MicroBatcher(model, max_batch=8, max_delay=0.01, slots=1)
+    await batcher.predict(np.ones((1, 4), np.float32))
+    await _retired_collector_exits(batcher)
+
+
+async def test_retire_serves_queued_requests_then_stops(model):
+    batcher = MicroBatcher(model, max_batch=8, max_delay=0.01, slots=1)
+    requests = [
+        asyncio.ensure_future(batcher.predict(np.ones((1, 4), np.float32))) for _ in range(4)
+    ]
+    await asyncio.sleep(0)
+    # The wake-up lands behind the queued requests and is taken into their batch
+    await _retired_collector_exits(batcher)
+    outputs = await asyncio.gather(*requests)
+    assert [output.shape for output in outputs] == [(1, 2)] * 4
+
+    # A caller still holding the retired batcher is served on its own
+    output = await asyncio.wait_for(batcher.predict(np.ones((1, 4), np.float32)), timeout=1)
+    assert output.shape == (1, 2)
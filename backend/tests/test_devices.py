@@ -0,0 +1,66 @@
+"""Device registration and removal"""
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def _device_with_history(client, headers, name):
+    """A device with sensor readings and a queued command"""
+    response = await client.post(
+        "/api/devices/", json={"name": name, "device_type": "esp32"}, headers=headers
+    )
+    device_id = response.json()["id"]
+    response = await client.post(
+        f"/api/devices/{device_id}/data",
+        json={"readings": [{"sensor_type": "temperature", "value": 21.5}]},
+        headers=headers,
+    )
+    assert response.status_code == 201
+    response = await client.post(
+        f"/api/devices/{device_id}/commands",
+        json={"name": "led", "params": {"pin": 13, "state": 1}},
+        headers=headers,
+    )
+    assert response.status_code in (201, 202)
+    return device_id
+
+
+async def test_bulk_remove_deletes_children_first(client, users):
+    headers = users["alice"]
+    ids = [await _device_with_history(client, headers, f"bulk-{i}") for i in range(2)]
+
+    response = await client.post("/api/devices/bulk/delete", json={"ids": ids}, headers=headers)
+    assert response.status_code == 200
+    assert [item["status"] for item in response.json()["results"]] == ["deleted", "deleted"]
+
+    for device_id in ids:
+        response = await client.get(f"/api/devices/{device_id}", headers=headers)
+        assert response.status_code == 404
+
+
+async def test_remove_device_with_history(client, users):
+    headers = users["alice"]
+    device_id = await _device_with_history(client, headers, "single")
+
+    response = await client.delete(f"/api/devices/{device_id}", headers=headers)
+    assert response.status_code == 204
+    response = await client.get(f"/api/devices/{device_id}", headers=headers)
+    assert response.status_code == 404
+
+
+async def test_mac_address_registered_once_per_user(client, users):
+    device = {"name": "sensor", "device_type": "esp32", "mac_address": "12:34:56:78:9A:BC"}
+    response = await client.post("/api/devices/", json=device, headers=users["alice"])
+    assert response.status_code == 201
+
+    response = await client.post("/api/devices/", json=device, headers=users["alice"])
+    assert response.status_code == 409
+    response = await client.post(
+        "/api/devices/bulk", json={"devices": [device]}, headers=users["alice"]
+    )
+    assert response.json()["results"][0]["status"] == "conflict"
+
+    # Another user may register the same MAC
+    response = await client.post("/api/devices/", json=device, headers=users["bob"])
+    assert response.status_code == 201
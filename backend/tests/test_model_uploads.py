@@ -0,0 +1,92 @@
+"""Model archive uploads"""
+
+import hashlib
+import io
+import json
+import zipfile
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+
+pytestmark = pytest.mark.anyio
+
+
+def _npy(array) -> bytes:
+    buffer = io.BytesIO()
+    np.save(buffer, array, allow_pickle=False)
+    return buffer.getvalue()
+
+
+def _archive(weights=None, extra_files=0) -> bytes:
+    """A zip of a one-layer classification model"""
+    weights = np.full((4, 2), 0.5, np.float32) if weights is None else weights
+    manifest = {
+        "format": "iotai-numpy",
+        "version": 1,
+        "task": "classification",
+        "input_shape": [weights.shape[0]],
+        "labels": [f"class_{i}" for i in range(weights.shape[1])],
+        "layers": [{"type": "dense", "weights": "w.npy", "activation": "softmax"}],
+    }
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("model.json", json.dumps(manifest))
+        archive.writestr("w.npy", _npy(weights))
+        for i in range(extra_files):
+            archive.writestr(f"extra_{i}.json", "{}")
+    return buffer.getvalue()
+
+
+async def _upload(client, headers, data: bytes):
+    return await client.post(
+        "/api/ai-models/upload",
+        files={"file": ("model.zip", data, "application/zip")},
+        headers=headers,
+    )
+
+
+async def _start(client, headers, data: bytes):
+    return await client.post(
+        "/api/ai-models/uploads",
+        json={"filename": "model.zip", "size": len(data), "sha256": hashlib.sha256(data).hexdigest()},
+        headers=headers,
+    )
+
+
+async def test_known_hash_does_not_skip_upload_for_other_users(client, users):
+    data = _archive(np.full((4, 2), 0.25, np.float32))
+    response = await _upload(client, users["alice"], data)
+    assert response.status_code == 201, response.text
+
+    # Bob only knows the hash, so he has to send the bytes
+    response = await _start(client, users["bob"], data)
+    assert response.status_code == 201
+    assert response.json()["status"] == "uploading"
+    assert response.json()["model"] is None
+
+    # Alice's own model already uses the archive
+    response = await _start(client, users["alice"], data)
+    assert response.status_code == 201
+    assert response.json()["status"] == "complete"
+    assert response.json()["model"]["id"] is not None
+
+
+async def test_archive_unpacking_past_the_size_cap_is_rejected(client, users, monkeypatch):
+    # Zeros compress to almost nothing but unpack to 1 MB
+    data = _archive(np.zeros((512, 512), np.float32))
+    assert len(data) < 16 * 1024
+    monkeypatch.setattr(settings, "MODEL_ARCHIVE_MAX_UNPACKED_BYTES", 512 * 1024)
+
+    response = await _upload(client, users["alice"], data)
+    assert response.status_code == 422
+    assert "unpacks to more than" in response.json()["detail"]
+
+
+async def test_archive_with_too_many_members_is_rejected(client, users, monkeypatch):
+    monkeypatch.setattr(settings, "MODEL_ARCHIVE_MAX_MEMBERS", 3)
+
+    response = await _upload(client, users["alice"], _archive(extra_files=5))
+    assert response.status_code == 422
+    assert "at most 3 files" in response.json()["detail"]
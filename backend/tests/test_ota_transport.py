@@ -0,0 +1,34 @@
+"""HTTP transport of OTA updates"""
+
+import httpx
+import pytest
+
+from app.services.ota.protocol import DeviceRejected, LinkError, OffsetMismatch
+from app.services.ota.transport import HttpTransport
+
+pytestmark = pytest.mark.anyio
+
+
+def _transport(status_code: int, body) -> HttpTransport:
+    def respond(request):
+        return httpx.Response(status_code, json=body)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(respond))
+    return HttpTransport(client, "http://device/ota")
+
+
+async def test_offset_mismatch():
+    with pytest.raises(OffsetMismatch):
+        await _transport(409, {"offset": 512}).send_chunk("t", 0, b"data")
+
+
+@pytest.mark.parametrize("status_code", [200, 409, 422])
+@pytest.mark.parametrize("body", [[1, 2], "busy", 3])
+async def test_non_object_body_is_rejected(status_code, body):
+    with pytest.raises(DeviceRejected):
+        await _transport(status_code, body).send_chunk("t", 0, b"data")
+
+
+async def test_server_errors_stay_link_errors():
+    with pytest.raises(LinkError):
+        await _transport(503, ["overloaded"]).status()
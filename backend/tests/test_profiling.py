@@ -0,0 +1,19 @@
+"""SQL profiling headers"""
+
+import pytest
+
+from app.core.config import settings
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_debug_headers_off_by_default(client):
+    response = await client.get("/api/tutorials/")
+    assert "x-db-queries" not in response.headers
+    assert "server-timing" not in response.headers
+
+
+async def test_debug_headers_when_enabled(client, monkeypatch):
+    monkeypatch.setattr(settings, "SQL_DEBUG_HEADER", True)
+    response = await client.get("/api/tutorials/")
+    assert "x-db-queries" in response.headers
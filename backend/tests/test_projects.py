@@ -0,0 +1,26 @@
+"""Project saves and revision history"""
+
+import asyncio
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_concurrent_saves_get_distinct_revisions(client, users):
+    headers = users["alice"]
+    response = await client.post(
+        "/api/projects/", json={"name": "racy", "blocks": "<xml>v0</xml>"}, headers=headers
+    )
+    project_id = response.json()["id"]
+
+    responses = await asyncio.gather(*(
+        client.put(
+            f"/api/projects/{project_id}", json={"blocks": f"<xml>v{i}</xml>"}, headers=headers
+        )
+        for i in range(1, 5)
+    ))
+    assert [response.status_code for response in responses] == [200] * 4
+
+    response = await client.get(f"/api/projects/{project_id}/revisions", headers=headers)
+    assert sorted(item["revision"] for item in response.json()) == [1, 2, 3, 4, 5]
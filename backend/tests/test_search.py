@@ -0,0 +1,22 @@
+"""Search backends"""
+
+import pytest
+
+from app.core.database import async_session
+from app.services.search import LikeSearchBackend, SQLiteFTS5Backend
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize("backend", [SQLiteFTS5Backend(), LikeSearchBackend()])
+async def test_project_tags_are_searched(client, users, backend):
+    response = await client.post(
+        "/api/projects/",
+        json={"name": "Watering", "tags": ["greenhouse"], "is_public": False},
+        headers=users["bob"],
+    )
+    project = response.json()
+
+    async with async_session() as db:
+        hits = await backend.search(db, "greenhouse", ["project"], project["owner_id"], 0, 10)
+    assert project["id"] in [hit.ref_id for hit in hits]
@@ -0,0 +1,84 @@
+"""Tutorial caching and learning stats"""
+
+import asyncio
+
+import pytest
+
+from app.api.routes.tutorials import CACHE_NAMESPACE
+from app.core.cache import response_cache
+from app.core.config import settings
+from app.core.database import async_session
+from app.models import Tutorial
+
+pytestmark = pytest.mark.anyio
+
+
+async def _titles(client):
+    response = await client.get("/api/tutorials/")
+    assert response.status_code == 200
+    return {tutorial["title"] for tutorial in response.json()}
+
+
+def _cached():
+    return any(key[0] == CACHE_NAMESPACE for key in response_cache._entries)
+
+
+async def test_cache_cleared_on_commit_not_flush(client):
+    await _titles(client)
+    async with async_session() as db:
+        db.add(Tutorial(title="Committed later", category="basics"))
+        await db.flush()
+        # A read between flush and commit must not pin the old list
+        assert "Committed later" not in await _titles(client)
+        await db.commit()
+
+    assert "Committed later" in await _titles(client)
+
+
+async def test_rollback_keeps_cache(client):
+    await _titles(client)
+    async with async_session() as db:
+        db.add(Tutorial(title="Rolled back", category="basics"))
+        await db.flush()
+        await db.rollback()
+
+    assert _cached()
+    assert "Rolled back" not in await _titles(client)
+
+
+async def test_concurrent_first_completions(client, users):
+    async with async_session() as db:
+        tutorials = [Tutorial(title=f"Race {i}", category="basics") for i in range(2)]
+        db.add_all(tutorials)
+        await db.commit()
+
+    headers = users["bob"]
+    responses = await asyncio.gather(*(
+        client.post(f"/api/tutorials/{tutorial.id}/complete", headers=headers)
+        for tutorial in tutorials
+    ))
+    assert [response.status_code for response in responses] == [200, 200]
+
+    response = await client.get("/api/tutorials/progress/me", headers=headers)
+    assert response.json()["completed_count"] == 2
+
+
+async def test_concurrent_completions_of_one_tutorial_count_once(client, users):
+    async with async_session() as db:
+        tutorial = Tutorial(title="Twice", category="basics")
+        db.add(tutorial)
+        await db.commit()
+
+    headers = users["alice"]
+    before = (await client.get("/api/tutorials/progress/me", headers=headers)).json()
+    responses = await asyncio.gather(*(
+        client.post(f"/api/tutorials/{tutorial.id}/complete", headers=headers)
+        for _ in range(2)
+    ))
+    assert sorted(response.json()["status"] for response in responses) == [
+        "already_completed", "completed"
+    ]
+
+    after = (await client.get("/api/tutorials/progress/me", headers=headers)).json()
+    assert after["completed_count"] == before["completed_count"] + 1
+    assert after["total_xp"] == before["total_xp"] + settings.TUTORIAL_XP_REWARD
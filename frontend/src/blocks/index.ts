@@ -9,6 +9,7 @@ export function initCustomBlocks() {
   initIoTActuatorBlocks();
   initIoTDisplayBlocks();
   initIoTConnectivityBlocks();
+  initIoTTelemetryBlocks();
   initAIVisionBlocks();
   initAISpeechBlocks();
   initAIPredictionBlocks();
@@ -551,6 +552,159 @@ function initIoTConnectivityBlocks() {
   };
 }
 
+// ==================== IoT Telemetry Blocks ====================
+
+// Same device-side buffer the backend generator emits: readings wait in a
+// ring buffer and are POSTed to /api/devices/{id}/data in batches
+const TELEMETRY_PYTHON = `class Telemetry:
+    """Sensor readings buffered on the device and sent in batches"""
+
+    def __init__(self, server, device_id, token, batch_size, flush_seconds, capacity):
+        self.url = f"{server.rstrip('/')}/api/devices/{device_id}/data"
+        self.token = token
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.buffer = collections.deque(maxlen=capacity)
+        self.last_sample = {}
+        self.last_flush = time.monotonic()
+        self.failed = False
+
+    def due(self, sensor_type, interval_ms):
+        """Whether sensor_type should be sampled again"""
+        now = time.monotonic()
+        last = self.last_sample.get(sensor_type)
+        if last is not None and (now - last) * 1000 < interval_ms:
+            return False
+        self.last_sample[sensor_type] = now
+        return True
+
+    def record(self, sensor_type, value, unit=None):
+        value = float(value)
+        if value != value:  # failed sensor read (NaN)
+            return
+        reading = {
+            "sensor_type": sensor_type,
+            "value": value,
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        }
+        if unit:
+            reading["unit"] = unit
+        self.buffer.append(reading)
+        full = len(self.buffer) >= self.batch_size and not self.failed
+        if full or time.monotonic() - self.last_flush >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        self.last_flush = time.monotonic()
+        while self.buffer:
+            batch = list(itertools.islice(self.buffer, self.batch_size))
+            body = json.dumps({"readings": batch}, separators=(",", ":")).encode()
+            headers = {"Content-Type": "application/json", "Authorization": f"Bearer {self.token}"}
+            if len(body) > 1024:
+                body = gzip.compress(body)
+                headers["Content-Encoding"] = "gzip"
+            try:
+                urllib.request.urlopen(urllib.request.Request(self.url, body, headers), timeout=10).close()
+            except urllib.error.HTTPError as e:
+                if e.code >= 500 or e.code in (408, 429):
+                    self.failed = True
+                    return
+            except OSError:
+                self.failed = True
+                return
+            for _ in batch:
+                self.buffer.popleft()
+        self.failed = False
+`;
+
+const TELEMETRY_IMPORTS = [
+  'collections', 'datetime', 'gzip', 'itertools', 'json', 'time', 'urllib.error', 'urllib.request',
+];
+
+function initIoTTelemetryBlocks() {
+  // Telemetry Setup
+  Blockly.Blocks['iot_telemetry_setup'] = {
+    init: function () {
+      this.appendDummyInput()
+        .appendField('send telemetry to')
+        .appendField(new Blockly.FieldTextInput('http://192.168.1.10:8000'), 'SERVER')
+        .appendField('device')
+        .appendField(new Blockly.FieldNumber(1, 1), 'DEVICE')
+        .appendField('token')
+        .appendField(new Blockly.FieldTextInput(''), 'TOKEN');
+      this.appendDummyInput()
+        .appendField('every')
+        .appendField(new Blockly.FieldNumber(50, 1, 1000), 'COUNT')
+        .appendField('readings or')
+        .appendField(new Blockly.FieldNumber(60, 1), 'SECONDS')
+        .appendField('s, keep up to')
+        .appendField(new Blockly.FieldNumber(500, 1), 'CAPACITY')
+        .appendField('while offline');
+      this.setPreviousStatement(true, null);
+      this.setNextStatement(true, null);
+      this.setColour('#65a30d');
+      this.setTooltip('Buffer sensor readings on the device and send them in batches');
+    },
+  };
+
+  pythonGenerator.forBlock['iot_telemetry_setup'] = function (block: Blockly.Block) {
+    const server = block.getFieldValue('SERVER').replace(/\/+$/, '');
+    const device = block.getFieldValue('DEVICE');
+    const token = block.getFieldValue('TOKEN');
+    const count = block.getFieldValue('COUNT');
+    const seconds = block.getFieldValue('SECONDS');
+    const capacity = Math.max(block.getFieldValue('CAPACITY'), count);
+    for (const module of TELEMETRY_IMPORTS) {
+      (pythonGenerator as any).definitions_[`import_${module}`] = `import ${module}`;
+    }
+    (pythonGenerator as any).definitions_['telemetry'] = TELEMETRY_PYTHON;
+    return `telemetry = Telemetry("${server}", ${device}, "${token}", batch_size=${count}, flush_seconds=${seconds}, capacity=${capacity})\n`;
+  };
+
+  // Telemetry Sample
+  Blockly.Blocks['iot_telemetry_sample'] = {
+    init: function () {
+      this.appendValueInput('VALUE')
+        .setCheck('Number')
+        .appendField('record')
+        .appendField(new Blockly.FieldTextInput('temperature'), 'NAME')
+        .appendField('in')
+        .appendField(new Blockly.FieldTextInput('C'), 'UNIT')
+        .appendField('every')
+        .appendField(new Blockly.FieldNumber(1000, 0), 'MS')
+        .appendField('ms value');
+      this.setPreviousStatement(true, null);
+      this.setNextStatement(true, null);
+      this.setColour('#65a30d');
+      this.setTooltip('Sample a sensor at most once per interval into the telemetry buffer');
+    },
+  };
+
+  pythonGenerator.forBlock['iot_telemetry_sample'] = function (block: Blockly.Block) {
+    const name = block.getFieldValue('NAME');
+    const unit = block.getFieldValue('UNIT');
+    const ms = block.getFieldValue('MS');
+    const value = pythonGenerator.valueToCode(block, 'VALUE', Order.NONE) || '0';
+    const unitArg = unit ? `, "${unit}"` : '';
+    return `if telemetry.due("${name}", ${ms}):\n  telemetry.record("${name}", ${value}${unitArg})\n`;
+  };
+
+  // Telemetry Flush
+  Blockly.Blocks['iot_telemetry_flush'] = {
+    init: function () {
+      this.appendDummyInput().appendField('send buffered telemetry now');
+      this.setPreviousStatement(true, null);
+      this.setNextStatement(true, null);
+      this.setColour('#65a30d');
+      this.setTooltip('Send every buffered reading without waiting for the batch to fill');
+    },
+  };
+
+  pythonGenerator.forBlock['iot_telemetry_flush'] = function () {
+    return 'telemetry.flush()\n';
+  };
+}
+
 // ==================== AI Vision Blocks ====================
 
 function initAIVisionBlocks() {
@@ -360,6 +360,16 @@ function getToolbox() {
           { kind: 'block', type: 'iot_http_post' },
         ],
       },
+      {
+        kind: 'category',
+        name: '📈 IoT - Telemetry',
+        colour: '#65a30d',
+        contents: [
+          { kind: 'block', type: 'iot_telemetry_setup' },
+          { kind: 'block', type: 'iot_telemetry_sample' },
+          { kind: 'block', type: 'iot_telemetry_flush' },
+        ],
+      },
       { kind: 'sep' },
       {
         kind: 'category',
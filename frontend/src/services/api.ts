@@ -77,7 +77,27 @@ export const devicesAPI = {
   
   ping: (id: number) => api.post(`/devices/${id}/ping`),
   
-  uploadCode: (id: number) => api.post(`/devices/${id}/upload`),
+  uploadCode: (id: number, firmware: Blob) => {
+    const formData = new FormData();
+    formData.append('firmware', firmware);
+    return api.post(`/devices/${id}/upload`, formData, {
+      headers: { 'Content-Type': 'multipart/form-data' },
+    });
+  },
+  
+  sendCommand: (id: number, name: string, params: Record<string, unknown> = {}) =>
+    api.post(`/devices/${id}/commands`, { name, params }),
+  
+  pendingCommands: (id: number) => api.get(`/devices/${id}/commands`),
+  
+  bulkUploadCode: (ids: number[], firmware: Blob) => {
+    const formData = new FormData();
+    formData.append('firmware', firmware);
+    ids.forEach((id) => formData.append('ids', String(id)));
+    return api.post('/devices/bulk/upload', formData, {
+      headers: { 'Content-Type': 'multipart/form-data' },
+    });
+  },
 };
 
 // AI Models API
@@ -110,6 +130,14 @@ export const codeAPI = {
     api.get(`/code/templates/${templateName}`, { params: { language } }),
 };
 
+// Change feed: server-sent events for the user's devices and projects
+export const changesAPI = {
+  connect: () => {
+    const token = localStorage.getItem('auth_token') || '';
+    return new EventSource(`${API_BASE_URL}/changes/?access_token=${encodeURIComponent(token)}`);
+  },
+};
+
 // Tutorials API
 export const tutorialsAPI = {
   list: (category?: string, difficulty?: string) =>